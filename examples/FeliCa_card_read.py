@@ -8,7 +8,7 @@
 import time
 import binascii
 
-from pn532pi import Pn532
+from pn532pi import Pn532, CardCache
 from pn532pi import Pn532I2c
 from pn532pi import Pn532Spi
 from pn532pi import Pn532Hsu
@@ -29,8 +29,9 @@ elif I2C:
     PN532_I2C = Pn532I2c(1)
     nfc = Pn532(PN532_I2C)
 
-_prevIDm = bytearray(b'\x00' * 8)
-_prevTime = 0
+# Cards read in the last 3 seconds, writes through nfc drop them from the cache
+cache = CardCache(ttl=3)
+cache.attach(nfc)
 
 
 def millis():
@@ -60,7 +61,6 @@ def setup():
 
 
 def loop():
-    global _prevIDm, _prevTime
     systemCode = 0xFFFF
     requestCode = 0x01  # System Code request
 
@@ -74,20 +74,16 @@ def loop():
         time.sleep(.5)
         return
 
-    if (idm == _prevIDm):
-        if ((millis() - _prevTime) < 3000):
-            print("Same card")
-            time.sleep(.5)
-            return
+    if (cache.get(idm) is not None):
+        print("Same card")
+        time.sleep(.5)
+        return
 
     print("Found a card!")
     print("  IDm : {}".format(binascii.hexlify(idm)))
     print("  PWm: {}".format(binascii.hexlify(pwm)))
     print("  System Code: {:x}".format(binascii.hexlify(systemCode)))
 
-    _prevIDm = idm
-    _prevTime = millis()
-
     print("Write Without Encryption command ")
     serviceCodeList = [0x0009]
     blockList = [0x8000]
@@ -110,6 +106,7 @@ def loop():
         print("OK!")
         for i in range(3):
             print("  Block no. {}: {}".format(i, binascii.hexlify(blockData[i])))
+        cache.put(idm, dict(enumerate(blockData)))
 
     # Wait 1 second before continuing
     print("Card access completed!\n")
@@ -2,6 +2,7 @@ import time
 import binascii
 
 from pn532pi import Pn532
+from pn532pi import IsoDep
 from pn532pi import Pn532Hsu
 from pn532pi import Pn532I2c
 from pn532pi import Pn532Spi
@@ -50,11 +51,13 @@ def loop():
   print("Waiting for an ISO14443A card")
 
   # set shield to inListPassiveTarget
-  success = nfc.inListPassiveTarget()
+  success, target = nfc.readPassiveTarget(inlist=True)
 
   if (success):
 
     print("Found something!")
+    # frames are sized from the ATS, long commands and responses are chained
+    isodep = IsoDep(nfc, target.ats)
 
     selectApdu = bytearray([0x00,                                     # CLA 
                             0xA4,                                     # INS 
@@ -65,19 +68,19 @@ def loop():
                             0x00 # Le
                             ])
 
-    success, response = nfc.inDataExchange(selectApdu)
+    success, response = isodep.transmit(selectApdu)
 
     if (success):
 
-      print("responseLength: {:d}", len(response))
+      print("responseLength: {:d}".format(len(response)))
       print(binascii.hexlify(response))
 
       while (success):
         apdu = bytearray(b"Hello from Arduino")
-        success, back = nfc.inDataExchange(apdu)
+        success, back = isodep.transceive(apdu)
 
         if (success):
-          print("responseLength: {:d}", len(back))
+          print("responseLength: {:d}".format(len(back)))
           print(binascii.hexlify(back))
         else:
           print("Broken connection?")
@@ -0,0 +1,72 @@
+"""
+    This example emulates an NFC Forum Type 4 tag holding an NDEF URI record
+    and prints the NDEF message whenever a reader writes to the tag
+"""
+import time
+
+from pn532pi import Pn532, EmulateTag, ndef
+from pn532pi import Pn532Hsu
+from pn532pi import Pn532I2c
+from pn532pi import Pn532Spi
+
+# Set the desired interface to True
+SPI = False
+I2C = False
+HSU = True
+
+if SPI:
+    PN532_SPI = Pn532Spi(Pn532Spi.SS0_GPIO8)
+    nfc = EmulateTag(Pn532(PN532_SPI))
+# When the number after #elif set as 1, it will be switch to HSU Mode
+elif HSU:
+    PN532_HSU = Pn532Hsu(Pn532Hsu.RPI_MINI_UART)
+    nfc = EmulateTag(Pn532(PN532_HSU))
+
+# When the number after #if & #elif set as 0, it will be switch to I2C Mode
+elif I2C:
+    PN532_I2C = Pn532I2c(1)
+    nfc = EmulateTag(Pn532(PN532_I2C))
+
+message = [ndef.NdefRecord.uri("http://www.seeedstudio.com")]
+uid = bytearray([0x12, 0x34, 0x56])
+
+
+def setup():
+    print("------- Emulate Tag --------")
+
+    # comment out this command for no ndef message
+    nfc.setNdefMessage(message)
+    print("Ndef encoded message size: {:d}".format(len(ndef.encodeMessage(message))))
+
+    # uid must be 3 bytes!
+    nfc.setUid(uid)
+
+    nfc.init()
+
+
+def loop():
+    # uncomment for overriding ndef in case a write to this tag occured
+    # nfc.setNdefMessage(message)
+
+    # start emulation (blocks)
+    nfc.emulate()
+
+    # or start emulation with timeout
+    # if (not nfc.emulate(1000)):  # timeout 1 second
+    #     print("timed out")
+
+    # deny writing to the tag
+    # nfc.setTagWriteable(False)
+
+    if (nfc.writeOccured()):
+        print("\nWrite occured !")
+        for record in nfc.getNdefMessage():
+            print(record)
+
+    time.sleep(1)
+
+
+if __name__ == '__main__':
+    setup()
+    while True:
+        loop()
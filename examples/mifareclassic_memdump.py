@@ -1,5 +1,5 @@
 """
-    This example attempts to dump the contents of a Mifare Classic 1K card
+    This example attempts to dump the contents of a Mifare Classic Mini, 1K or 4K card
 
     Note that you need the baud rate to be 115200 because we need to print
     out the data and read from the card at the same time!
@@ -8,7 +8,8 @@
 """
 import binascii
 
-from pn532pi import pn532, Pn532
+from pn532pi import pn532, Pn532, MifareClassic
+from pn532pi.nfc.mifareclassic import sectorsForCardType
 from pn532pi import Pn532Hsu
 from pn532pi import Pn532I2c
 from pn532pi import Pn532Spi
@@ -49,73 +50,38 @@ def setup():
   nfc.SAMConfig()
 
 
-def loop(): 
-  authenticated = False               # Flag to indicate if the sector is authenticated
-
+def loop():
   # Keyb on NDEF and Mifare Classic should be the same
   keyuniversal = bytearray([ 0xFF, 0xFF, 0xFF, 0xFF, 0xFF, 0xFF ])
 
   # Wait for an ISO14443A type cards (Mifare, etc.).  When one is found
-  # 'uid' will be populated with the UID, and uidLength will indicate
-  # if the uid is 4 bytes (Mifare Classic) or 7 bytes (Mifare Ultralight)
-  success, uid = nfc.readPassiveTargetID(pn532.PN532_MIFARE_ISO14443A_106KBPS)
+  # 'target' holds the UID and the ATQA/SAK used to tell Mini, 1K and 4K cards apart
+  success, target = nfc.readPassiveTarget(pn532.PN532_MIFARE_ISO14443A_106KBPS)
 
   if (success):
+    uid = target.uid
     # Display some basic information about the card
     print("Found an ISO14443A card")
     print("UID Length: {:d}".format(len(uid)))
     print("UID Value: {}".format(binascii.hexlify(uid)))
 
-    if (len(uid) == 4):
+    if (sectorsForCardType(target.card_type)):
       # We probably have a Mifare Classic card ...
-      print("Seems to be a Mifare Classic card (4 byte UID)")
-
-      # Now we try to go through all 16 sectors (each having 4 blocks)
-      # authenticating each sector, and then dumping the blocks
-      for currentblock in range(64):
-        # Check if this is a new block so that we can reauthenticate
-        if (nfc.mifareclassic_IsFirstBlock(currentblock)):
-          authenticated = False
-
-        # If the sector hasn't been authenticated, do so first
-        if (not authenticated):
-          # Starting of a new sector ... try to to authenticate
-          print("------------------------Sector {:d}-------------------------".format(int(currentblock / 4)))
-          if (currentblock == 0):
-              # This will be 0xFF 0xFF 0xFF 0xFF 0xFF 0xFF for Mifare Classic (non-NDEF!)
-              # or 0xA0 0xA1 0xA2 0xA3 0xA4 0xA5 for NDEF formatted cards using key a,
-              # but keyb should be the same for both (0xFF 0xFF 0xFF 0xFF 0xFF 0xFF)
-              success = nfc.mifareclassic_AuthenticateBlock (uid, currentblock, 1, keyuniversal)
-          else:
-              # This will be 0xFF 0xFF 0xFF 0xFF 0xFF 0xFF for Mifare Classic (non-NDEF!)
-              # or 0xD3 0xF7 0xD3 0xF7 0xD3 0xF7 for NDEF formatted cards using key a,
-              # but keyb should be the same for both (0xFF 0xFF 0xFF 0xFF 0xFF 0xFF)
-              success = nfc.mifareclassic_AuthenticateBlock (uid, currentblock, 1, keyuniversal)
-          if (success):
-            authenticated = True
-          else:
-            print("Authentication error")
-        # If we're still not authenticated just skip the block
-        if (not authenticated):
-          print("Block {:d}".format(currentblock))
-          print(" unable to authenticate")
-        else:
-          # Authenticated ... we should be able to read the block now
-          # Dump the data into the 'data' array
-          success, data = nfc.mifareclassic_ReadDataBlock(currentblock)
-          if (success):
-            # Read successful
-            print("Block {:d}".format(currentblock))
-            if (currentblock < 10):
-              print("  ")
-            else:
-              print(" ")
-            # Dump the raw data
-            print(binascii.hexlify(data))
-          else:
-            # Oops ... something happened
-            print("Block {:d}".format(currentblock))
-            print(" unable to read this block")
+      print("Seems to be a Mifare Classic card ({:d} sectors)".format(sectorsForCardType(target.card_type)))
+
+      # Now we try to go through all sectors, reading the trailer first to learn the access conditions,
+      # then authenticating once per sector and dumping the blocks the key is allowed to read.
+      # keyb should be 0xFF 0xFF 0xFF 0xFF 0xFF 0xFF for both Mifare Classic and NDEF formatted cards,
+      # but it can not be used while the access conditions allow reading it (e.g. blank cards), keya is used then.
+      for sector, success, blocks in MifareClassic(nfc).readCard(uid, target.card_type, keyA=keyuniversal, keyB=keyuniversal):
+        print("------------------------Sector {:d}-------------------------".format(sector))
+        if (not success):
+          print(" unable to authenticate or read this sector")
+          continue
+
+        # Dump the raw data
+        for block, data in sorted(blocks.items()):
+          print("Block {:<3d} {}".format(block, binascii.hexlify(data)))
     else:
       print("Ooops ... this doesn't seem to be a Mifare Classic card!")
 
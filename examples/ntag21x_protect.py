@@ -6,7 +6,7 @@
 import time
 import binascii
 
-from pn532pi import Pn532, pn532
+from pn532pi import Pn532, pn532, Ntag21x
 from pn532pi import Pn532I2c
 from pn532pi import Pn532Spi
 from pn532pi import Pn532Hsu
@@ -28,6 +28,7 @@ elif I2C:
     PN532_I2C = Pn532I2c(1)
     nfc = Pn532(PN532_I2C)
 
+ntag = Ntag21x(nfc)
 
 password = bytearray([0x12, 0x34, 0x56, 0x78])
 
@@ -62,17 +63,17 @@ def loop():
         print("UID Value: {}".format(binascii.hexlify(uid)))
 
     # if NTAG21x enables r/w protection, uncomment the following line
-    # nfc.ntag21x_auth(password)
+    # ntag.auth(password)
 
-    status, buf = nfc.mifareultralight_ReadPage(3)
-    capacity = int(buf[2])
-    print("Tag capacity {:d} bytes".format(capacity*8))
+    # GET_VERSION identifies the exact chip and where its configuration pages are
+    status, version = ntag.getVersion(uid)
+    if not status or not version.cfg_page:
+        print("Not an NTAG21x tag")
+        return
+    print("{} capacity {:d} bytes".format(version.model, version.user_memory))
 
-    cfg_page_base = 0x29   # NTAG213
-    if (capacity == 0x3E):
-        cfg_page_base = 0x83       # NTAG215
-    elif (capacity == 0x6D):
-        cfg_page_base = 0xE3       # NTAG216
+    cfg_page_base = version.cfg_page
+    buf = bytearray(4)
 
     # PWD page, set new password
     nfc.mifareultralight_WritePage(cfg_page_base + 2, password)
@@ -6,7 +6,7 @@
 import time
 import binascii
 
-from pn532pi import Pn532, pn532
+from pn532pi import Pn532, pn532, Ntag21x
 from pn532pi import Pn532I2c
 from pn532pi import Pn532Spi
 from pn532pi import Pn532Hsu
@@ -27,6 +27,7 @@ elif I2C:
     PN532_I2C = Pn532I2c(1)
     nfc = Pn532(PN532_I2C)
 
+ntag = Ntag21x(nfc)
 
 password =  bytearray([ 0x12, 0x34, 0x56, 0x78])
 
@@ -57,15 +58,22 @@ def loop():
         tagPresent, uid = nfc.readPassiveTargetID(pn532.PN532_MIFARE_ISO14443A_106KBPS)
 
     # if NTAG21x enables r/w protection, uncomment the following line 
-    # nfc.ntag21x_auth(password)
-
-    status, buf = nfc.mifareultralight_ReadPage(3)
-    capacity = int(buf[2]) * 8
-    print("Tag capacity {:d} bytes".format(capacity))
-
-    for i in range(4, int(capacity/4)):
-        status, buf = nfc.mifareultralight_ReadPage(i)
-        print(binascii.hexlify(buf[:4]))
+    # ntag.auth(password)
+
+    # GET_VERSION identifies the exact chip, the result is cached for this uid
+    status, version = ntag.getVersion(uid)
+    if not status:
+        print("Not an NTAG21x tag")
+        return
+    capacity = version.user_memory
+    print("{} capacity {:d} bytes".format(version.model, capacity))
+
+    # read the whole user memory with as few FAST_READ commands as possible
+    status, buf = nfc.ntag21x_FastRead(4, 4 + int(capacity/4) - 1)
+    if not status:
+        print("Failed to read the tag")
+    for i in range(0, len(buf), 4):
+        print(binascii.hexlify(buf[i:i + 4]))
 
     # wait until the tag is removed
     while tagPresent:
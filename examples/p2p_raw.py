@@ -5,6 +5,7 @@ import binascii
 
 from pn532pi import Pn532
 from pn532pi import Snep
+from pn532pi import ndef
 from pn532pi import Pn532I2c
 from pn532pi import Pn532Spi
 from pn532pi import Pn532Hsu
@@ -45,10 +46,7 @@ def setup():
                                                                 (versiondata >> 8) & 0xFF))
 
 
-message = bytearray([
-    0xD2, 0xA, 0xB, 0x74, 0x65, 0x78, 0x74, 0x2F, 0x70, 0x6C,
-    0x61, 0x69, 0x6E, 0x68, 0x65, 0x6C, 0x6C, 0x6F, 0x20, 0x77,
-    0x6F, 0x72, 0x6C, 0x64])
+message = ndef.encodeMessage([ndef.NdefRecord.mime('text/plain', b'hello world')])
 
 
 def loop():
@@ -14,3 +14,13 @@ from pn532pi.nfc.pn532 import Pn532
 from pn532pi.nfc.llcp import Llcp
 from pn532pi.nfc.snep import Snep
 from pn532pi.nfc.emulatetag import EmulateTag
+from pn532pi.nfc.ntag21x import Ntag21x
+from pn532pi.nfc.keyring import MifareKeyring
+from pn532pi.nfc.cardcache import CardCache
+from pn532pi.nfc.mifareclassic import MifareClassic
+from pn532pi.nfc.mad import Mad
+from pn532pi.nfc import ndef
+from pn532pi.nfc.type2tag import Type2Tag
+from pn532pi.nfc.isodep import IsoDep
+from pn532pi.nfc.type4tag import Type4Tag
+from pn532pi.nfc.desfire import Desfire
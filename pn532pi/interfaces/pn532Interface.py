@@ -10,6 +10,7 @@ PN532_INVALID_ACK             = (-1)
 PN532_TIMEOUT                 = (-2)
 PN532_INVALID_FRAME           = (-3)
 PN532_NO_SPACE                = (-4)
+PN532_PACKBUFFSIZ             = (255)  # max length of a normal information frame data field
 
 
 def REVERSE_BITS_ORDER(b):
@@ -42,3 +43,21 @@ class Pn532Interface:
                     <0      failed to read response, response)
         """
         raise NotImplementedError('This function is virtual')
+
+    def readResponse_into(self, buf: bytearray, timeout: int = 1000) -> int:
+        """
+        Read the response of a command into a caller provided buffer, strip prefix and suffix
+        Interfaces should override this to avoid allocating intermediate buffers.
+        :param buf:     bytearray or writable memoryview to hold the response
+        :param timeout: max time to wait, 0 means no timeout
+        :return: >=0     length of response written to buf
+                 <0      failed to read response
+        """
+        length, response = self.readResponse(timeout)
+        if length < 0:
+            return length
+        if length > len(buf):
+            return PN532_NO_SPACE
+
+        buf[:length] = response[:length]
+        return length
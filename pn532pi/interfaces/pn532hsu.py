@@ -2,7 +2,7 @@ from serial import Serial
 
 from pn532pi.interfaces.pn532Interface import Pn532Interface, PN532_PREAMBLE, PN532_STARTCODE1, PN532_STARTCODE2, PN532_HOSTTOPN532, \
     PN532_POSTAMBLE, PN532_TIMEOUT, PN532_INVALID_FRAME, PN532_PN532TOHOST, PN532_INVALID_ACK, \
-    PN532_ACK_WAIT_TIME
+    PN532_ACK_WAIT_TIME, PN532_NO_SPACE, PN532_PACKBUFFSIZ
 from pn532pi.nfc.pn532_log import DMSG, DMSG_HEX
 
 PN532_WAKEUP = bytearray([0x55, 0x00, 0x00, 0x55])
@@ -16,6 +16,7 @@ class Pn532Hsu(Pn532Interface):
         self._serial = Serial('/dev/serial' + str(port), baudrate=115200, timeout=100)
         self._serial.close()
         self.command = 0
+        self._buffer = bytearray(PN532_PACKBUFFSIZ)    # scratch buffer of readResponse
     
     def begin(self):
         self._serial.open()
@@ -58,51 +59,65 @@ class Pn532Hsu(Pn532Interface):
         return self.readAckFrame()
 
     def readResponse(self, timeout: int = 1000) -> (int, bytearray):
+        length = self.readResponse_into(self._buffer, timeout)
+        if length < 0:
+            return length, bytearray()
+
+        return length, self._buffer[:length]
+
+    def readResponse_into(self, buf: bytearray, timeout: int = 1000) -> int:
     
         DMSG("\nRead:  ")
     
         # Frame Preamble and Start Code 
         num, tmp = self.receive(3, timeout)
         if (num <= 0):
-            return PN532_TIMEOUT, tmp
+            return PN532_TIMEOUT
         if (0 != tmp[0] or 0 != tmp[1] or 0xFF != tmp[2]):
             DMSG("Preamble error")
-            return PN532_INVALID_FRAME, bytearray()
+            return PN532_INVALID_FRAME
     
         # receive length and check 
         num, tmp = self.receive(2, timeout)
         if (num <= 0):
-            return PN532_TIMEOUT, tmp
+            return PN532_TIMEOUT
 
         length, lchksm = tmp[0], tmp[1]        
         if (0 != (length + lchksm) & 0xff):
             DMSG("Length error")
-            return PN532_INVALID_FRAME, bytearray()
+            return PN532_INVALID_FRAME
         length -= 2
 
         # receive self.command byte 
         cmd = self.command + 1 # response self.command
         num, tmp = self.receive(2, timeout)
         if (num <= 0):
-            return PN532_TIMEOUT, tmp
+            return PN532_TIMEOUT
         if (PN532_PN532TOHOST != tmp[0] or cmd != tmp[1]):
             DMSG("Command error")
-            return PN532_INVALID_FRAME, bytearray()
+            return PN532_INVALID_FRAME
+
+        if (length > len(buf)):
+            DMSG("Response too large for buffer")
+            # drop the data, checksum and postamble so the next frame is read from its start
+            self.receive(length + 2, timeout)
+            return PN532_NO_SPACE
 
-        num, buf = self.receive(length, timeout)
+        payload = memoryview(buf)[:length]
+        num = self.receive_into(payload, timeout)
         if (num != length):
-            return PN532_TIMEOUT, buf
-        dsum = PN532_PN532TOHOST + cmd + sum(buf)
+            return PN532_TIMEOUT
+        dsum = PN532_PN532TOHOST + cmd + sum(payload)
 
         # checksum and postamble 
         num, tmp = self.receive(2, timeout)
         if (num <= 0):
-            return PN532_TIMEOUT, tmp
+            return PN532_TIMEOUT
         if (0 != (dsum + tmp[0]) & 0xff or 0 != tmp[1]):
             DMSG("Checksum error")
-            return PN532_INVALID_FRAME, bytearray()
+            return PN532_INVALID_FRAME
 
-        return length, buf
+        return length
 
     def readAckFrame(self):
         PN532_ACK = bytearray([0, 0, 0xFF, 0, 0xFF, 0])
@@ -139,3 +154,19 @@ class Pn532Hsu(Pn532Interface):
 
 
         return read_bytes, rx_data
+
+    def receive_into(self, buf: memoryview, timeout: int) -> int:
+        """
+        Receive data directly into a buffer
+        :param buf: writable buffer, len(buf) bytes are expected.
+        :param timeout: time to receive data (milliseconds)
+        :returns: >= 0 number of bytes received, < 0 Error
+        """
+
+        self._serial.timeout = timeout / 1000.0
+        read_bytes = self._serial.readinto(buf)
+
+        if read_bytes < len(buf):
+            return PN532_TIMEOUT
+
+        return read_bytes
@@ -6,7 +6,7 @@ import errno
 
 from pn532pi.interfaces.pn532Interface import Pn532Interface, PN532_PREAMBLE, PN532_STARTCODE1, PN532_STARTCODE2, PN532_HOSTTOPN532, \
     PN532_INVALID_FRAME, PN532_POSTAMBLE, PN532_PN532TOHOST, PN532_ACK_WAIT_TIME, PN532_TIMEOUT, \
-    PN532_INVALID_ACK
+    PN532_INVALID_ACK, PN532_NO_SPACE, PN532_PACKBUFFSIZ
 
 PN532_I2C_ADDRESS =  (0x48 >> 1)
 
@@ -19,6 +19,7 @@ class Pn532I2c(Pn532Interface):
         self._wire = None
         self._bus = bus
         self._command = 0
+        self._buffer = bytearray(PN532_PACKBUFFSIZ)    # scratch buffer of readResponse
 
     def begin(self):
         self._wire = I2CMaster(self._bus)
@@ -92,17 +93,23 @@ class Pn532I2c(Pn532Interface):
         return length
 
     def readResponse(self, timeout: int = 1000) -> (int, bytearray):
+        length = self.readResponse_into(self._buffer, timeout)
+        if length < 0:
+            return length, bytearray()
+
+        return length, self._buffer[:length]
+
+    def readResponse_into(self, buf: bytearray, timeout: int = 1000) -> int:
         t = 0
         length = self._getResponseLength(timeout)
-        buf = bytearray()
 
         if length < 0:
-            return length, buf
+            return length
 
         # [RDY] 00 00 FF LEN LCS (TFI PD0 ... PDn) DCS 00
         while 1:
             responses = self._wire.transaction(reading(PN532_I2C_ADDRESS, 6 + length + 2))
-            data = bytearray(responses[0])
+            data = memoryview(responses[0])
             if (data[0] & 1):
               # check first byte --- status
                 break # PN532 is ready
@@ -110,42 +117,46 @@ class Pn532I2c(Pn532Interface):
             time.sleep(.001)     # sleep 1 ms
             t+=1
             if ((0 != timeout) and (t> timeout)):
-                return -1, buf
+                return -1
 
         if (PN532_PREAMBLE != data[1] or # PREAMBLE
             PN532_STARTCODE1 != data[2] or # STARTCODE1
             PN532_STARTCODE2 != data[3]    # STARTCODE2
         ):
-            DMSG('Invalid Response frame: {}'.format(data))
-            return PN532_INVALID_FRAME, buf
+            DMSG('Invalid Response frame: {}'.format(bytes(data)))
+            return PN532_INVALID_FRAME
 
         length = data[4]
 
         if (0 != (length + data[5] & 0xFF)):
          # checksum of length
             DMSG('Invalid Length Checksum: len {:d} checksum {:d}'.format(length, data[5]))
-            return PN532_INVALID_FRAME, buf
+            return PN532_INVALID_FRAME
 
         cmd = self._command + 1 # response command
         if (PN532_PN532TOHOST != data[6] or (cmd) != data[7]):
-            return PN532_INVALID_FRAME, buf
+            return PN532_INVALID_FRAME
 
         length -= 2
+        if (length > len(buf)):
+            DMSG('Response too large for buffer: {:d}'.format(length))
+            return PN532_NO_SPACE
 
         DMSG("readResponse read command:  {:x}".format(cmd))
 
-        dsum = PN532_PN532TOHOST + cmd
-        buf = data[8:-2]
-        DMSG('readResponse response: {!r}\n'.format(buf))
-        dsum += sum(buf)
+        payload = data[8:8 + length]
+        dsum = PN532_PN532TOHOST + cmd + sum(payload)
 
-        checksum = data[-2]
+        checksum = data[8 + length]
         if (0 != (dsum + checksum) & 0xFF):
             DMSG("checksum is not ok: sum {:d} checksum {:d}\n".format(dsum, checksum))
-            return PN532_INVALID_FRAME, buf
+            return PN532_INVALID_FRAME
         # POSTAMBLE data [-1]
 
-        return length, buf
+        buf[:length] = payload
+        DMSG('readResponse response: {!r}\n'.format(bytes(payload)))
+
+        return length
 
     def _readAckFrame(self) -> int:
         PN532_ACK = [0, 0, 0xFF, 0, 0xFF, 0]
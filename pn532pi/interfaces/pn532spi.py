@@ -2,7 +2,7 @@ import time
 
 from pn532pi.interfaces.pn532Interface import Pn532Interface, PN532_ACK_WAIT_TIME, PN532_INVALID_FRAME, PN532_PN532TOHOST, \
     PN532_INVALID_ACK, PN532_TIMEOUT, PN532_PREAMBLE, PN532_STARTCODE1, PN532_STARTCODE2, \
-    PN532_HOSTTOPN532, PN532_POSTAMBLE, REVERSE_BITS_ORDER
+    PN532_HOSTTOPN532, PN532_POSTAMBLE, REVERSE_BITS_ORDER, PN532_NO_SPACE, PN532_PACKBUFFSIZ
 from spidev import SpiDev
 
 from pn532pi.nfc.pn532_log import DMSG
@@ -15,9 +15,12 @@ RPI_BUS0 = 0
 SPI_MODE0 = 0b0
 
 
+_REVERSE_BITS_TABLE = bytes([REVERSE_BITS_ORDER(b) for b in range(256)])
+
+
 def _reverse_bits(data: bytearray) -> bytearray:
     """Reverse bit order for all bytes in a byte array"""
-    return bytearray([REVERSE_BITS_ORDER(b) for b in data])
+    return bytearray(data).translate(_REVERSE_BITS_TABLE)
 
 
 class Pn532Spi(Pn532Interface):
@@ -48,6 +51,7 @@ class Pn532Spi(Pn532Interface):
     def __init__(self, ss: int, speed_hz: int=4_000_000):
         """Pass in slave select pin and optional speed (4MHz default, 5MHz max)"""
         self._command = 0
+        self._buffer = bytearray(PN532_PACKBUFFSIZ)    # scratch buffer of readResponse
         self._ss = ss
         self._spi = SpiDev()
         assert speed_hz <= 5_000_000, "SPI Bus speed must be <= 5MHz"
@@ -116,37 +120,44 @@ class Pn532Spi(Pn532Interface):
         return length
 
     def readResponse(self, timeout: int = 1000) -> (int, bytearray):
-        timer = 0
-        buf = bytearray()        
-        result = 0
+        length = self.readResponse_into(self._buffer, timeout)
+        if length < 0:
+            return length, bytearray()
+
+        return length, self._buffer[:length]
 
+    def readResponse_into(self, buf: bytearray, timeout: int = 1000) -> int:
         length = self._getResponseLength(timeout)
 
         if length < 0:
-            return length, buf
+            return length
 
-        data = self._xfer_bytes([DATA_READ] + [0 for i in range(length + 1)])   #  Total length - 1 for RW byte, SPI is full duplex
+        data = self._xfer_bytes([DATA_READ] + [0] * (length + 1))   #  Total length - 1 for RW byte, SPI is full duplex
 
         cmd = self._command + 1 # response command
         if (PN532_PN532TOHOST != data[0] or (cmd) != data[1]):
-            return PN532_INVALID_FRAME, buf
+            return PN532_INVALID_FRAME
 
         length -= 2
+        if (length > len(buf)):
+            DMSG('Response too large for buffer: {:d}'.format(length))
+            return PN532_NO_SPACE
 
         DMSG("readResponse read command:  {:x}".format(cmd))
 
-        dsum = PN532_PN532TOHOST + cmd
-        buf = data[2:-2]
-        DMSG('readResponse response: {!r}\n'.format(buf))
-        dsum += sum(buf)
+        payload = memoryview(data)[2:2 + length]
+        dsum = PN532_PN532TOHOST + cmd + sum(payload)
 
-        checksum = data[-2]
+        checksum = data[2 + length]
         if (0 != (dsum + checksum) & 0xFF):
             DMSG("checksum is not ok: sum {:d} checksum {:d}\n".format(dsum, checksum))
-            return PN532_INVALID_FRAME, buf
+            return PN532_INVALID_FRAME
         # POSTAMBLE data [-1]
 
-        return length, buf
+        buf[:length] = payload
+        DMSG('readResponse response: {!r}\n'.format(bytes(payload)))
+
+        return length
 
     def _isReady(self) -> bool:
         status = self._check_status() & 1
@@ -0,0 +1,154 @@
+"""
+    cardcache: in-memory cache of card contents keyed by uid (or FeliCa IDm)
+    Entries expire after a TTL, the least recently used ones are evicted first
+    and writes sent through Pn532 invalidate them.
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+
+from pn532pi.nfc.pn532 import Pn532
+from pn532pi.nfc.pn532_log import DMSG
+
+CARD_CACHE_SIZE                     = 32      # number of cards remembered
+CARD_CACHE_TTL                      = 60.0    # seconds an entry stays valid
+
+
+class CachedCard(NamedTuple):
+    """
+    Content of a card kept by CardCache
+    """
+    blocks: Dict[int, bytes]        # block/page number -> content
+    counter: Optional[int]          # counter read along with the content (e.g. NTAG21x NFC counter), None if unused
+    timestamp: float                # time the entry was stored
+
+
+def verifyBlock(read: Callable[[int], Tuple[bool, bytearray]], block: int) -> Callable[[CachedCard], bool]:
+    """
+    Verification that reads back a single block and compares it with the cached content
+
+    :param  read:   read function, e.g. Pn532.mifareultralight_ReadPage or an authenticated
+                    Pn532.mifareclassic_ReadDataBlock
+    :param  block:  block/page to compare
+    :returns: function to pass as verify to CardCache.get
+    """
+    def verify(card: CachedCard) -> bool:
+        if (block not in card.blocks):
+            return False
+        success, data = read(block)
+        return success and bytes(data) == card.blocks[block]
+    return verify
+
+
+def verifyCounter(read: Callable[[], Tuple[bool, int]]) -> Callable[[CachedCard], bool]:
+    """
+    Verification that reads a counter and compares it with the cached one, the counter changes
+    whenever the card is used (e.g. Ntag21x.readCounter)
+
+    :param  read:   function returning (result, counter)
+    :returns: function to pass as verify to CardCache.get
+    """
+    def verify(card: CachedCard) -> bool:
+        if (card.counter is None):
+            return False
+        success, counter = read()
+        return success and counter == card.counter
+    return verify
+
+
+class CardCache:
+    def __init__(self, size: int = CARD_CACHE_SIZE, ttl: float = CARD_CACHE_TTL,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        :param  size:   number of cards remembered
+        :param  ttl:    seconds an entry stays valid, 0 for no expiry
+        :param  clock:  time source in seconds
+        """
+        self.size = size
+        self.ttl = ttl
+        self._clock = clock
+        self._cards = OrderedDict()     # uid -> CachedCard, most recently used last
+
+    def attach(self, pn532: Pn532):
+        """
+        Invalidates cached cards when Pn532 (or an EmulateTag using it) writes to them
+        """
+        pn532.addWriteListener(self.invalidate)
+
+    def detach(self, pn532: Pn532):
+        """
+        Stops listening to the writes of Pn532
+        """
+        pn532.removeWriteListener(self.invalidate)
+
+    def put(self, uid: bytearray, blocks: Dict[int, bytearray], counter: Optional[int] = None):
+        """
+        Stores the content of a card
+
+        :param  uid:        uid/IDm of the card
+        :param  blocks:     block/page number -> content
+        :param  counter:    counter value for verifyCounter
+        """
+        key = bytes(uid)
+        self._cards[key] = CachedCard({block: bytes(data) for block, data in blocks.items()}, counter, self._clock())
+        self._cards.move_to_end(key)
+        while (len(self._cards) > self.size):
+            self._cards.popitem(last=False)
+
+    def update(self, uid: bytearray, block: int, data: bytearray):
+        """
+        Changes one block of a cached card, e.g. after writing it. Does nothing if the card is not cached.
+        """
+        card = self._cards.get(bytes(uid))
+        if (card is not None):
+            card.blocks[block] = bytes(data)
+
+    def get(self, uid: bytearray, verify: Optional[Callable[[CachedCard], bool]] = None) -> Optional[CachedCard]:
+        """
+        Returns the cached content of a card
+
+        :param  uid:        uid/IDm of the card
+        :param  verify:     check run against the card before returning the entry (see verifyBlock and
+                            verifyCounter), the entry is dropped if it fails. None to trust the cache.
+        :returns: CachedCard, None if the card is not cached, expired or failed verification
+        """
+        key = bytes(uid)
+        card = self._cards.get(key)
+        if (card is None):
+            return None
+
+        if (self.ttl and self._clock() - card.timestamp > self.ttl):
+            DMSG("Cached card expired\n")
+            del self._cards[key]
+            return None
+
+        if (verify is not None and not verify(card)):
+            DMSG("Cached card changed\n")
+            del self._cards[key]
+            return None
+
+        self._cards.move_to_end(key)
+        return card
+
+    def invalidate(self, uid: bytes = b'', block: Optional[int] = None):
+        """
+        Drops cached content
+
+        :param  uid:    uid/IDm of the card, empty to drop every card
+        :param  block:  block/page to drop, None to drop the whole card
+        """
+        if (not uid):
+            self._cards.clear()
+            return
+
+        key = bytes(uid)
+        if (block is None):
+            self._cards.pop(key, None)
+        elif (key in self._cards):
+            self._cards[key].blocks.pop(block, None)
+
+    def __len__(self) -> int:
+        return len(self._cards)
+
+    def __contains__(self, uid: Any) -> bool:
+        return bytes(uid) in self._cards
@@ -0,0 +1,316 @@
+"""
+    desfire: Mifare DESFire EV1/EV2 native commands in plain communication mode
+    Commands are wrapped in ISO 7816 APDUs, additional frames (0xAF) are sent and fetched automatically
+    and the card layout (version, applications, files and their settings) is cached per uid
+"""
+from collections import OrderedDict
+from typing import Any, List, NamedTuple, Optional
+
+from pn532pi.nfc.isodep import IsoDep, buildApdu
+from pn532pi.nfc.pn532 import Pn532
+from pn532pi.nfc.pn532_log import DMSG
+
+# DESFire commands
+DESFIRE_CMD_GET_VERSION             = (0x60)
+DESFIRE_CMD_GET_APPLICATION_IDS     = (0x6A)
+DESFIRE_CMD_SELECT_APPLICATION      = (0x5A)
+DESFIRE_CMD_GET_FILE_IDS            = (0x6F)
+DESFIRE_CMD_GET_FILE_SETTINGS       = (0xF5)
+DESFIRE_CMD_READ_DATA               = (0xBD)
+DESFIRE_CMD_WRITE_DATA              = (0x3D)
+DESFIRE_CMD_GET_VALUE               = (0x6C)
+DESFIRE_ADDITIONAL_FRAME            = (0xAF)
+
+# Status codes (SW2 of the wrapped responses)
+DESFIRE_OPERATION_OK                = (0x00)
+DESFIRE_NO_CHANGES                  = (0x0C)
+DESFIRE_MORE_FRAMES                 = (0xAF)
+DESFIRE_SW1                         = (0x91)
+DESFIRE_CLA                         = (0x90)
+
+# File types
+DESFIRE_FILE_STANDARD               = (0x00)
+DESFIRE_FILE_BACKUP                 = (0x01)
+DESFIRE_FILE_VALUE                  = (0x02)
+DESFIRE_FILE_LINEAR_RECORD          = (0x03)
+DESFIRE_FILE_CYCLIC_RECORD          = (0x04)
+
+DESFIRE_PICC_AID                    = (0x000000)
+DESFIRE_FRAME_DATA                  = 52    # command data per frame, the card buffer holds 59 bytes with the header
+DESFIRE_CACHE_SIZE                  = 16    # number of uids whose layout is remembered
+
+
+class DesfireVersion(NamedTuple):
+    """
+    Information contained in the response to the GetVersion command
+    """
+    hardware: bytearray     # vendor, type, subtype, major, minor, storage size, protocol
+    software: bytearray     # vendor, type, subtype, major, minor, storage size, protocol
+    uid: bytearray
+    batch: bytearray
+    production_week: int
+    production_year: int
+
+    @property
+    def storage_size(self) -> int:
+        """Size of the user memory in bytes (lower bound when the size is between two powers of 2)"""
+        return 1 << (self.hardware[5] >> 1)
+
+
+class DesfireFileSettings(NamedTuple):
+    """
+    Settings of a DESFire file, fields not used by the file type are 0
+    """
+    file_type: int
+    comm_settings: int
+    access_rights: int
+    size: int               # file size of data files, record size of record files
+    lower_limit: int = 0    # value files
+    upper_limit: int = 0    # value files
+    max_records: int = 0    # record files
+    records: int = 0        # record files
+
+
+def parseFileSettings(data: bytearray) -> Optional[DesfireFileSettings]:
+    """
+    Parses the response to GetFileSettings
+
+    :returns: DesfireFileSettings, None if malformed
+    """
+    def le(start: int, length: int, signed: bool = False) -> int:
+        return int.from_bytes(data[start:start + length], byteorder='little', signed=signed)
+
+    if (len(data) < 7):
+        return None
+    fileType, comm, access = data[0], data[1], le(2, 2)
+    if (fileType in (DESFIRE_FILE_STANDARD, DESFIRE_FILE_BACKUP)):
+        return DesfireFileSettings(fileType, comm, access, le(4, 3))
+    if (fileType == DESFIRE_FILE_VALUE and len(data) >= 17):
+        return DesfireFileSettings(fileType, comm, access, 4, le(4, 4, True), le(8, 4, True))
+    if (fileType in (DESFIRE_FILE_LINEAR_RECORD, DESFIRE_FILE_CYCLIC_RECORD) and len(data) >= 13):
+        return DesfireFileSettings(fileType, comm, access, le(4, 3), max_records=le(7, 3), records=le(10, 3))
+    return None
+
+
+class Desfire:
+    def __init__(self, pn532: Pn532, ats: bytearray = bytearray()):
+        """
+        :param  pn532:  Pn532 with the card inlisted (see Pn532.readPassiveTarget with inlist=True)
+        :param  ats:    ATS of the card, used to size the ISO-DEP frames
+        """
+        self.pn532 = pn532
+        self.isodep = IsoDep(pn532, ats)
+        self._cards = OrderedDict()  # uid -> {cache key: value}, most recently used last
+        self._selected = None        # (Pn532.activations, uid, aid) of the application currently selected
+
+    def command(self, cmd: int, data: bytes = b'') -> (bool, bytearray, int):
+        """
+        Sends a native command and returns its whole response.
+        Data longer than a frame is sent in additional frames and the additional frames
+        of the response are fetched until the card returns its final status.
+
+        :param  cmd:    command code (DESFIRE_CMD_*)
+        :param  data:   command parameters and data
+        :returns: (result, response, status)
+                    result: bool True if the card returned OPERATION_OK (or NO_CHANGES)
+                    response: response data of all the frames
+                    status: DESFire status code of the last frame, -1 for a transmission error
+        """
+        response = bytearray()
+        offset = 0
+        while True:
+            frame = data[offset:offset + DESFIRE_FRAME_DATA]
+            offset += len(frame)
+            success, reply = self.isodep.transceive(buildApdu(DESFIRE_CLA, cmd, 0x00, 0x00, frame, 0x100))
+            if (not success or len(reply) < 2 or reply[-2] != DESFIRE_SW1):
+                DMSG("DESFire command failed\n")
+                return False, bytearray(), -1
+
+            response += reply[:-2]
+            status = reply[-1]
+            if (status != DESFIRE_MORE_FRAMES):
+                if (status not in (DESFIRE_OPERATION_OK, DESFIRE_NO_CHANGES)):
+                    DMSG("DESFire status {:#x}\n".format(status))
+                return status in (DESFIRE_OPERATION_OK, DESFIRE_NO_CHANGES), response, status
+
+            cmd = DESFIRE_ADDITIONAL_FRAME
+
+    def _cached(self, uid: bytearray, key: tuple) -> Any:
+        card = self._cards.get(bytes(uid)) if uid else None
+        if (card is None):
+            return None
+        self._cards.move_to_end(bytes(uid))
+        return card.get(key)
+
+    def _cache(self, uid: bytearray, key: tuple, value: Any):
+        if (not uid):
+            return
+        self._cards.setdefault(bytes(uid), {})[key] = value
+        self._cards.move_to_end(bytes(uid))
+        if (len(self._cards) > DESFIRE_CACHE_SIZE):
+            self._cards.popitem(last=False)
+
+    def forget(self, uid: bytearray = bytearray()):
+        """
+        Drops the cached layout of a card
+
+        :param  uid:   uid of the card, empty to drop all cached layouts
+        """
+        if (uid):
+            self._cards.pop(bytes(uid), None)
+        else:
+            self._cards.clear()
+        self._selected = None
+
+    def getVersion(self, uid: bytearray = bytearray()) -> (bool, Optional[DesfireVersion]):
+        """
+        Reads the hardware and software versions of the card
+
+        :param  uid:   uid of the card, used to cache the version. Pass an empty uid to always query the card.
+        :returns: (result, version)
+        """
+        version = self._cached(uid, ('version',))
+        if (version is not None):
+            return True, version
+
+        success, response, _ = self.command(DESFIRE_CMD_GET_VERSION)
+        if (not success or len(response) < 28):
+            return False, None
+
+        version = DesfireVersion(response[0:7], response[7:14], response[14:21], response[21:26], response[26], response[27])
+        self._cache(uid, ('version',), version)
+        return True, version
+
+    def getApplicationIds(self, uid: bytearray = bytearray()) -> (bool, List[int]):
+        """
+        Lists the applications of the card (the PICC level must be selected)
+
+        :param  uid:   uid of the card, used to cache the list
+        :returns: (result, aids)
+        """
+        aids = self._cached(uid, ('aids',))
+        if (aids is not None):
+            return True, aids
+
+        success, response, _ = self.command(DESFIRE_CMD_GET_APPLICATION_IDS)
+        if (not success):
+            return False, []
+
+        aids = [int.from_bytes(response[i:i + 3], byteorder='little') for i in range(0, len(response) - 2, 3)]
+        self._cache(uid, ('aids',), aids)
+        return True, aids
+
+    def selectApplication(self, aid: int, uid: bytearray = bytearray()) -> bool:
+        """
+        Selects an application, nothing is sent if it is already selected since the card was activated
+
+        :param  aid:    3 bytes application id, DESFIRE_PICC_AID for the PICC level
+        :param  uid:    uid of the card
+        :returns: True if the application is selected
+        """
+        selected = (self.pn532.activations, bytes(uid), aid)
+        if (uid and self._selected == selected):
+            return True
+
+        self._selected = None
+        success, _, _ = self.command(DESFIRE_CMD_SELECT_APPLICATION, aid.to_bytes(3, byteorder='little'))
+        if (not success):
+            return False
+
+        self._selected = selected
+        return True
+
+    def _currentAid(self) -> Optional[int]:
+        return self._selected[2] if (self._selected is not None and
+                                     self._selected[0] == self.pn532.activations) else None
+
+    def getFileIds(self, uid: bytearray = bytearray()) -> (bool, List[int]):
+        """
+        Lists the files of the selected application
+
+        :param  uid:   uid of the card, used to cache the list per application
+        :returns: (result, file numbers)
+        """
+        key = ('files', self._currentAid())
+        fileIds = self._cached(uid, key) if key[1] is not None else None
+        if (fileIds is not None):
+            return True, fileIds
+
+        success, response, _ = self.command(DESFIRE_CMD_GET_FILE_IDS)
+        if (not success):
+            return False, []
+
+        fileIds = list(response)
+        if (key[1] is not None):
+            self._cache(uid, key, fileIds)
+        return True, fileIds
+
+    def getFileSettings(self, fileNo: int, uid: bytearray = bytearray()) -> (bool, Optional[DesfireFileSettings]):
+        """
+        Reads the settings of a file of the selected application
+
+        :param  fileNo:     file number
+        :param  uid:        uid of the card, used to cache the settings per application and file
+        :returns: (result, settings)
+        """
+        key = ('settings', self._currentAid(), fileNo)
+        settings = self._cached(uid, key) if key[1] is not None else None
+        if (settings is not None):
+            return True, settings
+
+        success, response, _ = self.command(DESFIRE_CMD_GET_FILE_SETTINGS, bytes([fileNo]))
+        if (not success):
+            return False, None
+
+        settings = parseFileSettings(response)
+        if (settings is None):
+            DMSG("Unknown file settings\n")
+            return False, None
+        if (key[1] is not None):
+            self._cache(uid, key, settings)
+        return True, settings
+
+    def readData(self, fileNo: int, offset: int = 0, length: int = 0) -> (bool, bytearray):
+        """
+        Reads a standard or backup data file in one command, the card returns
+        the data in as many additional frames as needed
+
+        :param  fileNo:     file number
+        :param  offset:     first byte to read
+        :param  length:     number of bytes to read, 0 to read up to the end of the file
+        :returns: (result, data)
+        """
+        success, response, _ = self.command(DESFIRE_CMD_READ_DATA, bytes([fileNo]) + offset.to_bytes(3, byteorder='little') +
+                                            length.to_bytes(3, byteorder='little'))
+        if (not success):
+            return False, bytearray()
+        return True, response
+
+    def writeData(self, fileNo: int, data: bytes, offset: int = 0, uid: bytearray = bytearray()) -> bool:
+        """
+        Writes a standard or backup data file, data longer than a frame is sent in additional frames.
+        Backup files need a CommitTransaction to keep the data.
+
+        :param  fileNo:     file number
+        :param  data:       data to write
+        :param  offset:     first byte to write
+        :param  uid:        uid of the card, passed to the write listeners
+        :returns: True if the card accepted the data
+        """
+        success, _, _ = self.command(DESFIRE_CMD_WRITE_DATA, bytes([fileNo]) + offset.to_bytes(3, byteorder='little') +
+                                     len(data).to_bytes(3, byteorder='little') + bytes(data))
+        if (success):
+            self.pn532.notifyWrite(uid)
+        return success
+
+    def getValue(self, fileNo: int) -> (bool, int):
+        """
+        Reads the value of a value file
+
+        :param  fileNo:     file number
+        :returns: (result, value)
+        """
+        success, response, _ = self.command(DESFIRE_CMD_GET_VALUE, bytes([fileNo]))
+        if (not success or len(response) < 4):
+            return False, 0
+        return True, int.from_bytes(response[:4], byteorder='little', signed=True)
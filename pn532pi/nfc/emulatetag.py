@@ -3,8 +3,9 @@
     @author   Armin Wieser
     @license  BSD
     """
-from typing import Callable, Any
+from typing import Callable, Any, List
 
+from pn532pi.nfc import ndef
 from pn532pi.nfc.pn532 import Pn532, PN532_COMMAND_TGINITASTARGET
 from pn532pi.nfc.pn532_log import DMSG
 
@@ -79,6 +80,19 @@ class EmulateTag:
 
         self.ndef_file = bytearray([ndefLength >> 8, ndefLength & 0xFF]) + ndef
 
+    def setNdefMessage(self, records: List[ndef.NdefRecord]):
+        """
+        Sets the NDEF file from records, see pn532pi.nfc.ndef
+        """
+        self.setNdefFile(ndef.encodeMessage(records))
+
+    def getNdefMessage(self) -> List[ndef.NdefRecord]:
+        """
+        Returns the records of the NDEF file, e.g. after a write by the initiator
+        """
+        content, length = self.getContent()
+        return ndef.parseMessage(content[:length])
+
     def setUid(self, uid: bytearray = bytearray()):
         self.uid = uid
 
@@ -215,6 +229,7 @@ class EmulateTag:
                         self.ndef_file = self.ndef_file[:p1p2_length] + rx_data[C_APDU_DATA: C_APDU_DATA + lc] + self.ndef_file[p1p2_length + lc:]
                         out_buf = self.setResponse(RESPCMD_COMMAND_COMPLETE)
                         self.tagWrittenByInitiator = True
+                        self.pn532.notifyWrite(self.uid)
 
                         ndef_length = (self.ndef_file[0] << 8) + self.ndef_file[1]
                         if ((ndef_length > 0) and (self.updateNdefCallback != None)):
@@ -0,0 +1,206 @@
+"""
+    isodep: ISO14443-4 (ISO-DEP) APDU layer
+    Commands and responses of any size are chained through the MI bit of InDataExchange,
+    host frames are sized from the FSC of the card so that each one fits in a single I-block
+"""
+from typing import List, NamedTuple, Optional
+
+from pn532pi.nfc.pn532 import Pn532, PN532_BAUDRATE_424KBPS
+from pn532pi.nfc.pn532_log import DMSG
+
+# ATS format byte (T0)
+ATS_TA_PRESENT                      = (0x10)
+ATS_TB_PRESENT                      = (0x20)
+ATS_TC_PRESENT                      = (0x40)
+ATS_FSCI_DEFAULT                    = 2
+ATS_FWI_DEFAULT                     = 4
+
+ISODEP_FSC = [16, 24, 32, 40, 48, 64, 96, 128, 256]
+ISODEP_BLOCK_OVERHEAD               = 3     # PCB and CRC of an I-block (no CID, no NAD)
+ISODEP_MAX_FRAME                    = 252   # data of an InDataExchange normal information frame
+ISODEP_FWT_UNIT                     = 256 * 16 / 13560.0  # ms, FWT = unit * 2^FWI
+ISODEP_TIMEOUT_MARGIN               = 1000  # ms added to the FWT for the host/PN532 round trip
+
+# Status words
+SW1_MORE_DATA                       = (0x61)  # SW2 bytes still available with GET RESPONSE
+SW1_WRONG_LE                        = (0x6C)  # resend with Le = SW2
+ISO7816_INS_GET_RESPONSE            = (0xC0)
+
+
+class AtsParameters(NamedTuple):
+    """
+    Protocol parameters of an ISO-DEP card announced in its ATS
+    """
+    fsc: int                # max frame size the card accepts, in bytes
+    fwi: int                # frame waiting time integer
+    sfgi: int               # start-up frame guard time integer
+    cid: bool               # card supports CID
+    nad: bool               # card supports NAD
+    ta: int = 0             # TA1 data rates, 0 for 106 kbps only
+
+    @property
+    def fwt(self) -> float:
+        """Frame waiting time in ms"""
+        return ISODEP_FWT_UNIT * (1 << self.fwi)
+
+    @property
+    def baud_rates(self) -> List[int]:
+        """Data rates above 106 kbps the card supports in both directions (PN532_BAUDRATE_*)"""
+        # DS (card to reader) in bits 5..7, DR (reader to card) in bits 1..3, 212 kbps first
+        return [rate for rate in (1, 2, 3) if (self.ta >> (rate + 3)) & (self.ta >> (rate - 1)) & 1]
+
+
+def parseAts(ats: bytearray) -> AtsParameters:
+    """
+    Parses the ATS of an ISO14443-4A card (see Iso14443ATarget.ats), missing fields take their default value
+
+    :param  ats:    ATS starting with its length byte TL
+    :returns: AtsParameters
+    """
+    fsci, fwi, sfgi, cid, nad, ta = ATS_FSCI_DEFAULT, ATS_FWI_DEFAULT, 0, True, False, 0
+    if (len(ats) >= 2):
+        t0 = ats[1]
+        fsci = t0 & 0x0F
+        pos = 2
+        if ((t0 & ATS_TA_PRESENT) and pos < len(ats)):
+            ta = ats[pos]
+            pos += 1
+        if ((t0 & ATS_TB_PRESENT) and pos < len(ats)):
+            fwi, sfgi = ats[pos] >> 4, ats[pos] & 0x0F
+            pos += 1
+        if ((t0 & ATS_TC_PRESENT) and pos < len(ats)):
+            cid, nad = bool(ats[pos] & 0x02), bool(ats[pos] & 0x01)
+
+    fwi = ATS_FWI_DEFAULT if fwi == 15 else fwi     # 15 is RFU
+    return AtsParameters(ISODEP_FSC[min(fsci, len(ISODEP_FSC) - 1)], fwi, sfgi, cid, nad, ta)
+
+
+def buildApdu(cla: int, ins: int, p1: int, p2: int, data: bytes = b'', le: Optional[int] = None) -> bytearray:
+    """
+    Builds a command APDU, in extended length form when data or le do not fit the short form
+
+    :param  data:   command data (Lc is omitted when empty)
+    :param  le:     max number of response bytes expected, None for no Le field
+                    (256 for a short APDU or 65536 for an extended one mean 'as many as available')
+    """
+    apdu = bytearray([cla, ins, p1, p2])
+    if (len(data) <= 0xFF and (le is None or le <= 0x100)):
+        if (data):
+            apdu.append(len(data))
+            apdu += data
+        if (le is not None):
+            apdu.append(le & 0xFF)
+        return apdu
+
+    apdu.append(0x00)
+    if (data):
+        apdu += len(data).to_bytes(2, byteorder='big')
+        apdu += data
+    if (le is not None):
+        apdu += (le & 0xFFFF).to_bytes(2, byteorder='big')
+    return apdu
+
+
+def _leLength(apdu: bytes) -> int:
+    """
+    Size of the Le field of a command APDU: 0 (cases 1 and 3), 1 (short form) or 2 (extended form)
+    """
+    body = len(apdu) - 4
+    if (body <= 0):
+        return 0
+    if (body == 1):
+        return 1
+    if (apdu[4] != 0):
+        return 1 if body == 2 + apdu[4] else 0
+    if (body == 3):
+        return 2
+    return 2 if body == 5 + ((apdu[5] << 8) | apdu[6]) else 0
+
+
+class IsoDep:
+    def __init__(self, pn532: Pn532, ats: bytearray = bytearray()):
+        """
+        :param  pn532:  Pn532 with the card inlisted (see Pn532.readPassiveTarget with inlist=True)
+        :param  ats:    ATS of the card, the default FSC and FWI are used if empty
+        """
+        self.pn532 = pn532
+        self.params = parseAts(ats)
+        self.frameSize = min(self.params.fsc - ISODEP_BLOCK_OVERHEAD, ISODEP_MAX_FRAME)
+        self.timeout = int(self.params.fwt) + ISODEP_TIMEOUT_MARGIN
+
+    def upgradeBaudRate(self, maxRate: int = PN532_BAUDRATE_424KBPS) -> int:
+        """
+        Switches the card to the highest data rate announced in its ATS (PPS), up to maxRate.
+        The card stays at 106 kbps if it refuses every faster rate.
+
+        :param  maxRate:    fastest data rate to try (PN532_BAUDRATE_*)
+        :returns: data rate in use (PN532_BAUDRATE_*)
+        """
+        rates = [rate for rate in self.params.baud_rates if rate <= maxRate]
+        return self.pn532.inUpgradeBaudRate(self.pn532.inListedTag, rates)
+
+    def transceive(self, data: bytearray) -> (bool, bytearray):
+        """
+        Sends data of any size to the card and returns its whole response.
+        The data is sent in frames of the card FSC chained with the MI bit,
+        a chained response is gathered by Pn532.inDataExchange.
+
+        :param  data:   command (APDU or native command)
+        :returns: (result, response)
+        """
+        for offset in range(0, len(data) - self.frameSize, self.frameSize):
+            success, _ = self.pn532.inDataExchange(data[offset:offset + self.frameSize], more=True, timeout=self.timeout)
+            if (not success):
+                return False, bytearray()
+
+        last = (max(len(data) - 1, 0) // self.frameSize) * self.frameSize
+        return self.pn532.inDataExchange(data[last:], timeout=self.timeout)
+
+    def transmit(self, apdu: bytearray) -> (bool, bytearray):
+        """
+        Sends a command APDU and returns the complete response APDU.
+        61xx status words are followed by GET RESPONSE commands until all the data is received,
+        a 6Cxx status word (wrong Le) resends the command with the Le given by the card.
+
+        :param  apdu:   command APDU (see buildApdu)
+        :returns: (result, response)
+                    result: bool True if a response APDU was received, whatever its status word
+                    response: response data followed by SW1 SW2
+        """
+        success, response = self.transceive(apdu)
+        if (not success or len(response) < 2):
+            return False, bytearray()
+
+        leLength = _leLength(apdu)
+        if (response[-2] == SW1_WRONG_LE and leLength):
+            DMSG("Wrong Le, resending\n")
+            le = (response[-1] if leLength == 1 else response[-1] or 0x100).to_bytes(leLength, byteorder='big')
+            success, response = self.transceive(bytearray(apdu[:-leLength]) + le)
+            if (not success or len(response) < 2):
+                return False, bytearray()
+
+        data = response[:-2]
+        while (response[-2] == SW1_MORE_DATA):
+            DMSG("Getting {} more bytes\n".format(response[-1] or 256))
+            success, response = self.transceive(
+                buildApdu(apdu[0] & 0x03, ISO7816_INS_GET_RESPONSE, 0x00, 0x00, le=response[-1] or 0x100))
+            if (not success or len(response) < 2):
+                return False, bytearray()
+            data += response[:-2]
+
+        return True, data + response[-2:]
+
+    def command(self, cla: int, ins: int, p1: int, p2: int, data: bytes = b'',
+                le: Optional[int] = None) -> (bool, bytearray, int):
+        """
+        Builds and sends a command APDU
+
+        :returns: (result, data, sw)
+                    result: bool True if a response APDU was received
+                    data: response data without the status word
+                    sw: status word (e.g. 0x9000)
+        """
+        success, response = self.transmit(buildApdu(cla, ins, p1, p2, data, le))
+        if (not success):
+            return False, bytearray(), 0
+        return True, response[:-2], (response[-2] << 8) | response[-1]
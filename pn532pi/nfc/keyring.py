@@ -0,0 +1,217 @@
+"""
+    keyring: Mifare Classic key management
+    Candidate keys per sector, a cache of the key that last opened each (uid, sector)
+    and an optional JSON file to keep that cache between runs
+"""
+import binascii
+import json
+from collections import Counter, OrderedDict
+from typing import Iterable, List, Optional, Tuple
+
+from pn532pi.nfc.pn532 import Pn532
+from pn532pi.nfc.pn532_log import DMSG
+
+MIFARE_KEY_DEFAULT                  = b'\xFF\xFF\xFF\xFF\xFF\xFF'  # factory default key
+MIFARE_KEY_MAD                      = b'\xA0\xA1\xA2\xA3\xA4\xA5'  # public key A of the MAD sectors
+MIFARE_KEY_NDEF                     = b'\xD3\xF7\xD3\xF7\xD3\xF7'  # public key A of NDEF sectors
+
+MIFARE_KEYRING_CACHE_SIZE           = 256     # number of (uid, sector) whose key is remembered
+
+MifareKey = Tuple[int, bytes]   # (key type: 0 = key A, 1 = key B, 6 bytes key)
+
+
+class MifareKeyring:
+    def __init__(self, pn532: Pn532, keys: Iterable[bytes] = (MIFARE_KEY_DEFAULT, MIFARE_KEY_MAD, MIFARE_KEY_NDEF),
+                 cacheSize: int = MIFARE_KEYRING_CACHE_SIZE, path: Optional[str] = None):
+        """
+        :param  pn532:      Pn532 used to authenticate
+        :param  keys:       candidate keys tried on every sector
+        :param  cacheSize:  number of (uid, sector) whose last successful key is remembered
+        :param  path:       JSON file the cache is loaded from and saved to, None to keep it in memory only.
+                            The file holds plain keys, keep it somewhere only trusted users can read.
+        """
+        self.pn532 = pn532
+        self.cacheSize = cacheSize
+        self.path = path
+        self._keys = []                         # candidate keys for every sector
+        self._sectorKeys = {}                   # sector -> candidate keys for that sector only
+        self._cache = OrderedDict()             # (uid, sector) -> MifareKey, most recently used last
+        self._hits = Counter()                  # MifareKey -> number of successful authentications
+        self._attempts = Counter()              # MifareKey -> number of authentications tried
+
+        for key in keys:
+            self.addKey(key)
+
+        if (path is not None):
+            self.load()
+
+    def addKey(self, key: bytes, sectors: Optional[Iterable[int]] = None):
+        """
+        Adds a candidate key
+
+        :param  key:        6 bytes key
+        :param  sectors:    sectors the key is tried on, None for all sectors
+        """
+        key = bytes(key[:6])
+        if (sectors is None):
+            if (key not in self._keys):
+                self._keys.append(key)
+            return
+
+        for sector in sectors:
+            sectorKeys = self._sectorKeys.setdefault(sector, [])
+            if (key not in sectorKeys):
+                sectorKeys.append(key)
+
+    def candidates(self, uid: bytearray, sector: int) -> List[MifareKey]:
+        """
+        Returns the keys to try on a sector, in order: the key that opened the sector last time,
+        then the candidate keys (key A and key B) ordered by success rate
+
+        :param  uid:        uid of the card
+        :param  sector:     sector to authenticate
+        :returns: list of (key type, key)
+        """
+        keys = [(keyNumber, key)
+                for key in self._sectorKeys.get(sector, []) + self._keys
+                for keyNumber in (0, 1)]
+        # sorted() is stable, keys with the same success rate keep their configured order
+        keys = sorted(OrderedDict.fromkeys(keys), key=lambda k: -self.successRate(k))
+
+        cached = self._cache.get((bytes(uid), sector))
+        if (cached is not None):
+            keys = [cached] + [k for k in keys if k != cached]
+
+        return keys
+
+    def successRate(self, key: MifareKey) -> float:
+        """
+        Estimated probability that a key opens a sector: (hits + 1) / (attempts + 2),
+        0.5 for a key never tried so it goes before keys that keep failing
+
+        :param  key:    (key type, key)
+        """
+        hits = self._hits[key]
+        return (hits + 1) / (max(self._attempts[key], hits) + 2)
+
+    def authenticate(self, uid: bytearray, sector: int) -> (bool, Optional[MifareKey]):
+        """
+        Authenticates a sector, trying the candidate keys until one is accepted.
+        The card is selected again after every rejected key.
+
+        :param  uid:        uid of the card
+        :param  sector:     sector to authenticate
+        :returns: (result, key)
+                    result: bool True if a key was accepted, False if none was
+                    key: (key type, key) accepted by the card
+        """
+        block = self.pn532.mifareclassic_SectorFirstBlock(sector)
+        for keyNumber, key in self.candidates(uid, sector):
+            self._attempts[(keyNumber, key)] += 1
+            if (self.pn532.mifareclassic_AuthenticateBlock(uid, block, keyNumber, key)):
+                self._remember(uid, sector, (keyNumber, key))
+                return True, (keyNumber, key)
+
+            # A failed authentication halts the card
+            if (not self.pn532.mifareclassic_Reactivate(uid)):
+                DMSG("Card lost\n")
+                break
+
+        self._cache.pop((bytes(uid), sector), None)
+        return False, None
+
+    def readSector(self, uid: bytearray, sector: int) -> (bool, List[bytearray]):
+        """
+        Authenticates a sector with the keyring and reads all of its blocks
+
+        :param  uid:        uid of the card
+        :param  sector:     sector to read
+        :returns: (result, blocks) as returned by Pn532.mifareclassic_ReadSector
+        """
+        success, key = self.authenticate(uid, sector)
+        if (not success):
+            return False, []
+
+        # the sector is already authenticated, this does not exchange the key again
+        return self.pn532.mifareclassic_ReadSector(uid, sector, key[0], key[1])
+
+    def keyFor(self, uid: bytearray, sector: int) -> Optional[MifareKey]:
+        """
+        Returns the key that last opened a sector, None if unknown
+        """
+        return self._cache.get((bytes(uid), sector))
+
+    def forget(self, uid: bytearray = bytearray()):
+        """
+        Drops the cached keys of a card
+
+        :param  uid:   uid of the card, empty to drop all cached keys
+        """
+        if (not uid):
+            self._cache.clear()
+            return
+
+        uid = bytes(uid)
+        for cacheKey in [k for k in self._cache if k[0] == uid]:
+            del self._cache[cacheKey]
+
+    def _remember(self, uid: bytearray, sector: int, key: MifareKey):
+        self._hits[key] += 1
+        cacheKey = (bytes(uid), sector)
+        self._cache[cacheKey] = key
+        self._cache.move_to_end(cacheKey)
+        while (len(self._cache) > self.cacheSize):
+            self._cache.popitem(last=False)
+
+    def load(self) -> bool:
+        """
+        Loads the key cache and success counts from path
+
+        :returns: True if the file was loaded, False if it does not exist or is invalid
+        """
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            if (not isinstance(data, dict)):
+                DMSG("Unable to load keyring: not a keyring file\n")
+                return False
+            cache = [((binascii.unhexlify(uid), sector), (keyNumber, binascii.unhexlify(key)))
+                     for uid, sector, keyNumber, key in data.get('cache', [])]
+            hits = {(keyNumber, binascii.unhexlify(key)): count
+                    for keyNumber, key, count in data.get('hits', [])}
+            attempts = {(keyNumber, binascii.unhexlify(key)): count
+                        for keyNumber, key, count in data.get('attempts', [])}
+        except (OSError, ValueError, TypeError) as e:
+            DMSG("Unable to load keyring: {}\n".format(e))
+            return False
+
+        for cacheKey, key in cache:
+            self._cache[cacheKey] = key
+        while (len(self._cache) > self.cacheSize):
+            self._cache.popitem(last=False)
+        self._hits.update(hits)
+        self._attempts.update(attempts)
+        return True
+
+    def save(self) -> bool:
+        """
+        Saves the key cache and success counts to path
+
+        :returns: True if the file was written, False for an error
+        """
+        data = {
+            'cache': [[binascii.hexlify(uid).decode(), sector, keyNumber, binascii.hexlify(key).decode()]
+                      for (uid, sector), (keyNumber, key) in self._cache.items()],
+            'hits': [[keyNumber, binascii.hexlify(key).decode(), count]
+                     for (keyNumber, key), count in self._hits.items()],
+            'attempts': [[keyNumber, binascii.hexlify(key).decode(), count]
+                         for (keyNumber, key), count in self._attempts.items()],
+        }
+        try:
+            with open(self.path, 'w') as f:
+                json.dump(data, f)
+        except (OSError, TypeError) as e:
+            DMSG("Unable to save keyring: {}\n".format(e))
+            return False
+
+        return True
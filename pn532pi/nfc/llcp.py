@@ -1,22 +1,40 @@
 from pn532pi.nfc.macLink import MacLink
-from pn532pi.nfc.pn532 import Pn532
+from pn532pi.nfc.pn532 import Pn532, PN532_BAUDRATE_106KBPS, PN532_BAUDRATE_424KBPS
 
 # LLCP PDU Type Values
 from pn532pi.nfc.pn532_log import DMSG
 
 PDU_SYMM = 0x00
 PDU_PAX = 0x01
+PDU_AGF = 0x02
 PDU_CONNECT = 0x04
 PDU_DISC = 0x05
 PDU_CC = 0x06
 PDU_DM = 0x07
 PDU_I = 0x0c
 PDU_RR = 0x0d
+PDU_RNR = 0x0e
 
 LLCP_DEFAULT_DSAP     = 0x04
 LLCP_DEFAULT_TIMEOUT  = 20000
 LLCP_DEFAULT_SSAP     = 0x20
 
+# LLCP parameters (TLV) of CONNECT and CC PDUs
+PARAM_VERSION = 0x01
+PARAM_MIUX = 0x02
+PARAM_WKS = 0x03
+PARAM_LTO = 0x04
+PARAM_RW = 0x05
+PARAM_SN = 0x06
+
+LLCP_DEFAULT_MIU      = 128     # MIU without MIUX parameter
+LLCP_LOCAL_MIU        = 248     # largest information field fitting a PN532 frame with the 3 bytes I PDU header
+LLCP_DEFAULT_RW       = 1       # receive window without RW parameter
+LLCP_MAX_RW           = 15
+LLCP_SEQ_MODULO       = 16
+LLCP_MAGIC            = b'\x46\x66\x6D'     # start of the LLCP parameters in the ATR general bytes
+LLCP_VERSION          = 0x10    # 1.0
+
 
 def buildHeader(dsap, ptype, ssap, ns = None, nr = None):
     """Assembles an llcp header
@@ -36,6 +54,59 @@ def buildHeader(dsap, ptype, ssap, ns = None, nr = None):
         seq_bits = ((ns & 0xf) << 4) | (nr & 0xf)
         return bytearray(req_header_bytes + [seq_bits])
 
+def encodeParameters(params) -> bytearray:
+    """Encodes (type, value) LLCP parameters as TLVs"""
+    buf = bytearray()
+    for ptype, value in params:
+        buf += bytearray([ptype, len(value)]) + value
+    return buf
+
+
+def parseParameters(buf) -> dict:
+    """Parses the LLCP parameter TLVs of a CONNECT or CC PDU information field, type -> value"""
+    params = {}
+    pos = 0
+    while pos + 2 <= len(buf):
+        ptype, length = buf[pos], buf[pos + 1]
+        params[ptype] = bytes(buf[pos + 2:pos + 2 + length])
+        pos += 2 + length
+    return params
+
+
+def buildGeneralBytes(params) -> bytearray:
+    """Assembles the ATR general bytes announcing LLCP: the magic number then the (type, value) parameters"""
+    return bytearray(LLCP_MAGIC) + encodeParameters(params)
+
+
+# general bytes of both activation modes: version and link MIU
+LLCP_GENERAL_BYTES = buildGeneralBytes([
+    (PARAM_VERSION, bytes([LLCP_VERSION])),
+    (PARAM_MIUX, (LLCP_LOCAL_MIU - LLCP_DEFAULT_MIU).to_bytes(2, byteorder='big')),
+])
+
+
+def buildAggregated(pdus) -> bytearray:
+    """Assembles an AGF PDU carrying the given PDUs, each prefixed by its 2 bytes length"""
+    buf = buildHeader(0, PDU_AGF, 0)
+    for pdu in pdus:
+        buf += len(pdu).to_bytes(2, byteorder='big') + pdu
+    return buf
+
+
+def parseAggregated(buf) -> list:
+    """Splits the information field of an AGF PDU into the PDUs it carries"""
+    pdus = []
+    pos = 0
+    while pos + 2 <= len(buf):
+        length = (buf[pos] << 8) | buf[pos + 1]
+        if (length < 2 or pos + 2 + length > len(buf)):
+            DMSG("Malformed AGF PDU\n")
+            break
+        pdus.append(bytearray(buf[pos + 2:pos + 2 + length]))
+        pos += 2 + length
+    return pdus
+
+
 def getPType(buf) -> int:
     return ((buf[0] & 0x3) << 2) + (buf[1] >> 6)
 
@@ -50,28 +121,177 @@ def getDSAP(buf):
 class Llcp:
     SYMM_PDU = [0, 0]
 
-    def __init__(self, interface: Pn532):
+    def __init__(self, interface: Pn532, rw: int = LLCP_MAX_RW):
+        """
+        :param  interface:  Pn532
+        :param  rw:         receive window advertised to the peer (0..15)
+        """
         self.link = MacLink(interface)
-        self.ns = 0
-        self.nr = 0
+        self.ns = 0         # V(S), N(S) of the next I PDU sent
+        self.nr = 0         # V(R), N(S) of the next I PDU expected
+        self.va = 0         # V(SA), N(S) of the oldest I PDU not acknowledged by the peer
         self.mode = 0
         self.dsap = 0
         self.ssap = 0
+        self.rw = min(rw, LLCP_MAX_RW)
+        self.remoteRw = LLCP_DEFAULT_RW
+        self.remoteMiu = LLCP_DEFAULT_MIU
+        self.linkMiu = LLCP_DEFAULT_MIU     # link MIU of the peer, from the ATR general bytes or a PAX PDU
+        self._remoteBusy = False    # the peer does not accept I PDUs (RW 0 or RNR) until its next RR
+        self._owed = False      # a PDU was read and the link waits for ours
+        self._ackPending = False    # I PDUs were received and not acknowledged yet
+        self._received = []     # information fields received while sending, not read yet
+        self._inbox = []        # (status, PDU) of the last frame of the peer not handled yet (AGF)
+        self._outbox = []       # (header, body) of the PDUs of our next frame
+
+    def _reset(self):
+        self.ns = self.nr = self.va = 0
+        self.remoteRw = LLCP_DEFAULT_RW
+        self.remoteMiu = LLCP_DEFAULT_MIU
+        self._remoteBusy = False
+        self._owed = self._ackPending = False
+        self._received = []
+        self._inbox = []
+        self._outbox = []
+
+    def _connectionParameters(self) -> bytearray:
+        return encodeParameters([
+            (PARAM_MIUX, (LLCP_LOCAL_MIU - LLCP_DEFAULT_MIU).to_bytes(2, byteorder='big')),
+            (PARAM_RW, bytes([self.rw])),
+        ])
+
+    def _setRemoteParameters(self, info):
+        params = parseParameters(info)
+        if (PARAM_MIUX in params):
+            self.remoteMiu = LLCP_DEFAULT_MIU + (int.from_bytes(params[PARAM_MIUX], byteorder='big') & 0x7FF)
+        if (PARAM_RW in params and params[PARAM_RW]):
+            self.remoteRw = params[PARAM_RW][0] & 0x0F
+        self._remoteBusy = self.remoteRw == 0
+        DMSG("remote MIU {}, RW {}\n".format(self.remoteMiu, self.remoteRw))
+
+    def _setLinkParameters(self, info):
+        """Sets the link MIU of the peer from the parameters of its general bytes or PAX PDU"""
+        params = parseParameters(info)
+        self.linkMiu = LLCP_DEFAULT_MIU
+        if (PARAM_MIUX in params):
+            self.linkMiu = LLCP_DEFAULT_MIU + (int.from_bytes(params[PARAM_MIUX], byteorder='big') & 0x7FF)
+        DMSG("link MIU {}\n".format(self.linkMiu))
+
+    def _activated(self, status: int) -> int:
+        """Reads the link parameters of the peer once the link is activated, returns status"""
+        generalBytes = self.link.generalBytes
+        if (0 < status):
+            self._setLinkParameters(generalBytes[len(LLCP_MAGIC):] if generalBytes[:len(LLCP_MAGIC)] == LLCP_MAGIC
+                                    else bytearray())
+        return status
+
+    def _aggregateMiu(self) -> int:
+        """
+        Largest information field of an AGF PDU: the link MIU of the peer, which is at least
+        the MIU of the connection, and no more than a PN532 frame holds
+        """
+        return min(max(self.linkMiu, self.remoteMiu), LLCP_LOCAL_MIU)
+
+    def _receive(self, status: int, data: bytearray):
+        """Queues the PDUs of a frame of the peer, unpacking AGF PDUs"""
+        if (2 <= status and PDU_AGF == getPType(data)):
+            pdus = parseAggregated(data[2:status])
+            # an empty aggregate only gives the turn back, like a SYMM PDU
+            self._inbox += [(len(pdu), pdu) for pdu in pdus] or [(2, bytearray(self.SYMM_PDU))]
+        else:
+            self._inbox.append((status, data))
+
+    def _read(self) -> (int, bytearray):
+        if (not self._inbox):
+            status, data = self.link.read()
+            if (0 > status):
+                self._owed = False
+                return status, data
+            self._receive(status, data)
+
+        status, data = self._inbox.pop(0)
+        self._owed = True
+        return status, data
+
+    def _write(self, header: bytearray, body: bytearray = bytearray(), more: bool = False) -> bool:
+        """
+        Queues a PDU for our next frame. The frame is sent once every PDU of the last frame
+        of the peer is handled, several PDUs go out in an AGF PDU.
+
+        :param  more:   more PDUs follow, keep the frame open
+        """
+        self._owed = False
+        ptype = getPType(header)
+        if (ptype == PDU_SYMM and (self._inbox or self._outbox)):
+            # the turn is given back by the queued PDUs
+            return True if self._inbox else self._transmit()
+        if (ptype in (PDU_I, PDU_RR)):
+            # N(R) of this PDU supersedes the RR PDUs queued for the same connection
+            self._outbox = [(h, b) for h, b in self._outbox
+                            if not (getPType(h) == PDU_RR and h[:2] == buildHeader(getDSAP(header), PDU_RR, getSSAP(header)))]
+        self._outbox.append((header, body))
+        if (more or self._inbox):
+            return True
+        return self._transmit()
+
+    def _transmit(self) -> bool:
+        """
+        Sends one frame: the queued PDUs that fit an AGF PDU the peer accepts (see _aggregateMiu).
+        The PDUs left wait in the queue for our next turn.
+        """
+        miu = self._aggregateMiu()
+        batch = [self._outbox.pop(0)]
+        size = 2 + len(batch[0][0]) + len(batch[0][1])
+        while (self._outbox and
+               size + 2 + len(self._outbox[0][0]) + len(self._outbox[0][1]) <= 2 + miu):
+            batch.append(self._outbox.pop(0))
+            size += 2 + len(batch[-1][0]) + len(batch[-1][1])
+
+        if (len(batch) == 1):
+            success = self.link.write(*batch[0])
+        else:
+            DMSG("Send {} PDUs in an AGF PDU\n".format(len(batch)))
+            success = self.link.write(buildAggregated([bytearray(header) + body for header, body in batch]))
+        if (not success):
+            self._outbox = []
+        return success
+
+    def _flush(self) -> bool:
+        """
+        Gives the turn back to the peer if a PDU was read and not answered:
+        RR if received I PDUs are not acknowledged yet, SYMM otherwise
+        """
+        if (not self._owed):
+            return True
+        if (self._ackPending):
+            self._ackPending = False
+            return self._write(buildHeader(self.dsap, PDU_RR, self.ssap) + bytearray([self.nr]))
+        return self._write(bytearray(self.SYMM_PDU))
 
     def activate(self, timeout: int = 0):
-        return self.link.activateAsTarget(timeout)
+        self._reset()
+        return self._activated(self.link.activateAsTarget(timeout, LLCP_GENERAL_BYTES))
+
+    def activateAsInitiator(self, timeout: int = 1000, active: bool = False,
+                            baudrate: int = PN532_BAUDRATE_106KBPS, maxBaudrate: int = PN532_BAUDRATE_424KBPS) -> int:
+        """
+        Activates the peer with the PN532 as initiator, see MacLink.activateAsInitiator.
+        The other functions work the same in both modes.
+        """
+        self._reset()
+        return self._activated(self.link.activateAsInitiator(timeout, active, baudrate, maxBaudrate,
+                                                            LLCP_GENERAL_BYTES))
     
     def waitForConnection(self, timeout: int = LLCP_DEFAULT_TIMEOUT) -> int:
         type = 0
     
         self.mode = 1
-        self.ns = 0
-        self.nr = 0
+        self._reset()
     
         # Get CONNECT PDU
         DMSG("wait for a CONNECT PDU\n")
         while 1:
-            status, data = self.link.read()
+            status, data = self._read()
             if (2 > status):
                 return -1
 
@@ -79,7 +299,7 @@ class Llcp:
             if (PDU_CONNECT == type):
                 break
             elif (PDU_SYMM == type):
-                if (not self.link.write(bytearray(self.SYMM_PDU))):
+                if (not self._write(bytearray(self.SYMM_PDU))):
                     return -2
             else:
                 return -3
@@ -87,10 +307,13 @@ class Llcp:
 
         # Put CC PDU
         DMSG("put a CC(Connection Complete) PDU to response the CONNECT PDU\n")
+        self._setRemoteParameters(data[2:])
         ssap = getDSAP(data)
         dsap = getSSAP(data)
+        self.ssap = ssap
+        self.dsap = dsap
         header = buildHeader(dsap, PDU_CC, ssap)
-        if (not self.link.write(header)):
+        if (not self._write(header, self._connectionParameters())):
             return -2
 
         return 1
@@ -100,16 +323,19 @@ class Llcp:
     
         # Get DISC PDU
         DMSG("wait for a DISC PDU\n")
+        if (not self._flush()):
+            return -2
         while 1:
-            status, data = self.link.read()
+            status, data = self._read()
             if (2 > status):
                 return -1
 
             type = getPType(data)
             if (PDU_DISC == type):
                 break
-            elif (PDU_SYMM == type):
-                if (not self.link.write(bytearray(self.SYMM_PDU))):
+            elif (type in (PDU_SYMM, PDU_RR, PDU_RNR)):
+                self._process(status, data)    # acknowledgement of the last I PDU written
+                if (not self._write(bytearray(self.SYMM_PDU))):
                     return -2
             else:
                 return -3
@@ -120,7 +346,7 @@ class Llcp:
         # ssap = getDSAP(headerBuf)
         # dsap = getSSAP(headerBuf)
         header = buildHeader(self.dsap, PDU_DM, self.ssap)
-        if (not self.link.write(header)):
+        if (not self._write(header)):
             return -2
 
         return 1
@@ -131,11 +357,10 @@ class Llcp:
         self.mode = 0
         self.dsap = LLCP_DEFAULT_DSAP
         self.ssap = LLCP_DEFAULT_SSAP
-        self.ns = 0
-        self.nr = 0
+        self._reset()
     
         # try to get a SYMM PDU
-        status, data = self.link.read()
+        status, data = self._read()
         if (2 > status):
             return -1
         type = getPType(data)
@@ -147,13 +372,14 @@ class Llcp:
         body = bytearray(b"  urn:nfc:sn:snep")
         body[0] = 0x06
         body[1] = len(body) - 2
-        if (not self.link.write(header, body)):
+        body += self._connectionParameters()
+        if (not self._write(header, body)):
             return -2
 
         # wait for a CC PDU
         DMSG("wait for a CC PDU\n")
         while 1:
-            status, data = self.link.read()
+            status, data = self._read()
             if (2 > status):
                 return -1
 
@@ -161,33 +387,37 @@ class Llcp:
             if (PDU_CC == type):
                 break
             elif (PDU_SYMM == type):
-                if (not self.link.write(bytearray(self.SYMM_PDU))):
+                if (not self._write(bytearray(self.SYMM_PDU))):
                     return -2
             else:
                 return -3
 
+        self._setRemoteParameters(data[2:])
         return 1
 
     def disconnect(self, timeout: int = LLCP_DEFAULT_TIMEOUT) -> int:
         type = 0
     
         # try to get a SYMM PDU
-        status, data = self.link.read()
+        if (not self._flush()):
+            return -2
+        status, data = self._read()
         if (2 > status):
             return -1
         type = getPType(data)
-        if (PDU_SYMM != type):
+        if (type not in (PDU_SYMM, PDU_RR, PDU_RNR)):
             return -1
+        self._process(status, data)    # acknowledgement of the last I PDU written
 
         # put a DISC PDU
         header = buildHeader(LLCP_DEFAULT_DSAP, PDU_DISC, LLCP_DEFAULT_SSAP)
-        if (not self.link.write(header)):
+        if (not self._write(header)):
             return -2
 
         # wait for a DM PDU
         DMSG("wait for a DM PDU\n")
         while 1:
-            status, data = self.link.read()
+            status, data = self._read()
             if (2 > status):
                 return -1
 
@@ -195,7 +425,7 @@ class Llcp:
             if (PDU_CC == type):
                 break
             elif (PDU_DM == type):
-                if (not self.link.write(bytearray(self.SYMM_PDU))):
+                if (not self._write(bytearray(self.SYMM_PDU))):
                     return -2
             else:
                 return -3
@@ -203,67 +433,166 @@ class Llcp:
         return 1
 
     def write(self, header: bytearray, body: bytearray = bytearray()) -> bool:
-
-        if (self.mode):
-            # Get a SYMM PDU
-            status, data = self.link.read()
-            if (2 != status):
-                return False
-
-        full_header = buildHeader(self.dsap, PDU_I, self.ssap, self.ns, self.nr) + header
-
-        if (not self.link.write(full_header, body)):
+        """
+        Sends an I PDU carrying header and body. Waits for the receive window of the peer to allow it
+        but not for its acknowledgement: read, write and send handle the RR PDU that follows.
+
+        :param  header:     start of the information field
+        :param  body:       rest of the information field
+        :returns: True if the I PDU was sent
+        """
+        if (not self._waitForWindow()):
             return False
 
-        self.ns += 1
-    
-        # Get a RR PDU
-        status = 0
-        while 1:
-            status, data = self.link.read()
-            if (2 > status):
-                return False
-
-            type = getPType(data)
-            if (PDU_RR == type):
-                break
-            elif (PDU_SYMM == type):
-                if (not self.link.write(bytearray(self.SYMM_PDU))):
-                    return False
-            else:
-                return False
+        full_header = buildHeader(self.dsap, PDU_I, self.ssap, self.ns, self.nr) + header
 
-        if (not self.link.write(bytearray(self.SYMM_PDU))):
+        self._ackPending = False    # acknowledged by N(R)
+        if (not self._write(full_header, body)):
             return False
 
+        self.ns = (self.ns + 1) % LLCP_SEQ_MODULO
         return True
 
-    def read(self) -> (int, bytearray):
+    def read(self, ack: bool = True) -> (int, bytearray):
+        """
+        Reads the information field of the next I PDU
+
+        :param  ack:    acknowledge it right away with an RR PDU. If False the acknowledgement
+                        is piggybacked on the next I PDU sent (write or send must follow).
+        :returns: (status, data)
+                    status: int, >=0 length of the data, <0 failed
+        """
+        if (self._received):
+            # received while sending, acknowledged with the next PDU
+            data = self._received.pop(0)
+            if (ack and not self._flush()):
+                return -2, bytearray()
+            return len(data), data
+
         # Get INFO PDU
+        if (not self._flush()):
+            return -2, bytearray()
         while 1:
-            status, data = self.link.read()
+            status, data = self._read()
             if (2 > status):
                 return (-1, bytearray())
 
             type = getPType(data)
             if (PDU_I == type):
                 break
-            elif (PDU_SYMM == type):
-                if (not self.link.write(bytearray(self.SYMM_PDU))):
+            elif (type in (PDU_SYMM, PDU_RR, PDU_RNR)):
+                # acknowledgements of the I PDUs written before
+                self._process(status, data)
+                if (not self._write(bytearray(self.SYMM_PDU))):
                     return -2, bytearray()
             else:
                 return -3, bytearray()
 
+        if (3 > status or (data[2] >> 4) != self.nr):
+            DMSG("I PDU out of sequence\n")
+            return -3, bytearray()
+
         blen = status - 3
         self.ssap = getDSAP(data)
         self.dsap = getSSAP(data)
 
+        self.nr = (self.nr + 1) % LLCP_SEQ_MODULO
+        self.va = data[2] & 0x0F
+        if (not ack):
+            self._ackPending = True
+            return (blen, data[3:])
+
         header = buildHeader(self.dsap, PDU_RR, self.ssap)
-        header.append((data[2] >> 4) + 1)   # ns = 0, nr = ns of packet + 1
+        header.append(self.nr)   # ns = 0, nr = ns of packet + 1
 
-        if (not self.link.write(header)):
+        self._ackPending = False
+        if (not self._write(header)):
             return -2, bytearray()
 
-        self.nr += 1
-    
-        return (blen, data[3:])
\ No newline at end of file
+        return (blen, data[3:])
+
+    def _process(self, status: int, data: bytearray) -> int:
+        """
+        Handles a PDU received while sending: acknowledgements update V(SA),
+        information fields are kept for read
+
+        :returns: PDU type, <0 if the connection is lost or the PDU is out of sequence
+        """
+        type = getPType(data)
+        if (type in (PDU_I, PDU_RR, PDU_RNR) and status > 2):
+            self.va = data[2] & 0x0F
+        if (type in (PDU_RR, PDU_RNR)):
+            self._remoteBusy = PDU_RNR == type
+        if (PDU_PAX == type):
+            self._setLinkParameters(data[2:status])
+        if (PDU_I == type):
+            if ((data[2] >> 4) != self.nr):
+                DMSG("I PDU out of sequence\n")
+                return -3
+            self.nr = (self.nr + 1) % LLCP_SEQ_MODULO
+            self._ackPending = True
+            self._received.append(data[3:status])
+        elif (type in (PDU_DISC, PDU_DM)):
+            DMSG("connection closed by the peer\n")
+            return -1
+        return type
+
+    def _window(self) -> int:
+        """Number of unacknowledged I PDUs the peer accepts"""
+        # a busy peer gets SYMM PDUs until it sends an RR, then one I PDU at a time if its RW is 0
+        return 0 if self._remoteBusy else max(self.remoteRw, 1)
+
+    def _waitForWindow(self) -> bool:
+        """
+        Handles the PDUs of the peer until the receive window allows an I PDU and the turn is ours
+
+        :returns: True if an I PDU may be sent, False if the connection is lost
+        """
+        while 1:
+            # every PDU of the last frame is handled first so that ours goes out right away
+            while (not self._owed or self._inbox):
+                status, pdu = self._read()
+                if (2 > status or 0 > self._process(status, pdu)):
+                    return False
+
+            if ((self.ns - self.va) % LLCP_SEQ_MODULO < self._window()):
+                return True
+            if (not self._flush()):
+                return False
+
+    def send(self, data: bytearray) -> bool:
+        """
+        Sends data of any length in as many I PDUs as the MIU of the peer requires.
+        Up to RW I PDUs of the peer are sent before waiting for an acknowledgement, acknowledgements
+        of the data received meanwhile are piggybacked and the data is kept for read.
+        Returns once the peer has acknowledged every I PDU.
+
+        :param  data:   data to send
+        :returns: True if the peer acknowledged all the data
+        """
+        size = min(self.remoteMiu, LLCP_LOCAL_MIU)
+        offset = 0
+        while 1:
+            if (not self._owed):
+                status, pdu = self._read()
+                if (2 > status or 0 > self._process(status, pdu)):
+                    return False
+
+            window = self._window()
+            unacked = (self.ns - self.va) % LLCP_SEQ_MODULO
+            if (offset < len(data) and unacked < window):
+                # every I PDU the window allows goes in the same frame
+                while (offset < len(data) and unacked < window):
+                    header = buildHeader(self.dsap, PDU_I, self.ssap, self.ns, self.nr)
+                    self._ackPending = False    # acknowledged by N(R)
+                    unacked += 1
+                    more = offset + size < len(data) and unacked < window
+                    if (not self._write(header, data[offset:offset + size], more)):
+                        return False
+                    self.ns = (self.ns + 1) % LLCP_SEQ_MODULO
+                    offset += size
+            elif (offset >= len(data) and unacked == 0):
+                # the turn stays ours: the next PDU may carry more data or acknowledgements
+                return True
+            elif (not self._flush()):
+                return False
\ No newline at end of file
@@ -1,16 +1,83 @@
-from pn532pi.nfc.pn532 import Pn532
+from pn532pi.nfc.pn532 import Pn532, PN532_BAUDRATE_106KBPS, PN532_BAUDRATE_424KBPS
+from pn532pi.nfc.pn532_log import DMSG
+
+SYMM_PDU = bytearray([0, 0])
+
+ATR_REQ_GI_OFFSET = 17      # LEN, CMD 0xD4 0x00, NFCID3i (10), DIDi, BSi, BRi, PPi, then the general bytes
 
 
 class MacLink:
     def __init__(self, interface: Pn532):
         self.pn532 = interface
+        self.initiator = False
+        self.target = None      # DepTarget activated as initiator
+        self.generalBytes = bytearray()     # general bytes of the peer (ATR_REQ or ATR_RES), e.g. LLCP parameters
+        self._response = None   # PDU received in reply to the last PDU sent as initiator, not read yet
+
+    def activateAsTarget(self, timeout: int, generalBytes: bytearray = bytearray()) -> int:
+        """
+        Waits for an initiator to activate the PN532 as NFC-DEP target
+
+        :param  timeout:        max time to wait for an initiator in ms
+        :param  generalBytes:   general bytes sent in ATR_RES (e.g. LLCP parameters)
+        :returns: 1 if activated, 0 on timeout, <0 if error
+        """
+        self.initiator = False
+        self.pn532.SAMConfig()
+        status = self.pn532.tgInitAsTargetP2P(timeout, generalBytes)
+        command = self.pn532.initiatorCommand
+        if (0 < status and command[1:3] == b'\xd4\x00'):     # ATR_REQ
+            self.generalBytes = bytearray(command[ATR_REQ_GI_OFFSET:])
+        else:
+            self.generalBytes = bytearray()
+        return status
+
+    def activateAsInitiator(self, timeout: int = 1000, active: bool = False,
+                            baudrate: int = PN532_BAUDRATE_106KBPS, maxBaudrate: int = PN532_BAUDRATE_424KBPS,
+                            generalBytes: bytearray = bytearray()) -> int:
+        """
+        Activates a peer with the PN532 as NFC-DEP initiator, then switches to the fastest data rate
+        both support (up to maxBaudrate).
 
-    def activateAsTarget(self, timeout: int) -> int:
+        :param  timeout:        max time to wait for a peer in ms
+        :param  active:         active mode if True, passive mode otherwise
+        :param  baudrate:       data rate of the activation (PN532_BAUDRATE_*)
+        :param  maxBaudrate:    fastest data rate to switch to after the activation, baudrate to keep it
+        :param  generalBytes:   general bytes sent in ATR_REQ (e.g. LLCP parameters)
+        :returns: 1 if a peer was activated, 0 otherwise
+        """
         self.pn532.SAMConfig()
-        return self.pn532.tgInitAsTargetP2P(timeout)
+        success, target = self.pn532.inJumpForDEP(active, baudrate, gi=generalBytes, timeout=timeout)
+        if (not success):
+            return 0
+
+        rates = [rate for rate in target.baud_rates if baudrate < rate <= maxBaudrate]
+        self.pn532.inUpgradeBaudRate(target.tg, rates)
+
+        self.initiator = True
+        self.target = target
+        self.generalBytes = bytearray(target.general_bytes)
+        self._response = None
+        return 1
 
     def write(self, header: bytearray, body: bytearray = bytearray()) -> bool:
-        return self.pn532.tgSetData(header, body)
+        if (not self.initiator):
+            return self.pn532.tgSetData(header, body)
+
+        # the initiator gets the reply of the peer with the same exchange, read returns it
+        success, response = self.pn532.inDataExchange(bytearray(header) + body)
+        self._response = response if success else None
+        return success
 
     def read(self) -> (int, bytearray):
-        return self.pn532.tgGetData()
+        if (not self.initiator):
+            return self.pn532.tgGetData()
+
+        if (self._response is None):
+            # nothing to send: a SYMM PDU gives the peer its turn
+            DMSG("Send SYMM\n")
+            if (not self.write(SYMM_PDU)):
+                return -1, bytearray()
+
+        response, self._response = self._response, None
+        return len(response), response
@@ -0,0 +1,193 @@
+"""
+    mad: Mifare Application Directory (MAD1/MAD2) and NDEF reads on Mifare Classic
+    Only the sectors the directory assigns to NDEF are read, block by block, until the NDEF TLV is complete
+"""
+from typing import Any, Callable, Dict, List, Optional
+
+from pn532pi.nfc import ndef
+from pn532pi.nfc.keyring import MIFARE_KEY_MAD, MIFARE_KEY_NDEF
+from pn532pi.nfc.pn532 import Pn532
+from pn532pi.nfc.pn532_log import DMSG
+from pn532pi.nfc.tlv import TlvReader
+
+MAD_AID_FREE                        = (0x0000)
+MAD_AID_DEFECT                      = (0x0001)
+MAD_AID_RESERVED                    = (0x0002)
+MAD_AID_ADDITIONAL_INFO             = (0x0004)
+MAD_AID_NDEF                        = (0xE103)
+
+MAD_SECTOR                          = 0     # MAD1 (and first part of MAD2)
+MAD2_SECTOR                         = 16    # second part of MAD2 on 4K cards
+
+# General purpose byte (byte 9 of the trailer of sector 0)
+MAD_GPB_DA                          = (0x80)  # MAD available
+MAD_GPB_ADV_MASK                    = (0x03)  # MAD version
+
+_MAD_CRC_PRESET                     = (0xC7)
+_MAD_CRC_POLY                       = (0x1D)
+
+
+def madCrc(data: bytearray) -> int:
+    """
+    CRC-8 of a MAD sector (polynomial 0x1D, preset 0xC7), computed over everything but the CRC byte
+    """
+    crc = _MAD_CRC_PRESET
+    for b in data:
+        crc ^= b
+        for i in range(8):
+            crc = ((crc << 1) ^ _MAD_CRC_POLY) & 0xFF if (crc & 0x80) else (crc << 1) & 0xFF
+    return crc
+
+
+def parseMad(data: bytearray, firstSector: int = 1, checkCrc: bool = True) -> Dict[int, int]:
+    """
+    Parses the data blocks of a MAD sector
+
+    :param  data:           blocks 1..2 of sector 0 (32 bytes) or blocks 0..2 of sector 16 (48 bytes)
+    :param  firstSector:    sector described by the first AID (1 for sector 0, 17 for sector 16)
+    :param  checkCrc:       reject the directory if the CRC does not match
+    :returns: sector -> AID, empty if the CRC is wrong
+    """
+    if (checkCrc and madCrc(data[1:]) != data[0]):
+        DMSG("Invalid MAD CRC\n")
+        return {}
+
+    # byte 0 is the CRC, byte 1 the info byte, then one 2 bytes AID (little endian) per sector
+    return {firstSector + i: data[2 + 2 * i] | (data[3 + 2 * i] << 8) for i in range((len(data) - 2) // 2)}
+
+
+class Mad:
+    def __init__(self, pn532: Pn532):
+        self.pn532 = pn532
+
+    def _readBlocks(self, uid: bytearray, sector: int, key: bytearray, blocks: List[int]) -> (bool, bytearray):
+        pn532 = self.pn532
+        if (not pn532.mifareclassic_AuthenticateBlock(uid, pn532.mifareclassic_SectorFirstBlock(sector), 0, key)):
+            pn532.mifareclassic_Reactivate(uid)
+            return False, bytearray()
+
+        data = bytearray()
+        for block in blocks:
+            success, blockData = pn532.mifareclassic_ReadDataBlock(block)
+            if (not success):
+                return False, bytearray()
+            data += blockData
+        return True, data
+
+    def readDirectory(self, uid: bytearray, key: bytearray = MIFARE_KEY_MAD, checkCrc: bool = True) -> (bool, Dict[int, int]):
+        """
+        Reads the MAD, including the MAD2 sector of 4K cards when the card declares it
+
+        :param  uid:        uid of the card
+        :param  key:        key A of the MAD sectors
+        :param  checkCrc:   reject a directory whose CRC does not match
+        :returns: (result, directory)
+                    result: bool True if the card has a valid MAD, False otherwise
+                    directory: sector -> AID
+        """
+        success, data = self._readBlocks(uid, MAD_SECTOR, key, [1, 2, 3])
+        if (not success):
+            return False, {}
+
+        gpb = data[32 + 9]
+        if (not (gpb & MAD_GPB_DA)):
+            DMSG("Card has no MAD\n")
+            return False, {}
+
+        directory = parseMad(data[:32], 1, checkCrc)
+        if (not directory):
+            return False, {}
+
+        if ((gpb & MAD_GPB_ADV_MASK) == 2):
+            first = self.pn532.mifareclassic_SectorFirstBlock(MAD2_SECTOR)
+            success, data = self._readBlocks(uid, MAD2_SECTOR, key, [first, first + 1, first + 2])
+            if (not success):
+                return False, {}
+            mad2 = parseMad(data, MAD2_SECTOR + 1, checkCrc)
+            if (not mad2):
+                return False, {}
+            directory.update(mad2)
+
+        return True, directory
+
+    def sectorsFor(self, directory: Dict[int, int], aid: int = MAD_AID_NDEF) -> List[int]:
+        """
+        Returns the sectors assigned to an application, in order
+        """
+        return sorted(sector for sector, sectorAid in directory.items() if sectorAid == aid)
+
+    def readNdef(self, uid: bytearray, key: bytearray = MIFARE_KEY_NDEF, madKey: bytearray = MIFARE_KEY_MAD) -> (bool, bytearray):
+        """
+        Reads the NDEF message of a card formatted by the NFC Forum Mifare Classic mapping.
+        The NDEF sectors listed in the MAD are read block by block and reading stops
+        as soon as the NDEF TLV is complete.
+
+        :param  uid:        uid of the card
+        :param  key:        key A of the NDEF sectors
+        :param  madKey:     key A of the MAD sectors
+        :returns: (result, message)
+                    result: bool True if an NDEF message was found, False otherwise
+                    message: bytearray NDEF message
+        """
+        success, directory = self.readDirectory(uid, madKey)
+        if (not success):
+            return False, bytearray()
+
+        pn532 = self.pn532
+        tlv = TlvReader()
+        for sector in self.sectorsFor(directory):
+            first = pn532.mifareclassic_SectorFirstBlock(sector)
+            if (not pn532.mifareclassic_AuthenticateBlock(uid, first, 0, key)):
+                pn532.mifareclassic_Reactivate(uid)
+                return False, bytearray()
+
+            # the trailer is not part of the data area
+            for block in range(first, first + pn532.mifareclassic_BlocksInSector(sector) - 1):
+                success, data = pn532.mifareclassic_ReadDataBlock(block)
+                if (not success):
+                    return False, bytearray()
+                if (tlv.feed(data)):
+                    return tlv.message is not None, tlv.message or bytearray()
+
+        DMSG("NDEF TLV not terminated\n")
+        return False, bytearray()
+
+    def writeNdef(self, uid: bytearray, message: bytearray, key: bytearray = MIFARE_KEY_NDEF, keyNumber: int = 0,
+                  madKey: bytearray = MIFARE_KEY_MAD, progress: Optional[Callable[[int, int], Any]] = None) -> bool:
+        """
+        Writes an NDEF message of any size that fits the NDEF sectors listed in the MAD.
+        The NDEF TLV is laid out over the data blocks of the sectors in order, skipping the trailers,
+        and is followed by a Terminator TLV when there is room for it.
+        Only the blocks that differ are written, each sector is authenticated once.
+
+        :param  uid:        uid of the card
+        :param  message:    encoded NDEF message (see ndef.encodeMessage)
+        :param  key:        key of the NDEF sectors allowed to write
+        :param  keyNumber:  0 for key A, 1 for key B
+        :param  madKey:     key A of the MAD sectors
+        :param  progress:   function called with (blocks done, total blocks) after each block
+        :returns: True if the card holds the message, False otherwise
+        """
+        success, directory = self.readDirectory(uid, madKey)
+        if (not success):
+            return False
+
+        pn532 = self.pn532
+        blocks = []
+        for sector in self.sectorsFor(directory):
+            first = pn532.mifareclassic_SectorFirstBlock(sector)
+            blocks.extend(range(first, first + pn532.mifareclassic_BlocksInSector(sector) - 1))
+
+        layout = ndef.wrapTlv(message)
+        if (len(layout) == len(blocks) * 16 + 1):
+            layout = layout[:-1]    # the message fills the NDEF sectors, no room for the terminator
+        if (len(layout) > len(blocks) * 16):
+            DMSG("NDEF message does not fit the card\n")
+            return False
+
+        layout += bytearray(-len(layout) % 16)
+        image = {block: layout[i * 16:(i + 1) * 16] for i, block in enumerate(blocks[:len(layout) // 16])}
+
+        success, written = pn532.mifareclassic_WriteChanges(uid, image, keyNumber, key, progress=progress)
+        DMSG("{} blocks written\n".format(written))
+        return success
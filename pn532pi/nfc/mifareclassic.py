@@ -0,0 +1,219 @@
+"""
+    mifareclassic: Mifare Classic Mini/1K/4K layouts, sector trailer access bits
+    and read planning that only authenticates with a key allowed to read the blocks
+"""
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from pn532pi.nfc.pn532 import Pn532, CARD_TYPE_MIFARE_MINI, CARD_TYPE_MIFARE_CLASSIC_1K, \
+    CARD_TYPE_MIFARE_CLASSIC_4K, MIFARE_MINI_SECTORS, MIFARE_CLASSIC_1K_SECTORS, MIFARE_CLASSIC_4K_SECTORS
+from pn532pi.nfc.pn532_log import DMSG
+
+# Number of sectors per card type
+_SECTORS_BY_CARD_TYPE = {
+    CARD_TYPE_MIFARE_MINI: MIFARE_MINI_SECTORS,
+    CARD_TYPE_MIFARE_CLASSIC_1K: MIFARE_CLASSIC_1K_SECTORS,
+    CARD_TYPE_MIFARE_CLASSIC_4K: MIFARE_CLASSIC_4K_SECTORS,
+}
+
+# Access conditions (C1 C2 C3 packed as 0bC1C2C3), one per block group of a sector:
+# groups 0..2 are the data blocks (blocks 0..4, 5..9 and 10..14 in the 16 block sectors), group 3 is the trailer
+ACCESS_TRANSPORT                    = [0b000, 0b000, 0b000, 0b001]  # access bits FF 07 80 of blank cards
+
+# Data block conditions readable with key A / key B
+_DATA_READ_KEY_A = {0b000, 0b010, 0b100, 0b110, 0b001}
+_DATA_READ_KEY_B = {0b000, 0b010, 0b100, 0b110, 0b001, 0b011, 0b101}
+# Trailer conditions where key B is readable, key B can not be used to authenticate then
+_TRAILER_KEY_B_READABLE = {0b000, 0b010, 0b001}
+
+KEY_A = 0
+KEY_B = 1
+
+
+def sectorsForCardType(cardType: int) -> int:
+    """
+    Returns the number of sectors of a Mifare Classic card type (see Iso14443ATarget.card_type), 0 if not a Classic
+    """
+    return _SECTORS_BY_CARD_TYPE.get(cardType, 0)
+
+
+def decodeAccessBits(trailer: bytearray) -> Optional[List[int]]:
+    """
+    Decodes the access bits of a sector trailer
+
+    :param  trailer:    16 bytes sector trailer (or only its bytes 6..8 at offset 6)
+    :returns: access conditions of the 4 block groups (0bC1C2C3), None if the bits are not consistent
+    """
+    if (len(trailer) < 9):
+        return None
+
+    b6, b7, b8 = trailer[6], trailer[7], trailer[8]
+    c1, c2, c3 = b7 >> 4, b8 & 0x0F, b8 >> 4
+    if ((b6 & 0x0F) != (~c1 & 0x0F) or (b6 >> 4) != (~c2 & 0x0F) or (b7 & 0x0F) != (~c3 & 0x0F)):
+        DMSG("Invalid access bits\n")
+        return None
+
+    return [(((c1 >> i) & 1) << 2) | (((c2 >> i) & 1) << 1) | ((c3 >> i) & 1) for i in range(4)]
+
+
+def encodeAccessBits(conditions: List[int]) -> bytearray:
+    """
+    Encodes the access conditions of the 4 block groups into the bytes 6..8 of a sector trailer
+
+    :param  conditions:     access conditions (0bC1C2C3) of groups 0..3
+    :returns: 3 bytes
+    """
+    c1 = c2 = c3 = 0
+    for i, condition in enumerate(conditions[:4]):
+        c1 |= ((condition >> 2) & 1) << i
+        c2 |= ((condition >> 1) & 1) << i
+        c3 |= (condition & 1) << i
+
+    return bytearray([((~c2 & 0x0F) << 4) | (~c1 & 0x0F), (c1 << 4) | (~c3 & 0x0F), (c3 << 4) | c2])
+
+
+def blockGroup(pn532: Pn532, blockNumber: int) -> int:
+    """
+    Returns the access bits group (0..3) of a block
+    """
+    offset = blockNumber - pn532.mifareclassic_SectorFirstBlock(pn532.mifareclassic_BlockToSector(blockNumber))
+    if (pn532.mifareclassic_IsTrailerBlock(blockNumber)):
+        return 3
+    return offset if (blockNumber < 128) else offset // 5
+
+
+def canRead(conditions: List[int], group: int, keyNumber: int) -> bool:
+    """
+    Tells whether a block group can be read after authenticating with a key
+
+    :param  conditions:     access conditions of the sector, see decodeAccessBits
+    :param  group:          block group (0..3, 3 is the trailer of which only the access bits are readable)
+    :param  keyNumber:      KEY_A or KEY_B
+    """
+    if (keyNumber == KEY_B and conditions[3] in _TRAILER_KEY_B_READABLE):
+        return False  # the card refuses every access after authenticating with a readable key B
+    if (group == 3):
+        return True   # access bits are always readable with a key usable for authentication
+    return conditions[group] in (_DATA_READ_KEY_B if keyNumber == KEY_B else _DATA_READ_KEY_A)
+
+
+class SectorPlan(NamedTuple):
+    """
+    How to read a sector: the key to authenticate with and the blocks readable with it
+    """
+    sector: int
+    keyNumber: int          # KEY_A or KEY_B, -1 if no block can be read with the keys known
+    blocks: List[int]
+
+
+class MifareClassic:
+    def __init__(self, pn532: Pn532):
+        self.pn532 = pn532
+
+    def planSector(self, sector: int, conditions: Optional[List[int]], keyA: bool, keyB: bool) -> SectorPlan:
+        """
+        Picks the key to read a sector with and the blocks it can read
+
+        :param  sector:         sector number
+        :param  conditions:     access conditions of the sector, None if unknown (every block is assumed readable)
+        :param  keyA:           True if key A of the sector is known
+        :param  keyB:           True if key B of the sector is known
+        :returns: SectorPlan
+        """
+        first = self.pn532.mifareclassic_SectorFirstBlock(sector)
+        blocks = list(range(first, first + self.pn532.mifareclassic_BlocksInSector(sector)))
+
+        if (conditions is None):
+            keyNumber = KEY_A if keyA else (KEY_B if keyB else -1)
+            return SectorPlan(sector, keyNumber, blocks if keyNumber >= 0 else [])
+
+        # A usable key B reads every block key A can read, key A covers the rest
+        best = SectorPlan(sector, -1, [])
+        for keyNumber, known in ((KEY_B, keyB), (KEY_A, keyA)):
+            if (not known):
+                continue
+            readable = [b for b in blocks if canRead(conditions, blockGroup(self.pn532, b), keyNumber)]
+            if (len(readable) > len(best.blocks)):
+                best = SectorPlan(sector, keyNumber, readable)
+
+        return best
+
+    def readSector(self, uid: bytearray, sector: int, keyA: Optional[bytearray] = None, keyB: Optional[bytearray] = None,
+                   conditions: Optional[List[int]] = None) -> (bool, Dict[int, bytearray], Optional[List[int]]):
+        """
+        Reads the blocks of a sector that the access conditions allow, authenticating once.
+        When the access conditions are unknown the trailer is read first to learn them.
+
+        :param  uid:            uid of the card
+        :param  sector:         sector number
+        :param  keyA:           6 bytes key A, None if unknown
+        :param  keyB:           6 bytes key B, None if unknown
+        :param  conditions:     access conditions of the sector from a previous read, None if unknown
+        :returns: (result, blocks, conditions)
+                    result: bool True if every readable block was read, False for an error
+                    blocks: block number -> 16 bytes data of the blocks read
+                    conditions: access conditions of the sector, None if unknown
+        """
+        pn532 = self.pn532
+        if (conditions is None):
+            plan = self.planSector(sector, None, keyA is not None, keyB is not None)
+            if (plan.keyNumber < 0):
+                return False, {}, None
+
+            trailer = plan.blocks[-1]
+            key = keyA if plan.keyNumber == KEY_A else keyB
+            if (not pn532.mifareclassic_AuthenticateBlock(uid, trailer, plan.keyNumber, key)):
+                pn532.mifareclassic_Reactivate(uid)
+                return False, {}, None
+
+            success, data = pn532.mifareclassic_ReadDataBlock(trailer)
+            if (not success):
+                pn532.mifareclassic_Reactivate(uid)
+                return False, {}, None
+
+            conditions = decodeAccessBits(data)
+            if (conditions is None):
+                return False, {}, None
+
+        plan = self.planSector(sector, conditions, keyA is not None, keyB is not None)
+        if (plan.keyNumber < 0):
+            DMSG("No block readable with the known keys\n")
+            return True, {}, conditions
+
+        # skipped by the authentication tracker if the trailer was read with the same key
+        key = keyA if plan.keyNumber == KEY_A else keyB
+        if (not pn532.mifareclassic_AuthenticateBlock(uid, plan.blocks[0], plan.keyNumber, key)):
+            pn532.mifareclassic_Reactivate(uid)
+            return False, {}, conditions
+
+        blocks = {}
+        for block in plan.blocks:
+            success, data = pn532.mifareclassic_ReadDataBlock(block)
+            if (not success):
+                pn532.mifareclassic_Reactivate(uid)
+                return False, blocks, conditions
+            blocks[block] = data
+
+        return True, blocks, conditions
+
+    def readCard(self, uid: bytearray, cardType: int = CARD_TYPE_MIFARE_CLASSIC_1K,
+                 keyA: Optional[bytearray] = None, keyB: Optional[bytearray] = None,
+                 conditions: Optional[Dict[int, List[int]]] = None) -> Iterator[Tuple[int, bool, Dict[int, bytearray]]]:
+        """
+        Reads every sector of a Mini/1K/4K card, skipping the blocks the access conditions forbid
+
+        :param  uid:            uid of the card
+        :param  cardType:       CARD_TYPE_MIFARE_MINI, CARD_TYPE_MIFARE_CLASSIC_1K or CARD_TYPE_MIFARE_CLASSIC_4K
+        :param  keyA:           6 bytes key A, None if unknown
+        :param  keyB:           6 bytes key B, None if unknown
+        :param  conditions:     sector -> access conditions known from a previous read, updated with the
+                                conditions learned. None if nothing is known.
+        :returns: iterator of (sector, result, blocks) as returned by readSector
+        """
+        if (conditions is None):
+            conditions = {}
+
+        for sector in range(sectorsForCardType(cardType)):
+            success, blocks, sectorConditions = self.readSector(uid, sector, keyA, keyB, conditions.get(sector))
+            if (sectorConditions is not None):
+                conditions[sector] = sectorConditions
+            yield sector, success, blocks
@@ -0,0 +1,335 @@
+"""
+    ndef: NDEF message and record codec
+    Parsed records keep memoryview slices of the message instead of copying the type, id and payload
+"""
+from typing import Iterator, List, Optional, Tuple, Union
+
+from pn532pi.nfc.pn532_log import DMSG
+from pn532pi.nfc.tlv import TLV_NDEF_MESSAGE, TLV_TERMINATOR, encodeTlvLength, readNdefTlv
+
+# Type Name Format
+TNF_EMPTY                           = (0x00)
+TNF_WELL_KNOWN                      = (0x01)
+TNF_MIME_MEDIA                      = (0x02)
+TNF_ABSOLUTE_URI                    = (0x03)
+TNF_EXTERNAL_TYPE                   = (0x04)
+TNF_UNKNOWN                         = (0x05)
+TNF_UNCHANGED                       = (0x06)
+TNF_RESERVED                        = (0x07)
+
+# Record header flags
+NDEF_FLAG_MB                        = (0x80)  # Message Begin
+NDEF_FLAG_ME                        = (0x40)  # Message End
+NDEF_FLAG_CF                        = (0x20)  # Chunk Flag
+NDEF_FLAG_SR                        = (0x10)  # Short Record
+NDEF_FLAG_IL                        = (0x08)  # ID Length present
+NDEF_TNF_MASK                       = (0x07)
+
+# Well known record types
+RTD_TEXT                            = b'T'
+RTD_URI                             = b'U'
+RTD_SMART_POSTER                    = b'Sp'
+RTD_ACTION                          = b'act'
+
+# Smart Poster actions
+SP_ACTION_DO                        = (0x00)
+SP_ACTION_SAVE                      = (0x01)
+SP_ACTION_EDIT                      = (0x02)
+
+# URI identifier codes of the URI record type definition
+URI_PREFIXES = [
+    '', 'http://www.', 'https://www.', 'http://', 'https://', 'tel:', 'mailto:',
+    'ftp://anonymous:anonymous@', 'ftp://ftp.', 'ftps://', 'sftp://', 'smb://', 'nfs://', 'ftp://', 'dav://',
+    'news:', 'telnet://', 'imap:', 'rtsp://', 'urn:', 'pop:', 'sip:', 'sips:', 'tftp:', 'btspp://',
+    'btl2cap://', 'btgoep://', 'tcpobex://', 'irdaobex://', 'file://', 'urn:epc:id:', 'urn:epc:tag:',
+    'urn:epc:pat:', 'urn:epc:raw:', 'urn:epc:', 'urn:nfc:',
+]
+
+Bytes = Union[bytes, bytearray, memoryview]
+
+
+class NdefRecord:
+    __slots__ = ('tnf', 'type', 'id', 'payload')
+
+    def __init__(self, tnf: int = TNF_EMPTY, type: Bytes = b'', payload: Bytes = b'', id: Bytes = b''):
+        """
+        :param  tnf:        Type Name Format (TNF_*)
+        :param  type:       record type
+        :param  payload:    record payload
+        :param  id:         record id, empty for none
+        """
+        self.tnf = tnf
+        self.type = type
+        self.payload = payload
+        self.id = id
+
+    def __eq__(self, other) -> bool:
+        if (not isinstance(other, NdefRecord)):
+            return NotImplemented
+        return (self.tnf == other.tnf and bytes(self.type) == bytes(other.type) and
+                bytes(self.payload) == bytes(other.payload) and bytes(self.id) == bytes(other.id))
+
+    def __repr__(self) -> str:
+        return "NdefRecord(tnf={}, type={!r}, payload={!r}, id={!r})".format(
+            self.tnf, bytes(self.type), bytes(self.payload), bytes(self.id))
+
+    def encodedSize(self) -> int:
+        """
+        Returns the size of the encoded record
+        """
+        length = len(self.payload)
+        return 2 + (1 if length < 0x100 else 4) + (1 + len(self.id) if self.id else 0) + len(self.type) + length
+
+    def encode_into(self, buf: bytearray, mb: bool = True, me: bool = True, cf: bool = False):
+        """
+        Appends the encoded record to buf
+
+        :param  buf:    bytearray to append to
+        :param  mb:     set the Message Begin flag
+        :param  me:     set the Message End flag
+        :param  cf:     set the Chunk Flag, more chunks of the payload follow
+        """
+        length = len(self.payload)
+        header = self.tnf & NDEF_TNF_MASK
+        if (mb):
+            header |= NDEF_FLAG_MB
+        if (me):
+            header |= NDEF_FLAG_ME
+        if (cf):
+            header |= NDEF_FLAG_CF
+        if (length < 0x100):
+            header |= NDEF_FLAG_SR
+        if (self.id):
+            header |= NDEF_FLAG_IL
+
+        buf.append(header)
+        buf.append(len(self.type))
+        if (length < 0x100):
+            buf.append(length)
+        else:
+            buf += length.to_bytes(4, byteorder='big')
+        if (self.id):
+            buf.append(len(self.id))
+        buf += self.type
+        buf += self.id
+        buf += self.payload
+
+    def encode(self, mb: bool = True, me: bool = True) -> bytearray:
+        """
+        Returns the encoded record
+        """
+        buf = bytearray()
+        self.encode_into(buf, mb, me)
+        return buf
+
+    def encodeChunks_into(self, buf: bytearray, chunkSize: int, mb: bool = True, me: bool = True):
+        """
+        Appends the record to buf as chunked records of at most chunkSize payload bytes:
+        the first chunk holds the type and id, the following ones are TNF_UNCHANGED records.
+        A payload that fits one chunk is encoded as a single record.
+
+        :param  buf:        bytearray to append to
+        :param  chunkSize:  max payload bytes per chunk (>= 1)
+        :param  mb:         set the Message Begin flag on the first chunk
+        :param  me:         set the Message End flag on the last chunk
+        """
+        payload = memoryview(self.payload)
+        if (len(payload) <= chunkSize):
+            self.encode_into(buf, mb, me)
+            return
+
+        NdefRecord(self.tnf, self.type, payload[:chunkSize], self.id).encode_into(buf, mb, False, True)
+        for start in range(chunkSize, len(payload), chunkSize):
+            last = start + chunkSize >= len(payload)
+            NdefRecord(TNF_UNCHANGED, b'', payload[start:start + chunkSize]).encode_into(buf, False, me and last, not last)
+
+    # **** Well known types *****
+
+    @classmethod
+    def uri(cls, uri: str, id: Bytes = b'') -> 'NdefRecord':
+        """
+        Builds a URI record, the longest matching prefix is abbreviated
+        """
+        code = 0
+        for i, prefix in enumerate(URI_PREFIXES):
+            if (prefix and uri.startswith(prefix) and len(prefix) > len(URI_PREFIXES[code])):
+                code = i
+        return cls(TNF_WELL_KNOWN, RTD_URI, bytes([code]) + uri[len(URI_PREFIXES[code]):].encode('utf-8'), id)
+
+    @classmethod
+    def text(cls, text: str, lang: str = 'en', encoding: str = 'utf-8', id: Bytes = b'') -> 'NdefRecord':
+        """
+        Builds a Text record
+
+        :param  text:       text
+        :param  lang:       IANA language code
+        :param  encoding:   'utf-8' or 'utf-16'
+        """
+        utf16 = encoding.lower().replace('-', '') == 'utf16'
+        langBytes = lang.encode('ascii')
+        status = (0x80 if utf16 else 0x00) | (len(langBytes) & 0x3F)
+        return cls(TNF_WELL_KNOWN, RTD_TEXT, bytes([status]) + langBytes + text.encode('utf-16' if utf16 else 'utf-8'), id)
+
+    @classmethod
+    def mime(cls, mimeType: str, data: Bytes, id: Bytes = b'') -> 'NdefRecord':
+        """
+        Builds a MIME media record
+        """
+        return cls(TNF_MIME_MEDIA, mimeType.encode('ascii'), data, id)
+
+    @classmethod
+    def smartPoster(cls, uri: str, title: Optional[str] = None, lang: str = 'en', action: Optional[int] = None,
+                    id: Bytes = b'') -> 'NdefRecord':
+        """
+        Builds a Smart Poster record holding a URI, an optional title and an optional action
+        """
+        records = [cls.uri(uri)]
+        if (title is not None):
+            records.append(cls.text(title, lang))
+        if (action is not None):
+            records.append(cls(TNF_WELL_KNOWN, RTD_ACTION, bytes([action])))
+        return cls(TNF_WELL_KNOWN, RTD_SMART_POSTER, encodeMessage(records), id)
+
+    def isType(self, tnf: int, type: bytes) -> bool:
+        return self.tnf == tnf and bytes(self.type) == type
+
+    def getUri(self) -> Optional[str]:
+        """
+        Returns the URI of a URI, Absolute URI or Smart Poster record, None for other records
+        """
+        if (self.isType(TNF_WELL_KNOWN, RTD_URI) and len(self.payload) >= 1):
+            code = self.payload[0]
+            prefix = URI_PREFIXES[code] if code < len(URI_PREFIXES) else ''
+            return prefix + bytes(self.payload[1:]).decode('utf-8', errors='replace')
+        if (self.tnf == TNF_ABSOLUTE_URI):
+            return bytes(self.type).decode('utf-8', errors='replace')
+        if (self.isType(TNF_WELL_KNOWN, RTD_SMART_POSTER)):
+            for record in iterRecords(self.payload):
+                uri = record.getUri()
+                if (uri is not None):
+                    return uri
+        return None
+
+    def getText(self) -> Optional[Tuple[str, str]]:
+        """
+        Returns (lang, text) of a Text record, None for other records
+        """
+        if (not self.isType(TNF_WELL_KNOWN, RTD_TEXT) or len(self.payload) < 1):
+            return None
+        status = self.payload[0]
+        langLength = status & 0x3F
+        lang = bytes(self.payload[1:1 + langLength]).decode('ascii', errors='replace')
+        text = bytes(self.payload[1 + langLength:]).decode('utf-16' if status & 0x80 else 'utf-8', errors='replace')
+        return lang, text
+
+
+def encodeMessage(records: List[NdefRecord], chunkSize: Optional[int] = None) -> bytearray:
+    """
+    Encodes records into an NDEF message, an empty list gives a message with one empty record
+
+    :param  records:    records of the message
+    :param  chunkSize:  split payloads larger than chunkSize bytes into chunked records, None to never chunk
+    """
+    if (not records):
+        records = [NdefRecord()]
+
+    buf = bytearray()
+    for i, record in enumerate(records):
+        if (chunkSize is None):
+            record.encode_into(buf, mb=(i == 0), me=(i == len(records) - 1))
+        else:
+            record.encodeChunks_into(buf, chunkSize, mb=(i == 0), me=(i == len(records) - 1))
+    return buf
+
+
+def iterRecords(data: Bytes) -> Iterator[NdefRecord]:
+    """
+    Parses an NDEF message one record at a time.
+    The type, id and payload of the records are memoryview slices of data, except for
+    chunked records whose payload is joined into a new bytearray.
+
+    :param  data:   NDEF message
+    :returns: iterator of NdefRecord, stops at the first malformed record
+    """
+    view = memoryview(data)
+    pos = 0
+    chunk = None    # first record of a chunked payload being joined
+    while (pos < len(view)):
+        header = view[pos]
+        if (pos + 2 > len(view)):
+            DMSG("Truncated NDEF record\n")
+            return
+
+        typeLength = view[pos + 1]
+        pos += 2
+        if (header & NDEF_FLAG_SR):
+            if (pos + 1 > len(view)):
+                DMSG("Truncated NDEF record\n")
+                return
+            payloadLength = view[pos]
+            pos += 1
+        else:
+            if (pos + 4 > len(view)):
+                DMSG("Truncated NDEF record\n")
+                return
+            payloadLength = int.from_bytes(view[pos:pos + 4], byteorder='big')
+            pos += 4
+        idLength = 0
+        if (header & NDEF_FLAG_IL):
+            if (pos + 1 > len(view)):
+                DMSG("Truncated NDEF record\n")
+                return
+            idLength = view[pos]
+            pos += 1
+
+        end = pos + typeLength + idLength + payloadLength
+        if (end > len(view)):
+            DMSG("Truncated NDEF record\n")
+            return
+
+        recordType = view[pos:pos + typeLength]
+        recordId = view[pos + typeLength:pos + typeLength + idLength]
+        payload = view[pos + typeLength + idLength:end]
+        pos = end
+
+        tnf = header & NDEF_TNF_MASK
+        if (chunk is not None):
+            # middle or last chunk
+            chunk.payload += payload
+            if (not (header & NDEF_FLAG_CF)):
+                yield chunk
+                chunk = None
+        elif (header & NDEF_FLAG_CF):
+            chunk = NdefRecord(tnf, recordType, bytearray(payload), recordId)
+        else:
+            yield NdefRecord(tnf, recordType, payload, recordId)
+
+        if (header & NDEF_FLAG_ME):
+            return
+
+
+def parseMessage(data: Bytes) -> List[NdefRecord]:
+    """
+    Parses an NDEF message, see iterRecords
+    """
+    return list(iterRecords(data))
+
+
+def wrapTlv(message: Bytes, terminator: bool = True) -> bytearray:
+    """
+    Wraps an NDEF message into an NDEF Message TLV (as stored on Type 2 tags and Mifare Classic)
+
+    :param  message:        NDEF message
+    :param  terminator:     append a Terminator TLV
+    """
+    buf = bytearray([TLV_NDEF_MESSAGE]) + encodeTlvLength(len(message)) + message
+    if (terminator):
+        buf.append(TLV_TERMINATOR)
+    return buf
+
+
+def unwrapTlv(data: Bytes) -> Optional[bytearray]:
+    """
+    Returns the NDEF message of a TLV area, None if it has none
+    """
+    return readNdefTlv(data)
@@ -0,0 +1,163 @@
+"""
+    ntag21x: NTAG21x (and Ultralight EV1) specific commands
+    GET_VERSION, PWD_AUTH, READ_CNT and READ_SIG
+"""
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+from pn532pi.nfc.pn532 import Pn532
+from pn532pi.nfc.pn532_log import DMSG
+
+# NTAG21x Commands
+NTAG_CMD_GET_VERSION                = (0x60)
+NTAG_CMD_READ_CNT                   = (0x39)
+NTAG_CMD_PWD_AUTH                   = (0x1B)
+NTAG_CMD_READ_SIG                   = (0x3C)
+
+NTAG_NFC_COUNTER                    = (0x02)  # address of the NFC counter for READ_CNT
+NTAG_VERSION_CACHE_SIZE             = 32      # number of uids whose version is remembered
+
+# Product type and storage size byte of the GET_VERSION response mapped to
+# (model, user memory in bytes, total number of pages, page of CFG0)
+_NTAG21X_MODELS = {
+    (0x03, 0x0B): ('MF0UL11', 48, 20, 0x10),
+    (0x03, 0x0E): ('MF0UL21', 128, 41, 0x25),
+    (0x04, 0x0B): ('NTAG210', 48, 20, 0x10),
+    (0x04, 0x0E): ('NTAG212', 128, 41, 0x25),
+    (0x04, 0x0F): ('NTAG213', 144, 45, 0x29),
+    (0x04, 0x11): ('NTAG215', 504, 135, 0x83),
+    (0x04, 0x13): ('NTAG216', 888, 231, 0xE3),
+}
+
+
+class Ntag21xVersion(NamedTuple):
+    """
+    Information contained in the response to the GET_VERSION command
+    """
+    vendor_id: int
+    product_type: int
+    product_subtype: int
+    major_version: int
+    minor_version: int
+    storage_size: int
+    protocol_type: int
+
+    @property
+    def model(self) -> str:
+        """Name of the chip (e.g. 'NTAG215'), empty if unknown"""
+        return _NTAG21X_MODELS.get((self.product_type, self.storage_size), ('', 0, 0, 0))[0]
+
+    @property
+    def user_memory(self) -> int:
+        """Size of the user memory in bytes, 0 if unknown"""
+        return _NTAG21X_MODELS.get((self.product_type, self.storage_size), ('', 0, 0, 0))[1]
+
+    @property
+    def total_pages(self) -> int:
+        """Total number of pages of the chip, 0 if unknown"""
+        return _NTAG21X_MODELS.get((self.product_type, self.storage_size), ('', 0, 0, 0))[2]
+
+    @property
+    def cfg_page(self) -> int:
+        """Page of the first configuration page (CFG0 / AUTH0), 0 if unknown.
+        PWD and PACK are located at cfg_page + 2 and cfg_page + 3."""
+        return _NTAG21X_MODELS.get((self.product_type, self.storage_size), ('', 0, 0, 0))[3]
+
+
+class Ntag21x:
+    def __init__(self, interface: Pn532):
+        self.pn532 = interface
+        self._versions = OrderedDict()   # uid -> Ntag21xVersion, most recently used last
+
+    def getVersion(self, uid: bytearray = bytearray()) -> (bool, Optional[Ntag21xVersion]):
+        """
+        Identifies the exact chip and memory size with GET_VERSION
+
+        :param  uid:   uid of the tag, used to cache the version so repeated taps skip the command.
+                       Pass an empty uid to always query the tag.
+        :returns: (result, version)
+                    result: bool True if successful, False if error
+                    version: Ntag21xVersion
+        """
+        key = bytes(uid)
+        if (key and key in self._versions):
+            self._versions.move_to_end(key)
+            return True, self._versions[key]
+
+        status, response = self.pn532.inCommunicateThru(bytearray([NTAG_CMD_GET_VERSION]))
+        if (not status or len(response) < 8):
+            DMSG("GET_VERSION failed\n")
+            return False, None
+
+        version = Ntag21xVersion(*response[1:8])
+
+        if (key):
+            self._versions[key] = version
+            if (len(self._versions) > NTAG_VERSION_CACHE_SIZE):
+                self._versions.popitem(last=False)
+
+        return True, version
+
+    def forget(self, uid: bytearray = bytearray()):
+        """
+        Drops the cached version of a tag
+
+        :param  uid:   uid of the tag, empty to drop all cached versions
+        """
+        if (uid):
+            self._versions.pop(bytes(uid), None)
+        else:
+            self._versions.clear()
+
+    def auth(self, password: bytearray, pack: Optional[bytearray] = None) -> (bool, bytearray):
+        """
+        Authenticates with the 32-bit password (PWD_AUTH)
+
+        :param  password:   4 bytes password
+        :param  pack:       expected 2 bytes password acknowledge, not checked if None
+        :returns: (result, pack)
+                    result: bool True if the tag accepted the password (and returned the expected PACK)
+                    pack: bytearray PACK returned by the tag
+        """
+        status, response = self.pn532.inCommunicateThru(bytearray([NTAG_CMD_PWD_AUTH]) + password[:4])
+        if (not status or len(response) < 2):
+            DMSG("PWD_AUTH failed\n")
+            return False, bytearray()
+
+        response = response[:2]
+        if (pack is not None and response != pack[:2]):
+            DMSG("PACK mismatch\n")
+            return False, response
+
+        return True, response
+
+    def readCounter(self, counter: int = NTAG_NFC_COUNTER) -> (bool, int):
+        """
+        Reads the 24-bit NFC counter (READ_CNT)
+
+        :param  counter:   counter address (0x02 for the NTAG21x NFC counter)
+        :returns: (result, count)
+                    result: bool True if successful, False if error
+                    count: int counter value
+        """
+        status, response = self.pn532.inCommunicateThru(bytearray([NTAG_CMD_READ_CNT, counter & 0xFF]))
+        if (not status or len(response) < 3):
+            DMSG("READ_CNT failed\n")
+            return False, 0
+
+        return True, int.from_bytes(response[:3], byteorder='little')
+
+    def readSignature(self) -> (bool, bytearray):
+        """
+        Reads the 32 bytes ECC originality signature (READ_SIG)
+
+        :returns: (result, signature)
+                    result: bool True if successful, False if error
+                    signature: bytearray 32 bytes signature
+        """
+        status, response = self.pn532.inCommunicateThru(bytearray([NTAG_CMD_READ_SIG, 0x00]))
+        if (not status or len(response) < 32):
+            DMSG("READ_SIG failed\n")
+            return False, bytearray()
+
+        return True, response[:32]
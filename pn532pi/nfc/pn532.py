@@ -4,9 +4,10 @@
     @license  BSD
 
 """
-from typing import List, NamedTuple
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
 
-from pn532pi.interfaces.pn532Interface import Pn532Interface, PN532_TIMEOUT
+from pn532pi.interfaces.pn532Interface import Pn532Interface, PN532_TIMEOUT, PN532_PACKBUFFSIZ
+from pn532pi.nfc import ndef
 
 # PN532 Commands
 from pn532pi.nfc.pn532_log import DMSG, DMSG_HEX
@@ -54,6 +55,89 @@ PN532_FELICA_424KBPS                = (0x02)
 PN532_MIFARE_ISO14443B_106KBPS      = (0x03)
 PN532_JEWEL_106KBPS                 = (0x04)
 
+# Data rates of InPSL (BRit/BRti), InATR and InJumpForDEP
+PN532_BAUDRATE_106KBPS              = (0x00)
+PN532_BAUDRATE_212KBPS              = (0x01)
+PN532_BAUDRATE_424KBPS              = (0x02)
+PN532_BAUDRATE_848KBPS              = (0x03)  # ISO14443-4A targets only
+
+# InAutoPoll target types
+PN532_AUTOPOLL_GENERIC_106KBPS      = (0x00)
+PN532_AUTOPOLL_GENERIC_212KBPS      = (0x01)
+PN532_AUTOPOLL_GENERIC_424KBPS      = (0x02)
+PN532_AUTOPOLL_ISO14443B_106KBPS    = (0x03)
+PN532_AUTOPOLL_JEWEL                = (0x04)
+PN532_AUTOPOLL_MIFARE               = (0x10)
+PN532_AUTOPOLL_FELICA_212KBPS       = (0x11)
+PN532_AUTOPOLL_FELICA_424KBPS       = (0x12)
+PN532_AUTOPOLL_ISO14443_4A          = (0x20)
+PN532_AUTOPOLL_ISO14443_4B          = (0x23)
+PN532_AUTOPOLL_DEP_PASSIVE_106KBPS  = (0x40)
+PN532_AUTOPOLL_DEP_PASSIVE_212KBPS  = (0x41)
+PN532_AUTOPOLL_DEP_PASSIVE_424KBPS  = (0x42)
+PN532_AUTOPOLL_DEP_ACTIVE_106KBPS   = (0x80)
+PN532_AUTOPOLL_DEP_ACTIVE_212KBPS   = (0x81)
+PN532_AUTOPOLL_DEP_ACTIVE_424KBPS   = (0x82)
+
+PN532_AUTOPOLL_ENDLESS              = (0xFF)
+PN532_AUTOPOLL_DEFAULT_TYPES        = (PN532_AUTOPOLL_GENERIC_106KBPS, PN532_AUTOPOLL_FELICA_212KBPS,
+                                       PN532_AUTOPOLL_FELICA_424KBPS, PN532_AUTOPOLL_ISO14443_4B,
+                                       PN532_AUTOPOLL_JEWEL)
+
+PN532_MI_BIT                        = (0x40)  # More Information bit of the InDataExchange Tg and status bytes
+
+# Baud rate of the target data layout reported for each InAutoPoll target type
+_AUTOPOLL_TARGET_BAUDRATE = {
+    PN532_AUTOPOLL_MIFARE: PN532_MIFARE_ISO14443A_106KBPS,
+    PN532_AUTOPOLL_ISO14443_4A: PN532_MIFARE_ISO14443A_106KBPS,
+    PN532_AUTOPOLL_FELICA_212KBPS: PN532_FELICA_212KBPS,
+    PN532_AUTOPOLL_FELICA_424KBPS: PN532_FELICA_424KBPS,
+    PN532_AUTOPOLL_ISO14443B_106KBPS: PN532_MIFARE_ISO14443B_106KBPS,
+    PN532_AUTOPOLL_ISO14443_4B: PN532_MIFARE_ISO14443B_106KBPS,
+    PN532_AUTOPOLL_JEWEL: PN532_JEWEL_106KBPS,
+}
+
+# ISO14443A card types (see classifyTarget)
+CARD_TYPE_UNKNOWN                   = (0)
+CARD_TYPE_MIFARE_MINI               = (1)
+CARD_TYPE_MIFARE_CLASSIC_1K         = (2)
+CARD_TYPE_MIFARE_CLASSIC_4K         = (3)
+CARD_TYPE_MIFARE_ULTRALIGHT         = (4)  # Ultralight, Ultralight C and NTAG2xx
+CARD_TYPE_MIFARE_PLUS               = (5)
+CARD_TYPE_MIFARE_DESFIRE            = (6)
+CARD_TYPE_ISO14443_4                = (7)  # other ISO-DEP cards and phones
+
+# Card types of well known (ATQA, SAK) pairs, see NXP AN10833
+_CARD_TYPES_BY_ATQA_SAK = {
+    (0x0004, 0x09): CARD_TYPE_MIFARE_MINI,
+    (0x0004, 0x08): CARD_TYPE_MIFARE_CLASSIC_1K,
+    (0x0044, 0x08): CARD_TYPE_MIFARE_CLASSIC_1K,
+    (0x0004, 0x88): CARD_TYPE_MIFARE_CLASSIC_1K,
+    (0x0002, 0x18): CARD_TYPE_MIFARE_CLASSIC_4K,
+    (0x0042, 0x18): CARD_TYPE_MIFARE_CLASSIC_4K,
+    (0x0044, 0x00): CARD_TYPE_MIFARE_ULTRALIGHT,
+    (0x0004, 0x10): CARD_TYPE_MIFARE_PLUS,
+    (0x0044, 0x10): CARD_TYPE_MIFARE_PLUS,
+    (0x0004, 0x11): CARD_TYPE_MIFARE_PLUS,
+    (0x0044, 0x11): CARD_TYPE_MIFARE_PLUS,
+    (0x0004, 0x20): CARD_TYPE_MIFARE_PLUS,
+    (0x0344, 0x20): CARD_TYPE_MIFARE_DESFIRE,
+}
+
+# Fallback card types by SAK alone, for cards with vendor specific ATQAs
+_CARD_TYPES_BY_SAK = {
+    0x00: CARD_TYPE_MIFARE_ULTRALIGHT,
+    0x08: CARD_TYPE_MIFARE_CLASSIC_1K,
+    0x09: CARD_TYPE_MIFARE_MINI,
+    0x10: CARD_TYPE_MIFARE_PLUS,
+    0x11: CARD_TYPE_MIFARE_PLUS,
+    0x18: CARD_TYPE_MIFARE_CLASSIC_4K,
+    0x28: CARD_TYPE_MIFARE_CLASSIC_1K,    # SmartMX with Classic 1K emulation
+    0x38: CARD_TYPE_MIFARE_CLASSIC_4K,    # SmartMX with Classic 4K emulation
+    0x88: CARD_TYPE_MIFARE_CLASSIC_1K,
+    0x98: CARD_TYPE_MIFARE_CLASSIC_4K,
+}
+
 # Mifare Commands
 MIFARE_CMD_AUTH_A                   = (0x60)
 MIFARE_CMD_AUTH_B                   = (0x61)
@@ -63,7 +147,17 @@ MIFARE_CMD_WRITE_ULTRALIGHT         = (0xA2)
 MIFARE_CMD_TRANSFER                 = (0xB0)
 MIFARE_CMD_DECREMENT                = (0xC0)
 MIFARE_CMD_INCREMENT                = (0xC1)
-MIFARE_CMD_STORE                    = (0xC2)
+MIFARE_CMD_STORE                    = (0xC2)  # RESTORE: loads a value block into the transfer buffer
+
+# Mifare Classic layouts
+MIFARE_MINI_SECTORS                 = 5
+MIFARE_CLASSIC_1K_SECTORS           = 16
+MIFARE_CLASSIC_4K_SECTORS           = 40
+
+# NTAG21x / Ultralight EV1 Commands
+NTAG_CMD_FAST_READ                  = (0x3A)
+
+NTAG_FAST_READ_MAX_PAGES            = 60  # pages per FAST_READ that fit in a PN532 frame
 
 # FeliCa Commands
 FELICA_CMD_POLLING                  = (0x00)
@@ -154,6 +248,211 @@ class Pn532FirmwareInfo(NamedTuple):
     def __repr__(self) -> str:
         return str(self)
 
+
+class Iso14443ATarget(NamedTuple):
+    """
+    ISO14443A target (Mifare, NTAG, ISO-DEP) found by InListPassiveTarget or InAutoPoll
+    """
+    tg: int
+    atqa: int
+    sak: int
+    uid: bytearray
+    ats: bytearray
+
+    @property
+    def card_type(self) -> int:
+        """Card type (CARD_TYPE_*) guessed from the ATQA and SAK"""
+        return classifyTarget(self.atqa, self.sak)
+
+
+class FelicaTarget(NamedTuple):
+    """
+    FeliCa target found by InListPassiveTarget or InAutoPoll
+    """
+    tg: int
+    idm: bytearray
+    pmm: bytearray
+    system_code: int
+
+
+class Iso14443BTarget(NamedTuple):
+    """
+    ISO14443B target found by InListPassiveTarget or InAutoPoll
+    """
+    tg: int
+    atqb: bytearray
+    attrib_res: bytearray
+
+
+class JewelTarget(NamedTuple):
+    """
+    Innovision Jewel target found by InListPassiveTarget or InAutoPoll
+    """
+    tg: int
+    sens_res: int
+    jewel_id: bytearray
+
+
+class DepTarget(NamedTuple):
+    """
+    NFC-DEP target activated by InJumpForDEP
+    """
+    tg: int
+    atr_res: bytearray      # NFCID3t (10), DIDt, BSt, BRt, TO, PPt, [Gt]
+
+    @property
+    def nfcid3(self) -> bytearray:
+        return self.atr_res[:10]
+
+    @property
+    def general_bytes(self) -> bytearray:
+        """General bytes of the target (e.g. LLCP parameters)"""
+        return self.atr_res[15:]
+
+    @property
+    def baud_rates(self) -> List[int]:
+        """Data rates above 106 kbps the target supports, see depBaudRates"""
+        return depBaudRates(self.atr_res)
+
+
+def classifyTarget(atqa: int, sak: int) -> int:
+    """
+    Guesses the type of an ISO14443A card from its ATQA and SAK, without sending any command to it
+
+    :param  atqa:   ATQA (SENS_RES) of the card
+    :param  sak:    SAK (SEL_RES) of the card
+    :returns: card type (CARD_TYPE_*)
+    """
+    cardType = _CARD_TYPES_BY_ATQA_SAK.get((atqa, sak))
+    if (cardType is None):
+        cardType = _CARD_TYPES_BY_SAK.get(sak)
+    if (cardType is None):
+        cardType = CARD_TYPE_ISO14443_4 if (sak & 0x20) else CARD_TYPE_UNKNOWN
+    return cardType
+
+
+def depBaudRates(atrRes: bytearray) -> List[int]:
+    """
+    Returns the data rates an NFC-DEP target supports in both directions, from its ATR_RES
+
+    :param  atrRes:     ATR_RES as returned by inATR (NFCID3t, DIDt, BSt, BRt, ...)
+    :returns: PN532_BAUDRATE_* rates above 106 kbps
+    """
+    if (len(atrRes) < 13):
+        return []
+    bst, brt = atrRes[11], atrRes[12]
+    return [rate for rate in (PN532_BAUDRATE_212KBPS, PN532_BAUDRATE_424KBPS) if (bst & brt) & (1 << (rate - 1))]
+
+
+Pn532Target = Union[Iso14443ATarget, FelicaTarget, Iso14443BTarget, JewelTarget]
+
+
+def parseTargetData(cardbaudrate: int, data: bytearray, offset: int = 0) -> (Optional[Pn532Target], int):
+    """
+    Parse the description of one target from an InListPassiveTarget or InAutoPoll response
+
+    :param  cardbaudrate:  Baud rate/modulation of the target (PN532_MIFARE_ISO14443A_106KBPS, ...)
+    :param  data:          response data
+    :param  offset:        index of the Tg byte of the target in data
+    :returns: (target, next)
+                target: target descriptor, None if the data is malformed or the baud rate is unknown
+                next:   index of the byte following the target data
+    """
+    end = len(data)
+    if (cardbaudrate == PN532_MIFARE_ISO14443A_106KBPS):
+        # Tg, SENS_RES (2), SEL_RES, NFCIDLength, NFCID1, [ATS]
+        if (offset + 5 > end):
+            return None, end
+        sak = data[offset + 3]
+        uidLength = data[offset + 4]
+        nxt = offset + 5 + uidLength
+        if (nxt > end):
+            return None, end
+        ats = bytearray()
+        if ((sak & 0x20) and nxt < end):
+            atsLength = data[nxt]
+            if (atsLength == 0 or nxt + atsLength > end):
+                return None, end
+            ats = bytearray(data[nxt:nxt + atsLength])
+            nxt += atsLength
+        target = Iso14443ATarget(data[offset], (data[offset + 1] << 8) | data[offset + 2], sak,
+                                 bytearray(data[offset + 5:offset + 5 + uidLength]), ats)
+        return target, nxt
+    elif (cardbaudrate in (PN532_FELICA_212KBPS, PN532_FELICA_424KBPS)):
+        # Tg, POL_RES length, 0x01, IDm (8), PMm (8), [System Code (2)]
+        if (offset + 2 > end):
+            return None, end
+        polResLength = data[offset + 1]
+        nxt = offset + 1 + polResLength
+        if ((polResLength != 18 and polResLength != 20) or nxt > end):
+            return None, end
+        systemCode = 0
+        if (polResLength == 20):
+            systemCode = (data[offset + 19] << 8) | data[offset + 20]
+        target = FelicaTarget(data[offset], bytearray(data[offset + 3:offset + 11]),
+                              bytearray(data[offset + 11:offset + 19]), systemCode)
+        return target, nxt
+    elif (cardbaudrate == PN532_MIFARE_ISO14443B_106KBPS):
+        # Tg, ATQB (12), ATTRIB_RES length, ATTRIB_RES
+        if (offset + 14 > end):
+            return None, end
+        attribLength = data[offset + 13]
+        nxt = offset + 14 + attribLength
+        if (nxt > end):
+            return None, end
+        target = Iso14443BTarget(data[offset], bytearray(data[offset + 1:offset + 13]),
+                                 bytearray(data[offset + 14:nxt]))
+        return target, nxt
+    elif (cardbaudrate == PN532_JEWEL_106KBPS):
+        # Tg, SENS_RES (2), JEWELID (4)
+        nxt = offset + 7
+        if (nxt > end):
+            return None, end
+        target = JewelTarget(data[offset], (data[offset + 1] << 8) | data[offset + 2],
+                             bytearray(data[offset + 3:nxt]))
+        return target, nxt
+
+    DMSG("Unknown target baud rate\n")
+    return None, end
+
+
+def encodeValueBlock(value: int, addr: int) -> bytearray:
+    """
+    Builds a Mifare Classic value block:
+    value, ~value, value (4 bytes little endian each) then addr, ~addr, addr, ~addr
+
+    :param  value:  signed 32-bit value
+    :param  addr:   1 byte address, free for the application (usually the block number)
+    :returns: 16 bytes block
+    """
+    v = (value & 0xFFFFFFFF).to_bytes(4, byteorder='little')
+    nv = bytes(b ^ 0xFF for b in v)
+    addr &= 0xFF
+    return bytearray(v + nv + v + bytes([addr, addr ^ 0xFF, addr, addr ^ 0xFF]))
+
+
+def decodeValueBlock(data: bytearray) -> (bool, int, int):
+    """
+    Parses and checks a Mifare Classic value block
+
+    :param  data:   16 bytes block
+    :returns: (result, value, addr)
+                result: bool True if the block has a valid value block format
+                value:  signed 32-bit value
+                addr:   address byte
+    """
+    if (len(data) < 16):
+        return False, 0, 0
+
+    v, nv, v2 = data[0:4], data[4:8], data[8:12]
+    addr = data[12]
+    if (v != v2 or any((a ^ b) != 0xFF for a, b in zip(v, nv)) or
+            data[14] != addr or data[13] != addr ^ 0xFF or data[15] != addr ^ 0xFF):
+        return False, 0, 0
+
+    return True, int.from_bytes(v, byteorder='little', signed=True), addr
+
+
 class Pn532:
     def __init__(self, interface: Pn532Interface):
         self._interface = interface
@@ -161,9 +460,78 @@ class Pn532:
         self._uid = []  # ISO14443A uid
         self._uidLen = 0  # uid len
         self._key = []  # Mifare Classic key
+        self._authState = None  # (Tg, uid, sector, key type, key) of the sector currently authenticated
         self.inListedTag = 0 # Tg number of inlisted tag.
+        self.inListedTargets = []   # descriptors of the targets inlisted by listPassiveTargets
         self._felicaIDm = bytearray() # FeliCa IDm (NFCID2)
         self._felicaPMm = bytearray() # FeliCa PMm (PAD)
+        self._packetbuffer = bytearray(PN532_PACKBUFFSIZ)   # scratch buffer for the *_into functions
+        self._packetview = memoryview(self._packetbuffer)
+        self._writeListeners = []   # functions called with (uid, block) when the content of a card is written
+        self.activations = 0        # incremented whenever the targets are polled, selected or released
+        self.initiatorCommand = bytearray()     # first frame of the initiator received by tgInitAsTarget
+
+    def _cardNumber(self) -> int:
+        """
+        Tg of the card addressed by the Mifare commands, the first target unless another one was selected
+        """
+        return self.inListedTag or 1
+
+    def addWriteListener(self, func: Callable[[bytes, Optional[int]], Any]):
+        """
+        Registers a function called with (uid, block) whenever a write command is sent to a card,
+        e.g. to invalidate cached card contents. uid is empty when the card is unknown,
+        block is None when the whole card may have changed.
+        """
+        if (func not in self._writeListeners):
+            self._writeListeners.append(func)
+
+    def removeWriteListener(self, func: Callable[[bytes, Optional[int]], Any]):
+        """
+        Unregisters a function registered with addWriteListener
+        """
+        if (func in self._writeListeners):
+            self._writeListeners.remove(func)
+
+    def notifyWrite(self, uid: bytes, block: Optional[int] = None):
+        """
+        Calls the write listeners
+
+        :param  uid:    uid/IDm of the written card, empty if unknown
+        :param  block:  block/page written, None if unknown
+        """
+        for func in self._writeListeners:
+            func(bytes(uid), block)
+
+    def _currentUid(self) -> bytes:
+        """
+        uid (or FeliCa IDm) of the card addressed by the card commands, empty if unknown
+        """
+        for target in self.inListedTargets:
+            if (target.tg == self._cardNumber()):
+                if (isinstance(target, Iso14443ATarget)):
+                    return bytes(target.uid)
+                if (isinstance(target, FelicaTarget)):
+                    return bytes(target.idm)
+        return bytes(self._uid)
+
+    def mifareclassic_InvalidateAuth(self):
+        """
+        Forgets the sector currently authenticated, the next mifareclassic_AuthenticateBlock
+        always talks to the card. Any command other than a Mifare Classic one ends the Crypto1 session:
+        the raw exchanges and Ultralight commands of this class call it, call it after sending
+        commands to a Mifare Classic card through other means.
+        """
+        self._authState = None
+
+    def _targetsChanged(self):
+        """
+        Called before polling, selecting or releasing targets: the cards lose their authentication
+        and selection state, helpers caching such state compare activations to detect it
+        """
+        self.activations += 1
+        self._uid = []
+        self.mifareclassic_InvalidateAuth()
 
     def begin(self):
         """
@@ -412,19 +780,38 @@ class Pn532:
 
         :returns: (True if successful, uid of the card)
         """
+        success, target = self.readPassiveTarget(cardbaudrate, timeout, inlist)
+        if (not success):
+            return False, bytearray()
+
+        return True, target.uid
+
+    def readPassiveTarget(self, cardbaudrate: int = PN532_MIFARE_ISO14443A_106KBPS, timeout: int = 1000,
+                          inlist: bool = False) -> (bool, Optional[Iso14443ATarget]):
+        """
+        Waits for an ISO14443A target to enter the field
+
+        :param  cardBaudRate:  Baud rate of the card
+        :param  timeout:       The number of tries before timing out
+        :param  inlist:        If set to True, the card will be inlisted
+
+        :returns: (True if successful, target descriptor holding the tag number, ATQA, SAK, uid and ATS of the card,
+                    see Iso14443ATarget.card_type to identify the card)
+        """
+        self._targetsChanged()
         header = bytearray([
             PN532_COMMAND_INLISTPASSIVETARGET,
-            1,  # max 1 cards at once (we can set this to 2 later)
+            1,  # max 1 cards at once (see listPassiveTargets for 2)
             cardbaudrate & 0xFF,
         ])
         if (self._interface.writeCommand(header)) :
-            return False, bytearray()  # command failed
+            return False, None  # command failed
 
 
         # read data packet
         status, response = self._interface.readResponse(timeout)
         if (status < 0):
-            return False, bytearray()
+            return False, None
         
         # check some basic stuff
         # ISO14443A card response should be in the following format:
@@ -437,29 +824,249 @@ class Pn532:
           # b4              SEL_RES
           # b5              NFCID Length
           # b6..NFCIDLen    NFCID
+          # ..              ATS (ISO14443-4 cards only)
 
         if (response[0] != 1):
-            return False, bytearray()
+            return False, None
 
-        sens_res = response[2]
-        sens_res <<= 8
-        sens_res |= response[3]
+        target, _ = parseTargetData(PN532_MIFARE_ISO14443A_106KBPS, response, 1)
+        if (target is None):
+            return False, None
 
         DMSG("ATQA: 0x")
-        DMSG_HEX(sens_res)
+        DMSG_HEX(target.atqa)
         DMSG("SAK: 0x")
-        DMSG_HEX(response[4])
+        DMSG_HEX(target.sak)
         DMSG("\n")
 
-        # Card appears to be Mifare Classic 
+        # the card commands address this card now, write listeners get its uid
+        self.inListedTargets = [target]
+        self._uid = target.uid
+        if (inlist) :
+            self.inListedTag = target.tg
+        
+        return True, target
+
+    def readPassiveTargetID_into(self, cardbaudrate: int, uid: bytearray, timeout: int = 1000, inlist: bool = False) -> int:
+        """
+        Waits for an ISO14443A target to enter the field, without allocating a new buffer for the uid
+
+        :param  cardBaudRate:  Baud rate of the card
+        :param  uid:           bytearray or writable memoryview to receive the uid (10 bytes max)
+        :param  timeout:       The number of tries before timing out
+        :param  inlist:        If set to True, the card will be inlisted
+
+        :returns: length of the uid written to uid, 0 if no card was found or an error occurred
+        """
+        self._targetsChanged()
+        header = bytearray([
+            PN532_COMMAND_INLISTPASSIVETARGET,
+            1,  # max 1 cards at once
+            cardbaudrate & 0xFF,
+        ])
+        if (self._interface.writeCommand(header)) :
+            return 0  # command failed
+
+        # read data packet
+        status = self._interface.readResponse_into(self._packetbuffer, timeout)
+        response = self._packetview
+        if (status < 6 or response[0] != 1):
+            return 0
+
         uidLength = response[5]
-        uid = bytearray(response[6:6 + uidLength])
+        if (uidLength > len(uid)):
+            DMSG("uid buffer too small\n")
+            return 0
+
+        uid[:uidLength] = response[6:6 + uidLength]
+        self.inListedTargets = []
+        self._uid = bytes(response[6:6 + uidLength])
 
         if (inlist) :
             self.inListedTag = response[1]
-        
-        return True, uid
+
+        return uidLength
     
+    def listPassiveTargets(self, cardbaudrate: int, maxTargets: int = 2, timeout: int = 1000,
+                           initiatorData: Optional[bytearray] = None, uid: bytearray = bytearray(),
+                           systemCode: int = 0xFFFF, requestCode: int = 0, afi: int = 0) -> (int, List[Pn532Target]):
+        """
+        Inlists up to two passive targets of the given modulation and returns a descriptor for each of them:
+        Iso14443ATarget, FelicaTarget (212/424 kbps), Iso14443BTarget or JewelTarget.
+        The first target becomes the current target, use inSelect to switch to the other one.
+
+        :param  cardbaudrate:   Baud rate/modulation of the cards (PN532_MIFARE_ISO14443A_106KBPS, PN532_FELICA_212KBPS,
+                               PN532_FELICA_424KBPS, PN532_MIFARE_ISO14443B_106KBPS or PN532_JEWEL_106KBPS)
+        :param  maxTargets:     Maximum number of targets to inlist (1 or 2, Jewel only supports 1)
+        :param  timeout:        max time to wait for the response, 0 means no timeout
+        :param  initiatorData:  InitiatorData field of the command, built from the parameters below when None
+        :param  uid:            ISO14443A: only inlist the card with this uid (all cards if empty)
+        :param  systemCode:     FeliCa: System Code to poll for (0xFFFF for all cards)
+        :param  requestCode:    FeliCa: Request Code of the polling command (see felica_Polling)
+        :param  afi:            ISO14443B: Application Family Identifier (0x00 for all cards)
+
+        :returns: (status, targets)
+                    status:   >= 0 number of targets found, < 0 error
+                    targets:  list of target descriptors
+        """
+        if (maxTargets not in (1, 2) or (cardbaudrate == PN532_JEWEL_106KBPS and maxTargets != 1)):
+            DMSG("Invalid number of targets\n")
+            return -1, []
+
+        if (initiatorData is None):
+            if (cardbaudrate == PN532_MIFARE_ISO14443A_106KBPS):
+                initiatorData = bytearray(uid)
+            elif (cardbaudrate in (PN532_FELICA_212KBPS, PN532_FELICA_424KBPS)):
+                initiatorData = bytearray([
+                    FELICA_CMD_POLLING,
+                    (systemCode >> 8) & 0xFF,
+                    systemCode & 0xFF,
+                    requestCode & 0xFF,
+                    0,  # Time slot number
+                ])
+            elif (cardbaudrate == PN532_MIFARE_ISO14443B_106KBPS):
+                initiatorData = bytearray([afi & 0xFF])
+            else:
+                initiatorData = bytearray()
+
+        self._targetsChanged()
+        header = bytearray([
+            PN532_COMMAND_INLISTPASSIVETARGET,
+            maxTargets,
+            cardbaudrate & 0xFF,
+        ]) + initiatorData
+
+        if (self._interface.writeCommand(header)):
+            return -2, []
+
+        status, response = self._interface.readResponse(timeout)
+        if (status < 0 or len(response) < 1):
+            return -3, []
+
+        targets = []
+        i = 1
+        for n in range(response[0]):
+            target, i = parseTargetData(cardbaudrate, response, i)
+            if (target is None):
+                DMSG("Invalid target data\n")
+                return -4, []
+            targets.append(target)
+
+        self.inListedTargets = targets
+        if (targets):
+            self.inListedTag = targets[0].tg
+
+        return len(targets), targets
+
+    def inSelect(self, tg: int) -> bool:
+        """
+        Selects one of the inlisted targets, subsequent commands are sent to it
+
+        :param  tg:     Tg of the target to select
+        :returns: True if successful, False if error
+        """
+        self._targetsChanged()
+        header = bytearray([PN532_COMMAND_INSELECT, tg & 0xFF])
+
+        if (self._interface.writeCommand(header)):
+            return False
+
+        status, response = self._interface.readResponse()
+        if (status < 1 or (response[0] & 0x3f) != 0):
+            DMSG("InSelect failed\n")
+            return False
+
+        self.inListedTag = tg
+        return True
+
+    def inDeselect(self, tg: int = 0) -> bool:
+        """
+        Deselects a target, keeping it inlisted so it can be selected again without polling
+
+        :param  tg:     Tg of the target to deselect, 0 for all targets
+        :returns: True if successful, False if error
+        """
+        self._targetsChanged()
+        header = bytearray([PN532_COMMAND_INDESELECT, tg & 0xFF])
+
+        if (self._interface.writeCommand(header)):
+            return False
+
+        status, response = self._interface.readResponse()
+        if (status < 1 or (response[0] & 0x3f) != 0):
+            DMSG("InDeselect failed\n")
+            return False
+
+        return True
+
+    def inAutoPoll(self, types: List[int] = PN532_AUTOPOLL_DEFAULT_TYPES, pollNr: int = PN532_AUTOPOLL_ENDLESS,
+                   period: int = 1, timeout: int = 0) -> (int, List[Tuple[int, Union[Pn532Target, bytearray]]]):
+        """
+        Lets the PN532 poll for targets of several types on its own, without a host round trip per attempt.
+        See https://www.nxp.com/docs/en/user-guide/141520.pdf page 144
+
+        :param  types:     Target types to poll for, in order (PN532_AUTOPOLL_*, 1..15 types)
+        :param  pollNr:    Number of polling cycles (0x01..0xFE), PN532_AUTOPOLL_ENDLESS to poll until a target is found
+        :param  period:    Time between polling attempts in units of 150ms (0x01..0x0F)
+        :param  timeout:   max time to wait for the response, 0 means no timeout
+
+        :returns: (status, targets)
+                    status:   >= 0 number of targets found, < 0 error
+                    targets:  list of (type, target) where target is a target descriptor, or the raw
+                              target data for types without a parser (e.g. DEP targets)
+        """
+        if (not 1 <= len(types) <= 15):
+            DMSG("Invalid number of autopoll types\n")
+            return -1, []
+
+        self._targetsChanged()
+        header = bytearray([
+            PN532_COMMAND_INAUTOPOLL,
+            pollNr & 0xFF,
+            period & 0x0F,
+        ]) + bytearray(types)
+
+        if (self._interface.writeCommand(header)):
+            return -2, []
+
+        status, response = self._interface.readResponse(timeout)
+        if (status < 0):
+            return -3, []
+
+        # InAutoPoll response should be in the following format:
+        #   b0                      Targets found
+        #   b1                      Type of target 1
+        #   b2                      Length of target 1 data
+        #   b3..                    Target 1 data (same layout as InListPassiveTarget)
+        #   ...                     Type, length, data of target 2
+        if (len(response) < 1):
+            return -4, []
+
+        targets = []
+        i = 1
+        for n in range(response[0]):
+            if (i + 2 > len(response)):
+                DMSG("Truncated autopoll response\n")
+                return -4, []
+            targetType, length = response[i], response[i + 1]
+            data = response[i + 2:i + 2 + length]
+            i += 2 + length
+
+            if (targetType in _AUTOPOLL_TARGET_BAUDRATE):
+                target, _ = parseTargetData(_AUTOPOLL_TARGET_BAUDRATE[targetType], data)
+                if (target is None):
+                    DMSG("Invalid autopoll target data\n")
+                    return -4, []
+            else:
+                target = bytearray(data)
+            targets.append((targetType, target))
+
+        self.inListedTargets = [target for _, target in targets if not isinstance(target, bytearray)]
+        if (targets):
+            self.inListedTag = response[3]
+
+        return len(targets), targets
+
     # **** Mifare Classic Functions *****
 
     def mifareclassic_IsFirstBlock (self, uiBlock: int) -> bool:
@@ -485,6 +1092,125 @@ class Pn532:
         else:
             return ((uiBlock + 1) % 16 == 0)
 
+    def mifareclassic_SectorFirstBlock(self, sector: int) -> int:
+        """
+        Returns the number of the first block of a sector
+        (sectors 0..31 have 4 blocks, sectors 32..39 of 4K cards have 16 blocks)
+        """
+        if (sector < 32):
+            return sector * 4
+        else:
+            return 128 + (sector - 32) * 16
+
+    def mifareclassic_BlocksInSector(self, sector: int) -> int:
+        """
+        Returns the number of blocks of a sector, including the sector trailer
+        """
+        return 4 if (sector < 32) else 16
+
+    def mifareclassic_BlockToSector(self, uiBlock: int) -> int:
+        """
+        Returns the sector the specified block belongs to
+        """
+        if (uiBlock < 128):
+            return uiBlock // 4
+        else:
+            return 32 + (uiBlock - 128) // 16
+
+    def mifareclassic_ReadSector(self, uid: bytearray, sector: int, keyNumber: int, keyData: bytearray) -> (bool, List[bytearray]):
+        """
+        Authenticates a sector once and reads all of its blocks, including the sector trailer
+        (the keys read back from a trailer are masked by the card).
+
+        :param  uid:           uid of the card
+        :param  sector:        The sector to read (0..15 for 1KB cards, 0..39 for 4KB cards)
+        :param  keyNumber:     Which key type to use during authentication
+                              (0 = MIFARE_CMD_AUTH_A, 1 = MIFARE_CMD_AUTH_B)
+        :param  keyData:       6 bytes key value
+
+        :returns: (result, blocks)
+                    result: bool True if every block was read, False if error
+                    blocks: list of the 16 bytes blocks read (stops at the first error)
+        """
+        firstBlock = self.mifareclassic_SectorFirstBlock(sector)
+        blocks = []
+
+        if (not self.mifareclassic_AuthenticateBlock(uid, firstBlock, keyNumber, keyData)):
+            return False, blocks
+
+        for block in range(firstBlock, firstBlock + self.mifareclassic_BlocksInSector(sector)):
+            success, data = self.mifareclassic_ReadDataBlock(block)
+            if (not success):
+                return False, blocks
+            blocks.append(data)
+
+        return True, blocks
+
+    def mifareclassic_WriteSector(self, uid: bytearray, sector: int, keyNumber: int, keyData: bytearray,
+                                  blocks: List[Optional[bytearray]]) -> bool:
+        """
+        Authenticates a sector once and writes its blocks.
+
+        :param  uid:           uid of the card
+        :param  sector:        The sector to write (0..15 for 1KB cards, 0..39 for 4KB cards)
+        :param  keyNumber:     Which key type to use during authentication
+                              (0 = MIFARE_CMD_AUTH_A, 1 = MIFARE_CMD_AUTH_B)
+        :param  keyData:       6 bytes key value
+        :param  blocks:        16 bytes blocks to write, in the same order as mifareclassic_ReadSector returns them.
+                              Entries set to None are left untouched, use None for the manufacturer block
+                              and for the sector trailer unless you really mean to change keys/access bits.
+
+        :returns: True if every block was written, False for an error
+        """
+        firstBlock = self.mifareclassic_SectorFirstBlock(sector)
+        if (len(blocks) > self.mifareclassic_BlocksInSector(sector)):
+            DMSG("Too many blocks for the sector\n")
+            return False
+
+        if (not self.mifareclassic_AuthenticateBlock(uid, firstBlock, keyNumber, keyData)):
+            return False
+
+        for block, data in enumerate(blocks, firstBlock):
+            if (data is None):
+                continue
+            if (not self.mifareclassic_WriteDataBlock(block, data)):
+                return False
+
+        return True
+
+    def mifareclassic_DumpCard(self, uid: bytearray, keyNumber: int, keyData: bytearray,
+                               numSectors: int = MIFARE_CLASSIC_1K_SECTORS) -> Iterator[Tuple[int, bool, List[bytearray]]]:
+        """
+        Reads a whole card sector by sector, authenticating once per sector.
+        Results are yielded as soon as each sector is read, a failing sector does not abort the dump.
+
+        :param  uid:           uid of the card
+        :param  keyNumber:     Which key type to use during authentication
+                              (0 = MIFARE_CMD_AUTH_A, 1 = MIFARE_CMD_AUTH_B)
+        :param  keyData:       6 bytes key value
+        :param  numSectors:    Number of sectors of the card (MIFARE_CLASSIC_1K_SECTORS,
+                              MIFARE_CLASSIC_4K_SECTORS or MIFARE_MINI_SECTORS)
+
+        :returns: iterator of (sector, result, blocks) as returned by mifareclassic_ReadSector
+        """
+        for sector in range(numSectors):
+            success, blocks = self.mifareclassic_ReadSector(uid, sector, keyNumber, keyData)
+            if (not success):
+                DMSG("Failed to read sector {}\n".format(sector))
+                # A failed authentication halts the card, wake it up again for the next sector
+                self.mifareclassic_Reactivate(uid)
+            yield sector, success, blocks
+
+    def mifareclassic_Reactivate(self, uid: bytearray) -> bool:
+        """
+        Selects the card again after a failed authentication left it halted
+
+        :param  uid:           uid of the card
+        :returns: True if the card was selected again, False for an error
+        """
+        status, targets = self.listPassiveTargets(PN532_MIFARE_ISO14443A_106KBPS, 1, uid=uid)
+        return status == 1
+
     def mifareclassic_AuthenticateBlock(self, uid: bytearray, blockNumber: int, keyNumber: int, keyData: bytearray) -> bool:
         """
                 Tries to authenticate a block of memory on a MIFARE card using the
@@ -501,14 +1227,21 @@ class Pn532:
 
         :returns: True if everything executed properly, False for an error
         """
-    
+        # Skip the exchange if the sector is already authenticated with the same key
+        authState = (self._cardNumber(), bytes(uid), self.mifareclassic_BlockToSector(blockNumber),
+                     1 if keyNumber else 0, bytes(keyData[:6]))
+        if (authState == self._authState):
+            DMSG("Sector already authenticated\n")
+            return True
+        self._authState = None
+
         # Hang on to the key and uid data
         self._key = keyData
         self._uid = uid
 
         # Prepare the authentication command #
         header = bytearray([PN532_COMMAND_INDATAEXCHANGE,
-                  1,
+                  self._cardNumber(),
                   MIFARE_CMD_AUTH_B if keyNumber else MIFARE_CMD_AUTH_A,
                   blockNumber])
         header += self._key[:6] + self._uid
@@ -526,6 +1259,7 @@ class Pn532:
             DMSG("Authentication failed\n")
             return False
 
+        self._authState = authState
         return True
 
     def mifareclassic_ReadDataBlock (self, blockNumber: int) -> (bool, bytearray):
@@ -549,7 +1283,7 @@ class Pn532:
         #  Prepare the command
         header = bytearray([
             PN532_COMMAND_INDATAEXCHANGE,
-            1,                  # Card number
+            self._cardNumber(),    # Card number
             MIFARE_CMD_READ,    # Mifare Read command = 0x30
             blockNumber,        # Block Number (0..63 for 1K, 0..255 for 4K)
         ])
@@ -564,11 +1298,42 @@ class Pn532:
         #  If byte 8 isn't 0x00 we probably have an error 
         if (status < 0 or response[0] != 0x00):
             DMSG("Authentication failed\n")
+            self.mifareclassic_InvalidateAuth()  # the card drops the authentication on errors
             return False, bytearray()
 
         #  Copy the 16 data bytes to the output buffer        
         #  Block content starts at byte 9 of a valid response
         return True, response[1:17]
+
+    def mifareclassic_ReadDataBlock_into (self, blockNumber: int, data: bytearray) -> bool:
+        """
+        Tries to read an entire 16-bytes data block at the specified block
+        address into a caller provided buffer.
+
+        :param  blockNumber:   The block number to authenticate.  (0..63 for
+                              1KB cards, and 0..255 for 4KB cards).
+        :param  data:          bytearray or writable memoryview (at least 16
+                              bytes) that will hold the retrieved data
+
+        :returns: True if operation was successful, False if error
+        """
+        header = bytearray([
+            PN532_COMMAND_INDATAEXCHANGE,
+            self._cardNumber(),    # Card number
+            MIFARE_CMD_READ,    # Mifare Read command = 0x30
+            blockNumber,        # Block Number (0..63 for 1K, 0..255 for 4K)
+        ])
+        if (self._interface.writeCommand(header)):
+            return False
+
+        status = self._interface.readResponse_into(self._packetbuffer)
+        if (status < 17 or self._packetbuffer[0] != 0x00):
+            DMSG("Read failed\n")
+            self.mifareclassic_InvalidateAuth()  # the card drops the authentication on errors
+            return False
+
+        data[:16] = self._packetview[1:17]
+        return True
     
     def mifareclassic_WriteDataBlock (self, blockNumber: int, data: bytearray) -> bool:
         """
@@ -583,17 +1348,130 @@ class Pn532:
         """
 
         #  Prepare the first command
-        header = bytearray([PN532_COMMAND_INDATAEXCHANGE, 1, MIFARE_CMD_WRITE, blockNumber]) + data[:16]
+        header = bytearray([PN532_COMMAND_INDATAEXCHANGE, self._cardNumber(), MIFARE_CMD_WRITE, blockNumber]) + data[:16]
 
         #  Send the command 
         if (self._interface.writeCommand(header)):
             return False
         
+        self.notifyWrite(self._currentUid(), blockNumber)
+
         #  Read the response packet
         status, response = self._interface.readResponse()
+        if (status < 0 or (response and response[0] != 0x00)):
+            self.mifareclassic_InvalidateAuth()  # the card drops the authentication on errors
 
         return (status >= 0)
 
+    def mifareclassic_WriteValueBlock(self, blockNumber: int, value: int, addr: Optional[int] = None) -> bool:
+        """
+        Formats a block of an authenticated sector as a value block
+
+        :param  blockNumber:   The block number (not a sector trailer)
+        :param  value:         signed 32-bit initial value
+        :param  addr:          address byte stored in the block, defaults to blockNumber
+
+        :returns: True if everything executed properly, False for an error
+        """
+        return self.mifareclassic_WriteDataBlock(blockNumber, encodeValueBlock(value, blockNumber if addr is None else addr))
+
+    def mifareclassic_ReadValueBlock(self, blockNumber: int) -> (bool, int):
+        """
+        Reads and checks a value block of an authenticated sector
+
+        :param  blockNumber:   The block number
+        :returns: (result, value)
+                    result: bool True if the block was read and is a valid value block, False if error
+                    value: signed 32-bit value
+        """
+        success, data = self.mifareclassic_ReadDataBlock(blockNumber)
+        if (not success):
+            return False, 0
+
+        valid, value, addr = decodeValueBlock(data)
+        if (not valid):
+            DMSG("Not a value block\n")
+            return False, 0
+
+        return True, value
+
+    def _mifareclassic_ValueCommand(self, command: int, blockNumber: int, operand: Optional[int]) -> bool:
+        header = bytearray([PN532_COMMAND_INDATAEXCHANGE, self._cardNumber(), command, blockNumber & 0xFF])
+        if (operand is not None):
+            header += (operand & 0xFFFFFFFF).to_bytes(4, byteorder='little')
+
+        if (self._interface.writeCommand(header)):
+            return False
+
+        if (command == MIFARE_CMD_TRANSFER):
+            self.notifyWrite(self._currentUid(), blockNumber)
+
+        status, response = self._interface.readResponse()
+        if (status < 0 or response[0] != 0x00):
+            DMSG("Value operation failed\n")
+            self.mifareclassic_InvalidateAuth()  # the card drops the authentication on errors
+            return False
+
+        return True
+
+    def mifareclassic_Increment(self, blockNumber: int, value: int) -> bool:
+        """
+        Adds value to a value block and keeps the result in the card's transfer buffer,
+        use mifareclassic_Transfer to store it
+
+        :param  blockNumber:   The value block number
+        :param  value:         unsigned 32-bit value to add
+        :returns: True if everything executed properly, False for an error
+        """
+        return self._mifareclassic_ValueCommand(MIFARE_CMD_INCREMENT, blockNumber, value)
+
+    def mifareclassic_Decrement(self, blockNumber: int, value: int) -> bool:
+        """
+        Subtracts value from a value block and keeps the result in the card's transfer buffer,
+        use mifareclassic_Transfer to store it
+
+        :param  blockNumber:   The value block number
+        :param  value:         unsigned 32-bit value to subtract
+        :returns: True if everything executed properly, False for an error
+        """
+        return self._mifareclassic_ValueCommand(MIFARE_CMD_DECREMENT, blockNumber, value)
+
+    def mifareclassic_Restore(self, blockNumber: int) -> bool:
+        """
+        Copies a value block into the card's transfer buffer, use mifareclassic_Transfer to store it
+        (e.g. to back up a value block into another block of the same sector)
+
+        :param  blockNumber:   The value block number
+        :returns: True if everything executed properly, False for an error
+        """
+        return self._mifareclassic_ValueCommand(MIFARE_CMD_STORE, blockNumber, 0)
+
+    def mifareclassic_Transfer(self, blockNumber: int) -> bool:
+        """
+        Writes the card's transfer buffer into a value block of the same sector
+
+        :param  blockNumber:   The destination block number
+        :returns: True if everything executed properly, False for an error
+        """
+        return self._mifareclassic_ValueCommand(MIFARE_CMD_TRANSFER, blockNumber, None)
+
+    def mifareclassic_AddValue(self, blockNumber: int, delta: int, transferBlock: Optional[int] = None) -> bool:
+        """
+        Adds a signed delta to a value block on the card (increment or decrement then transfer),
+        without reading the block back to the host
+
+        :param  blockNumber:   The value block number
+        :param  delta:         signed value to add
+        :param  transferBlock: block receiving the result, defaults to blockNumber
+        :returns: True if everything executed properly, False for an error
+        """
+        if (delta >= 0):
+            success = self.mifareclassic_Increment(blockNumber, delta)
+        else:
+            success = self.mifareclassic_Decrement(blockNumber, -delta)
+
+        return success and self.mifareclassic_Transfer(blockNumber if transferBlock is None else transferBlock)
+
     def mifareclassic_FormatNDEF (self) -> bool:
         """
                 Formats a Mifare Classic card to store NDEF Records
@@ -653,36 +1531,13 @@ class Pn532:
         # Note 0xD3 0xF7 0xD3 0xF7 0xD3 0xF7 must be used for key A
         # in NDEF records
 
-        # Setup the sector buffer (w/pre-formatted TLV wrapper and NDEF message)
-        sectorbuffer1 = bytearray([0x00, 0x00, 0x03, length + 5, 0xD1, 0x01, length + 1, 0x55, uriIdentifier, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00])
-        sectorbuffer2 = bytearray([0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00])
-        sectorbuffer3 = bytearray([0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00])
+        # Setup the sector buffer: 2 NULL TLVs, the NDEF Message TLV holding a single URI record
+        # and the Terminator TLV, padded to the 3 data blocks of the sector
+        record = ndef.NdefRecord(ndef.TNF_WELL_KNOWN, ndef.RTD_URI, bytearray([uriIdentifier]) + url_bytes)
+        data = bytearray(2) + ndef.wrapTlv(ndef.encodeMessage([record]))
+        data += bytearray(48 - len(data))
+        sectorbuffer1, sectorbuffer2, sectorbuffer3 = data[0:16], data[16:32], data[32:48]
         sectorbuffer4 = bytearray([0xD3, 0xF7, 0xD3, 0xF7, 0xD3, 0xF7, 0x7F, 0x07, 0x88, 0x40, 0xFF, 0xFF, 0xFF, 0xFF, 0xFF, 0xFF])
-        # TODO: This can probably be simplified...
-        if (length <= 6) :
-            # Unlikely we'll get a url this short, but why not ...
-            sectorbuffer1 = sectorbuffer1[:9] + url_bytes[:length] + sectorbuffer1[9 + length:]
-            sectorbuffer1[length + 9] = 0xFE
-        elif (length == 7):
-            # 0xFE needs to be wrapped around to next block
-            sectorbuffer1 = sectorbuffer1[:9] + url_bytes[:length] + sectorbuffer1[9 + length:]
-            sectorbuffer2[0] = 0xFE
-        elif ((length > 7) and (length <= 22)):
-            # Url fits in two blocks
-            sectorbuffer1 = sectorbuffer1[:9] + url_bytes[:7] + sectorbuffer1[9 + 7:]
-            sectorbuffer2 = url_bytes[7:] + sectorbuffer2[length - 7:]
-            sectorbuffer2[length - 7] = 0xFE
-        elif (length == 23):
-            # 0xFE needs to be wrapped around to final block
-            sectorbuffer1 = sectorbuffer1[:9] + url_bytes[:7] + sectorbuffer1[9 + 7:]
-            sectorbuffer2 = url_bytes[7:]
-            sectorbuffer3[0] = 0xFE
-        else:
-            # Url fits in three blocks
-            sectorbuffer1 = sectorbuffer1[:9] + url_bytes[:7] + sectorbuffer1[9 + 7:]
-            sectorbuffer2 = url_bytes[7:23]
-            sectorbuffer3 = url_bytes[23:] + sectorbuffer3[length - 23:]
-            sectorbuffer3[length - 23] = 0xFE
 
         # Now write all three blocks back to the card
         if (not (self.mifareclassic_WriteDataBlock(sectorNumber * 4, sectorbuffer1))):
@@ -697,6 +1552,81 @@ class Pn532:
         # Seems that everything was OK (?!)
         return True
 
+    def _knownTrailer(self, card: bytearray, wanted: bytes, keyNumber: int, keyData: bytearray) -> bytearray:
+        """
+        Sector trailer as read from the card with the keys it does not return filled in:
+        key A (always read as zeros) and key B (read as zeros when authenticated with it)
+        are the authentication key, key A is assumed unchanged when authenticated with key B
+        """
+        if (keyNumber):
+            return bytearray(wanted[:6]) + card[6:10] + bytearray(keyData[:6])
+        return bytearray(keyData[:6]) + card[6:16]
+
+    def mifareclassic_WriteChanges(self, uid: bytearray, image: Dict[int, bytearray], keyNumber: int, keyData: bytearray,
+                                   current: Optional[Dict[int, bytearray]] = None,
+                                   progress: Optional[Callable[[int, int], Any]] = None) -> (bool, int):
+        """
+        Writes only the blocks of image that differ from what the card holds.
+        Blocks are handled sector by sector so each sector is authenticated once,
+        and the sector trailer is always written last. The keys of a trailer read from the card are
+        taken from keyData (key A cannot be read back): with key B, a change of key A alone is not written.
+
+        :param  uid:           uid of the card
+        :param  image:         block number -> 16 bytes wanted content (block 0 is ignored)
+        :param  keyNumber:     Which key type to use during authentication
+                              (0 = MIFARE_CMD_AUTH_A, 1 = MIFARE_CMD_AUTH_B)
+        :param  keyData:       6 bytes key value
+        :param  current:       block number -> 16 bytes known content of the card (e.g. from a previous dump),
+                              blocks missing from it are read from the card first.
+                              It is updated with the blocks read and written.
+        :param  progress:      function called with (blocks done, total blocks) after each block
+
+        :returns: (result, written)
+                    result: bool True if the card now matches image, False for an error
+                    written: number of blocks written
+        """
+        if (current is None):
+            current = {}
+
+        sectors = {}
+        for block in sorted(image):
+            if (block == 0):
+                continue
+            sectors.setdefault(self.mifareclassic_BlockToSector(block), []).append(block)
+
+        total = sum(len(blocks) for blocks in sectors.values())
+        done = 0
+        written = 0
+        for sector, blocks in sectors.items():
+            # the trailer may change the keys, write it after the data blocks
+            blocks.sort(key=self.mifareclassic_IsTrailerBlock)
+
+            if (not self.mifareclassic_AuthenticateBlock(uid, self.mifareclassic_SectorFirstBlock(sector), keyNumber, keyData)):
+                return False, written
+
+            for block in blocks:
+                data = bytes(image[block][:16])
+                if (block not in current):
+                    success, card = self.mifareclassic_ReadDataBlock(block)
+                    if (not success):
+                        return False, written
+                    if (self.mifareclassic_IsTrailerBlock(block)):
+                        card = self._knownTrailer(card, data, keyNumber, keyData)
+                    current[block] = card
+
+                if (bytes(current[block][:16]) != data):
+                    DMSG("Writing block {}\n".format(block))
+                    if (not self.mifareclassic_WriteDataBlock(block, data)):
+                        return False, written
+                    current[block] = data
+                    written += 1
+
+                done += 1
+                if (progress is not None):
+                    progress(done, total)
+
+        return True, written
+
     # **** Mifare Ultralight Functions *****
 
     def mifareultralight_ReadPage(self, page: int) -> (bool, bytearray):
@@ -708,11 +1638,12 @@ class Pn532:
                 result: bool True if successful, False if error
                 data: bytearray received page data
         """
+        self.mifareclassic_InvalidateAuth()
 
         #  Prepare the command
         header = bytearray([
             PN532_COMMAND_INDATAEXCHANGE,
-            1,                   #  Card number
+            self._cardNumber(),     #  Card number
             MIFARE_CMD_READ,     #  Mifare Read command = 0x30
             page,                #  Page Number (0..63 in most cases)
         ])
@@ -737,6 +1668,34 @@ class Pn532:
         data = response[1:5]
         return True, data
 
+    def mifareultralight_ReadPage_into(self, page: int, buffer: bytearray) -> bool:
+        """
+        Tries to read an entire 4-bytes page at the specified address into
+        a caller provided buffer.
+
+        :param  page:        The page number (0..63 in most cases)
+        :param  buffer:      bytearray or writable memoryview (at least 4 bytes)
+                            that will hold the page data
+        :returns: True if successful, False if error
+        """
+        self.mifareclassic_InvalidateAuth()
+        header = bytearray([
+            PN532_COMMAND_INDATAEXCHANGE,
+            self._cardNumber(),     #  Card number
+            MIFARE_CMD_READ,     #  Mifare Read command = 0x30
+            page,                #  Page Number (0..63 in most cases)
+        ])
+        if (self._interface.writeCommand(header)):
+            return False
+
+        status = self._interface.readResponse_into(self._packetbuffer)
+        if (status < 5 or self._packetbuffer[0] != 0x00):
+            DMSG("Read failed\n")
+            return False
+
+        buffer[:4] = self._packetview[1:5]
+        return True
+
     def mifareultralight_WritePage(self, page: int, buffer: bytearray) -> bool:
         """
         Tries to write an entire 4-bytes data buffer at the specified page
@@ -747,48 +1706,234 @@ class Pn532:
 
         :returns: True if everything executed properly, False for an error
         """
+        self.mifareclassic_InvalidateAuth()
     
         #  Prepare the first command 
-        header = bytearray([PN532_COMMAND_INDATAEXCHANGE, 1, MIFARE_CMD_WRITE_ULTRALIGHT, page])
+        header = bytearray([PN532_COMMAND_INDATAEXCHANGE, self._cardNumber(), MIFARE_CMD_WRITE_ULTRALIGHT, page])
         header += buffer[:4]
 
         #  Send the command 
         if (self._interface.writeCommand(header)):
             return False
 
+        self.notifyWrite(self._currentUid(), page)
+
         #  Read the response packet
         status, response = self._interface.readResponse()
         return status >= 0
 
-    def inDataExchange(self, send: bytearray) -> (bool, bytearray):
+    def mifareultralight_ReadPages(self, page: int, numPages: int) -> (bool, bytearray):
         """
-                Exchanges an APDU with the currently inlisted peer
+        Reads numPages consecutive pages starting at page. Every READ command
+        returns 4 pages, so this takes one exchange per 4 pages.
 
-        :param  send:            Pointer to data to send
-        :param  response:        Pointer to response data
-        :param  responseLength:  Pointer to the response data length
+        :param  page:        The first page number
+        :param  numPages:    The number of pages to read
+        :returns: (result, data)
+                result: bool True if successful, False if error
+                data: bytearray numPages * 4 bytes of page data
         """
+        self.mifareclassic_InvalidateAuth()
+        data = bytearray(numPages * 4)
+        view = memoryview(data)
+        for offset in range(0, len(data), 16):
+            header = bytearray([
+                PN532_COMMAND_INDATAEXCHANGE,
+                self._cardNumber(),     #  Card number
+                MIFARE_CMD_READ,        #  Mifare Read command = 0x30
+                (page + offset // 4) & 0xFF,
+            ])
+            if (self._interface.writeCommand(header)):
+                return False, bytearray()
+
+            status = self._interface.readResponse_into(self._packetbuffer)
+            if (status < 17 or self._packetbuffer[0] != 0x00):
+                DMSG("Read failed\n")
+                return False, bytearray()
+
+            length = min(16, len(data) - offset)
+            view[offset:offset + length] = self._packetview[1:1 + length]
 
-        header = bytearray([
-            0x40,  # PN532_COMMAND_INDATAEXCHANGE
-            self.inListedTag
-        ])
+        return True, data
+
+    def mifareultralight_WriteChanges(self, image: Dict[int, bytearray],
+                                      current: Optional[Dict[int, bytearray]] = None,
+                                      progress: Optional[Callable[[int, int], Any]] = None) -> (bool, int):
+        """
+        Writes only the pages of image that differ from what the tag holds.
+        Missing pages are read 4 at a time before writing.
+
+        :param  image:         page number -> 4 bytes wanted content
+        :param  current:       page number -> 4 bytes known content of the tag,
+                              pages missing from it are read from the tag first.
+                              It is updated with the pages read and written.
+        :param  progress:      function called with (pages done, total pages) after each page
+
+        :returns: (result, written)
+                    result: bool True if the tag now matches image, False for an error
+                    written: number of pages written
+        """
+        if (current is None):
+            current = {}
+
+        written = 0
+        for done, page in enumerate(sorted(image), 1):
+            data = bytes(image[page][:4])
+            if (page not in current):
+                # a READ returns 4 pages, keep all of them for the next pages
+                success, pages = self.mifareultralight_ReadPages(page, 4)
+                if (not success):
+                    return False, written
+                for i in range(4):
+                    current.setdefault(page + i, pages[i * 4:i * 4 + 4])
+
+            if (bytes(current[page][:4]) != data):
+                DMSG("Writing page {}\n".format(page))
+                if (not self.mifareultralight_WritePage(page, data)):
+                    return False, written
+                current[page] = data
+                written += 1
+
+            if (progress is not None):
+                progress(done, len(image))
+
+        return True, written
+
+    def ntag21x_FastRead(self, startPage: int, endPage: int) -> (bool, bytearray):
+        """
+        Reads the pages startPage..endPage (inclusive) with the NTAG21x FAST_READ
+        command, split into as few exchanges as the PN532 frame size allows.
+
+        :param  startPage:   The first page number
+        :param  endPage:     The last page number
+        :returns: (result, data)
+                result: bool True if successful, False if error
+                data: bytearray page data, 4 bytes per page
+        """
+        self.mifareclassic_InvalidateAuth()
+        if (endPage < startPage):
+            return False, bytearray()
+
+        data = bytearray((endPage - startPage + 1) * 4)
+        view = memoryview(data)
+        for first in range(startPage, endPage + 1, NTAG_FAST_READ_MAX_PAGES):
+            last = min(first + NTAG_FAST_READ_MAX_PAGES - 1, endPage)
+            header = bytearray([PN532_COMMAND_INCOMMUNICATETHRU, NTAG_CMD_FAST_READ, first & 0xFF, last & 0xFF])
+            if (self._interface.writeCommand(header)):
+                return False, bytearray()
+
+            length = (last - first + 1) * 4
+            status = self._interface.readResponse_into(self._packetbuffer)
+            if (status != length + 1 or (self._packetbuffer[0] & 0x3f) != 0):
+                DMSG("FAST_READ failed\n")
+                return False, bytearray()
+
+            offset = (first - startPage) * 4
+            view[offset:offset + length] = self._packetview[1:1 + length]
+
+        return True, data
+
+    def inCommunicateThru(self, send: bytearray, timeout: int = 1000) -> (bool, bytearray):
+        """
+        Sends raw data to the target, the PN532 only handles CRC and framing.
+        Used for card commands the PN532 would otherwise interpret (e.g. NTAG commands).
+
+        :param  send:       data to send
+        :param  timeout:    max time to wait for the response, 0 means no timeout
+        :returns: (result, data)
+                result: bool True if successful, False if error
+                data: bytearray data received from the target
+        """
+        self.mifareclassic_InvalidateAuth()
+        header = bytearray([PN532_COMMAND_INCOMMUNICATETHRU])
 
         if (self._interface.writeCommand(header, send)):
             return False, bytearray()
-        
 
-        status, response = self._interface.readResponse()
+        status, response = self._interface.readResponse(timeout)
         if (status < 0):
             return False, bytearray()
-        
 
         if ((response[0] & 0x3f) != 0):
             DMSG("Status code indicates an error\n")
             return False, bytearray()
 
-        response = response[1:]
-        return True, response
+        return True, response[1:]
+
+    def inDataExchange(self, send: bytearray, more: bool = False, timeout: int = 1000) -> (bool, bytearray):
+        """
+                Exchanges an APDU with the currently inlisted peer.
+                A response chained by the peer (MI bit of the status byte) is fetched
+                frame by frame and returned whole.
+
+        :param  send:            data to send
+        :param  more:            set the MI bit: send is followed by more data in the next call,
+                                 the peer only acknowledges it and the response is empty
+        :param  timeout:         max time to wait for each response frame in ms
+        :returns: (result, response)
+        """
+        self.mifareclassic_InvalidateAuth()
+
+        header = bytearray([
+            PN532_COMMAND_INDATAEXCHANGE,
+            self.inListedTag | (PN532_MI_BIT if more else 0)
+        ])
+
+        response = bytearray()
+        while True:
+            if (self._interface.writeCommand(header, send)):
+                return False, bytearray()
+
+            status, frame = self._interface.readResponse(timeout)
+            if (status < 0):
+                return False, bytearray()
+
+            if ((frame[0] & 0x3f) != 0):
+                DMSG("Status code indicates an error\n")
+                return False, bytearray()
+
+            response += frame[1:]
+            if (more or not (frame[0] & PN532_MI_BIT)):
+                return True, response
+
+            # the peer has more data: an empty exchange fetches the next frame
+            DMSG("More information\n")
+            header[1] = self.inListedTag
+            send = bytearray()
+
+    def inDataExchange_into(self, send: bytearray, response: bytearray) -> int:
+        """
+        Exchanges an APDU with the currently inlisted peer, writing the
+        reply into a caller provided buffer
+
+        :param  send:            data to send
+        :param  response:        bytearray or writable memoryview to hold the response data
+        :returns: >= 0 length of the response data, < 0 error
+        """
+        self.mifareclassic_InvalidateAuth()
+        header = bytearray([
+            PN532_COMMAND_INDATAEXCHANGE,
+            self.inListedTag
+        ])
+
+        if (self._interface.writeCommand(header, send)):
+            return -1
+
+        status = self._interface.readResponse_into(self._packetbuffer)
+        if (status < 1):
+            return -2
+
+        if ((self._packetbuffer[0] & 0x3f) != 0):
+            DMSG("Status code indicates an error\n")
+            return -3
+
+        length = status - 1
+        if (length > len(response)):
+            DMSG("Response buffer too small\n")
+            return -4
+
+        response[:length] = self._packetview[1:status]
+        return length
 
     def inListPassiveTarget(self) -> bool:
         """
@@ -796,6 +1941,7 @@ class Pn532:
             peer acting as card/responder.
             :returns: True if command succeeded, False otherwise
         """
+        self._targetsChanged()
         header = bytearray([
             PN532_COMMAND_INLISTPASSIVETARGET,
             1,
@@ -822,17 +1968,21 @@ class Pn532:
 
         status, response = self._interface.readResponse(timeout)
         if (status > 0):
+            self.initiatorCommand = bytearray(response[1:status])    # after the mode byte
             return 1
         elif(PN532_TIMEOUT == status):
             return 0
         else:
             return -2
 
-    def tgInitAsTargetP2P(self, timeout: int) -> int:
+    def tgInitAsTargetP2P(self, timeout: int, gt: bytearray = bytearray()) -> int:
         """
          * Peer to Peer
 
-         """
+        :param  timeout:    max time to wait for an initiator in ms
+        :param  gt:         general bytes of the target (e.g. LLCP parameters), up to 47 bytes
+        :returns: 1 if activated by an initiator, 0 on timeout, <0 if error
+        """
 
         command = bytearray([
             PN532_COMMAND_TGINITASTARGET,
@@ -846,10 +1996,9 @@ class Pn532:
             0xFF, 0xFF,
 
             0x01, 0xFE, 0x0F, 0xBB, 0xBA, 0xA6, 0xC9, 0x89, 0x00, 0x00,  # NFCID3t: Change this to desired value
-
-            0x0a, 0x46, 0x66, 0x6D, 0x01, 0x01, 0x10, 0x02, 0x02, 0x00, 0x80,
-            # LLCP magic number, version parameter and MIUX
-            0x00])
+        ])
+        command += bytearray([len(gt)]) + gt
+        command.append(0x00)    # no historical bytes
 
         return self.tgInitAsTarget(command, timeout)
 
@@ -891,6 +2040,7 @@ class Pn532:
         return True
 
     def inRelease(self, relevantTarget: int = 0) -> bool:
+        self._targetsChanged()
         header = bytearray([
             PN532_COMMAND_INRELEASE,
             relevantTarget,
@@ -900,7 +2050,119 @@ class Pn532:
 
         # read data packet
         status, response = self._interface.readResponse()
-        return status >= 0
+        if (status < 0):
+            return False
+
+        if (relevantTarget == 0):
+            self.inListedTargets = []
+        else:
+            self.inListedTargets = [t for t in self.inListedTargets if t.tg != relevantTarget]
+        return True
+
+    def inATR(self, tg: int, nfcid3i: bytearray = bytearray(), gi: bytearray = bytearray()) -> (bool, bytearray):
+        """
+            Activates a passive NFC-DEP target found by InListPassiveTarget (sends ATR_REQ)
+
+        :param  tg:         target number
+        :param  nfcid3i:    10 bytes NFCID3 of the initiator, empty to let the PN532 choose it
+        :param  gi:         general bytes of the initiator (e.g. LLCP parameters)
+        :returns: (result, atr_res)
+                    result: bool True if the target answered
+                    atr_res: NFCID3t (10), DIDt, BSt, BRt, TO, PPt, [Gt]
+        """
+        header = bytearray([
+            PN532_COMMAND_INATR,
+            tg,
+            (0x01 if nfcid3i else 0x00) | (0x02 if gi else 0x00),   # Next: NFCID3i and Gi present
+        ])
+        if (self._interface.writeCommand(header, bytearray(nfcid3i[:10]) + gi)):
+            return False, bytearray()
+
+        status, response = self._interface.readResponse()
+        if (status < 0 or not response or (response[0] & 0x3f) != 0):
+            DMSG("InATR failed\n")
+            return False, bytearray()
+
+        return True, response[1:]
+
+    def inPSL(self, tg: int, brIt: int, brTi: int) -> bool:
+        """
+            Changes the data rate of an activated ISO14443-4A or NFC-DEP target (PPS / PSL_REQ)
+
+        :param  tg:     target number
+        :param  brIt:   data rate from initiator to target (PN532_BAUDRATE_*)
+        :param  brTi:   data rate from target to initiator (PN532_BAUDRATE_*)
+        :returns: True if the target accepted the new data rate
+        """
+        header = bytearray([
+            PN532_COMMAND_INPSL,
+            tg,
+            brIt,
+            brTi,
+        ])
+        if (self._interface.writeCommand(header)):
+            return False
+
+        status, response = self._interface.readResponse()
+        if (status < 0 or not response or (response[0] & 0x3f) != 0):
+            DMSG("InPSL failed\n")
+            return False
+
+        return True
+
+    def inJumpForDEP(self, active: bool = False, baudrate: int = PN532_BAUDRATE_106KBPS,
+                     nfcid3i: bytearray = bytearray(), gi: bytearray = bytearray(),
+                     timeout: int = 1000) -> (bool, Optional[DepTarget]):
+        """
+            Activates an NFC-DEP target with the PN532 as initiator (e.g. a phone for LLCP/SNEP).
+            The target becomes the inlisted target used by inDataExchange.
+
+        :param  active:     active mode if True, passive mode otherwise
+        :param  baudrate:   PN532_BAUDRATE_106KBPS, PN532_BAUDRATE_212KBPS or PN532_BAUDRATE_424KBPS
+        :param  nfcid3i:    10 bytes NFCID3 of the initiator, empty to let the PN532 choose it
+        :param  gi:         general bytes of the initiator (e.g. LLCP parameters)
+        :param  timeout:    max time to wait for a target in ms
+        :returns: (result, target)
+        """
+        self._targetsChanged()
+        # the FeliCa polling request is mandatory in passive mode at 212/424 kbps
+        passiveData = b'\x00\xff\xff\x01\x00' if (not active and baudrate != PN532_BAUDRATE_106KBPS) else b''
+        header = bytearray([
+            PN532_COMMAND_INJUMPFORDEP,
+            0x01 if active else 0x00,
+            baudrate,
+            (0x01 if passiveData else 0x00) | (0x02 if nfcid3i else 0x00) | (0x04 if gi else 0x00),  # Next
+        ])
+        body = bytearray(passiveData) + nfcid3i[:10] + gi
+
+        if (self._interface.writeCommand(header, body)):
+            return False, None
+
+        status, response = self._interface.readResponse(timeout)
+        if (status < 0 or len(response) < 2 or (response[0] & 0x3f) != 0):
+            DMSG("InJumpForDEP failed\n")
+            return False, None
+
+        target = DepTarget(response[1], bytearray(response[2:]))
+        self.inListedTag = target.tg
+        return True, target
+
+    def inUpgradeBaudRate(self, tg: int, rates: List[int]) -> int:
+        """
+            Switches a target to the highest data rate it accepts, falling back to the next one on error
+
+        :param  tg:     target number
+        :param  rates:  data rates supported by both sides (PN532_BAUDRATE_*), in any order
+        :returns: data rate in use, PN532_BAUDRATE_106KBPS if no faster rate was accepted
+        """
+        for rate in sorted(set(rates), reverse=True):
+            if (rate == PN532_BAUDRATE_106KBPS):
+                break
+            if (self.inPSL(tg, rate, rate)):
+                DMSG("Data rate {} kbps\n".format(106 << rate))
+                return rate
+
+        return PN532_BAUDRATE_106KBPS
 
     def felica_Polling(self, systemCode: int, requestCode: int, timeout: int = 1000) -> (int, bytearray, bytearray, int):
         """
@@ -919,59 +2181,32 @@ class Pn532:
                         pmm                    PMm of the card (8 bytes)
                         systemCodeResponse     System Code of the card (Optional, 2bytes)
         """
-        header = bytearray([
-        PN532_COMMAND_INLISTPASSIVETARGET,
-        1,
-        1,
-        FELICA_CMD_POLLING,
-        (systemCode >> 8) & 0xFF,
-        systemCode & 0xFF,
-        requestCode & 0xFF,
-        0,
-        ])
         no_data = bytearray()
 
-        if (self._interface.writeCommand(header)):
+        status, targets = self.listPassiveTargets(PN532_FELICA_212KBPS, 1, timeout,
+                                                  systemCode=systemCode, requestCode=requestCode)
+        if (status == -2):
             DMSG("Could not send Polling command\n")
             return -1, no_data, no_data, 0
-
-        status, response = self._interface.readResponse(timeout)
-        if (status < 0):
+        elif (status == -3):
             DMSG("Could not receive response\n")
             return -2, no_data, no_data, 0
-
-        # Check NbTg (response[7])
-        if (response[0] == 0):
+        elif (status < 0):
+            DMSG("Wrong response length\n")
+            return -4, no_data, no_data, 0
+        elif (status == 0):
             DMSG("No card had detected\n")
             return 0, no_data, no_data, 0
-        elif (response[0] != 1):
-            DMSG("Unhandled number of targets inlisted. NbTg: ")
-            DMSG_HEX(response[7])
-            DMSG("\n")
-            return -3, no_data, no_data, 0
 
-        self.inListedTag = response[1]
+        target = targets[0]
         DMSG("Tag number: ")
-        DMSG_HEX(response[1])
+        DMSG_HEX(target.tg)
         DMSG("\n")
 
-        # length check
-        responseLength = response[2]
-        if (responseLength != 18 and responseLength != 20):
-            DMSG("Wrong response length\n")
-            return -4, no_data, no_data, 0
-
-        idm = response[4:12]
-        pwm = response[12:24]
-        self._felicaIDm = idm
-        self._felicaPMm = pwm
-
-        if (responseLength == 20):
-            systemCodeResponse = (response[20] << 8) + response[21]
-        else:
-            systemCodeResponse = 0
+        self._felicaIDm = target.idm
+        self._felicaPMm = target.pmm
 
-        return 1, idm, pwm, systemCodeResponse
+        return 1, target.idm, target.pmm, target.system_code
 
     def felica_SendCommand(self, command: bytearray) -> (int, bytearray):
         """
@@ -1177,6 +2412,7 @@ class Pn532:
                 cmd.append(blockData[i][k])
 
         status, response = self.felica_SendCommand(cmd)
+        self.notifyWrite(self._felicaIDm)
         responseLength = len(response)
         if (status != 1):
             DMSG("Write Without Encryption command failed\n")
@@ -1239,6 +2475,7 @@ class Pn532:
         """
     
         # InRelease
+        self._targetsChanged()
         header = bytearray([
             PN532_COMMAND_INRELEASE,
             0x00,  # All target
@@ -1264,4 +2501,5 @@ class Pn532:
             DMSG("\n")
             return -3
 
+        self.inListedTargets = []
         return 1
@@ -1,4 +1,4 @@
-from pn532pi.nfc.llcp import Llcp
+from pn532pi.nfc.llcp import Llcp, LLCP_DEFAULT_MIU, LLCP_LOCAL_MIU
 from pn532pi.nfc.pn532 import Pn532
 from pn532pi.nfc.pn532_log import DMSG
 
@@ -7,17 +7,29 @@ SNEP_DEFAULT_VERSION	= 0x10	# Major: 1, Minor: 0
 SNEP_REQUEST_PUT		= 0x02
 SNEP_REQUEST_GET		= 0x01
 
+SNEP_RESPONSE_CONTINUE	= 0x80
 SNEP_RESPONSE_SUCCESS	= 0x81
 SNEP_RESPONSE_REJECT	= 0xFF
 
 
 class Snep:
-    def __init__(self, interface: Pn532):
+    def __init__(self, interface: Pn532, initiator: bool = False):
+        """
+        :param  interface:  Pn532
+        :param  initiator:  activate the peer as NFC-DEP initiator instead of waiting for it as target
+        """
         self.llcp = Llcp(interface)
+        self.initiator = initiator
+
+    def _activate(self, timeout: int) -> int:
+        if (self.initiator):
+            return self.llcp.activateAsInitiator(timeout or 1000)
+        return self.llcp.activate(timeout)
 
     def write(self, buf: bytearray, timeout: int = 0) -> int:
         """
-        Write a SNEP packet, the packet should be less than (255 - 2 - 3) bytes
+        Write a SNEP packet. Packets larger than an LLCP PDU are sent in two fragments,
+        the second one after the Continue response of the peer, streamed within the LLCP window.
         :param:    buf     the buffer to contain the packet
         :param:    len     length of the buffer
         :param:    timeout max time to wait, 0 means no timeout
@@ -25,8 +37,8 @@ class Snep:
                     =0      timeout
                     <0      failed
         """
-        if (0 >= self.llcp.activate(timeout)):
-            DMSG("failed to activate PN532 as a target\n")
+        if (0 >= self._activate(timeout)):
+            DMSG("failed to activate the peer\n")
             return -1
     
         if (0 >= self.llcp.connect(timeout)):
@@ -37,15 +49,25 @@ class Snep:
         header = bytearray([
         SNEP_DEFAULT_VERSION,
         SNEP_REQUEST_PUT,
-        0,
-        0,
-        0,
-        len(buf),
-        ])
+        ]) + len(buf).to_bytes(4, byteorder='big')
+
+        if (len(header) + len(buf) <= LLCP_DEFAULT_MIU):
+            if (0 >= self.llcp.write(header, buf)):
+                return -3
+        else:
+            message = header + buf
+            size = min(self.llcp.remoteMiu, LLCP_LOCAL_MIU)
+            if (not self.llcp.send(message[:size])):
+                return -3
+
+            status, rbuf = self.llcp.read(ack=False)
+            if (6 > status or SNEP_RESPONSE_CONTINUE != rbuf[1]):
+                DMSG("Expect a continue response\n")
+                return -4
+
+            if (not self.llcp.send(message[size:])):
+                return -3
 
-        if (0 >= self.llcp.write(header, buf)):
-            return -3
-    
         status, rbuf = self.llcp.read() 
         if (6 > status):
             return -4
@@ -67,7 +89,8 @@ class Snep:
 
     def read(self, timeout: int = 0) -> (int, bytearray):
         """
-        read a SNEP packet, the packet will be less than (255 - 2 - 3) bytes
+        read a SNEP packet, a fragmented packet is acknowledged with a Continue response
+        and its fragments are read until it is complete
         :param:    buf     the buffer to contain the packet
         :param:    len     length of the buffer
         :param:    timeout max time to wait, 0 means no timeout
@@ -75,15 +98,15 @@ class Snep:
                     status: int, >=0 length of the packet, <0 failed
                     data: : bytearray, data read
         """
-        if (0 >= self.llcp.activate(timeout)) :
-            DMSG("failed to activate PN532 as a target\n")
+        if (0 >= self._activate(timeout)) :
+            DMSG("failed to activate the peer\n")
             return -1, bytearray()
 
         if (0 >= self.llcp.waitForConnection(timeout)):
             DMSG("failed to set up a connection\n")
             return -2, bytearray()
 
-        status, buf = self.llcp.read()
+        status, buf = self.llcp.read(ack=False)
         if (6 > status):
             return -3, bytearray()
 
@@ -110,12 +133,18 @@ class Snep:
 
         # check message's length
         length = (buf[2] << 24) + (buf[3] << 16) + (buf[4] << 8) + buf[5]
-        # length should not be more than 244 (header + body < 255, header = 6 + 3 + 2)
-        if (length > (status - 6)):
-            DMSG("The SNEP message is too large: {} {}".format(length, length -6))
-            return -4
-
         buf = buf[6:]
+        if (length > len(buf)):
+            DMSG("Fragmented SNEP message: {} of {}\n".format(len(buf), length))
+            header = bytearray([SNEP_DEFAULT_VERSION, SNEP_RESPONSE_CONTINUE, 0, 0, 0, 0])
+            if (not self.llcp.send(header)):
+                return -4, bytearray()
+
+            while (len(buf) < length):
+                status, fragment = self.llcp.read(ack=False)
+                if (0 > status):
+                    return -4, bytearray()
+                buf += fragment
 
         # response a success SNEP message
         header = bytearray([
@@ -0,0 +1,123 @@
+"""
+    tlv: incremental parser of the TLV blocks holding NDEF messages on Type 2 tags and Mifare Classic cards
+    Data is fed as it is read from the tag so the reader can stop as soon as the NDEF message is complete
+"""
+from typing import Optional
+
+from pn532pi.nfc.pn532_log import DMSG
+
+TLV_NULL                            = (0x00)
+TLV_LOCK_CONTROL                    = (0x01)
+TLV_MEMORY_CONTROL                  = (0x02)
+TLV_NDEF_MESSAGE                    = (0x03)
+TLV_PROPRIETARY                     = (0xFD)
+TLV_TERMINATOR                      = (0xFE)
+
+
+def encodeTlvLength(length: int) -> bytearray:
+    """
+    Returns the length field of a TLV: 1 byte up to 254, 0xFF and 2 bytes big endian above
+    """
+    if (length < 0xFF):
+        return bytearray([length])
+    return bytearray([0xFF, (length >> 8) & 0xFF, length & 0xFF])
+
+
+class TlvReader:
+    def __init__(self):
+        self._buf = bytearray()
+        self._pos = 0                   # start of the TLV being parsed
+        self.done = False               # True once the NDEF message or the terminator was found
+        self.message = None             # value of the first NDEF Message TLV, None if not found (yet)
+        self.ndefOffset = None          # offset of the NDEF Message TLV in the data fed, None if not found (yet)
+        self.remaining = 1              # minimum number of bytes still needed to make progress
+        self.controls = []              # (type, value) of the Lock Control and Memory Control TLVs found
+
+    def feed(self, data: bytearray) -> bool:
+        """
+        Parses more data
+
+        :param  data:   next bytes of the tag data area
+        :returns: True when parsing is done (NDEF message complete or terminator found), False if more data is needed
+        """
+        if (self.done):
+            return True
+
+        self._buf += data
+        buf = self._buf
+        while True:
+            pos = self._pos
+            if (pos >= len(buf)):
+                self.remaining = 1
+                return False
+
+            tlvType = buf[pos]
+            if (tlvType == TLV_NULL):
+                self._pos += 1
+                continue
+
+            if (tlvType == TLV_TERMINATOR):
+                DMSG("TLV terminator reached\n")
+                self.done = True
+                return True
+
+            # length: 1 byte, or 0xFF followed by 2 bytes
+            if (pos + 2 > len(buf)):
+                self.remaining = pos + 2 - len(buf)
+                return False
+
+            if (buf[pos + 1] == 0xFF):
+                if (pos + 4 > len(buf)):
+                    self.remaining = pos + 4 - len(buf)
+                    return False
+                length, start = (buf[pos + 2] << 8) | buf[pos + 3], pos + 4
+            else:
+                length, start = buf[pos + 1], pos + 2
+
+            if (start + length > len(buf)):
+                self.remaining = start + length - len(buf)
+                return False
+
+            if (tlvType == TLV_NDEF_MESSAGE):
+                self.ndefOffset = pos
+                self.message = buf[start:start + length]
+                self.done = True
+                return True
+
+            if (tlvType in (TLV_LOCK_CONTROL, TLV_MEMORY_CONTROL)):
+                self.controls.append((tlvType, bytes(buf[start:start + length])))
+
+            self._pos = start + length
+
+    @property
+    def consumed(self) -> int:
+        """
+        Number of bytes fed so far
+        """
+        return len(self._buf)
+
+
+def controlArea(tlvType: int, value: bytes) -> (int, int):
+    """
+    Returns the memory area described by a Lock Control or Memory Control TLV
+
+    :param  tlvType:    TLV_LOCK_CONTROL or TLV_MEMORY_CONTROL
+    :param  value:      3 bytes value of the TLV
+    :returns: (start, end) byte addresses of the area, from the start of the tag memory
+    """
+    pageAddr, byteOffset = value[0] >> 4, value[0] & 0x0F
+    size = value[1] or 256
+    bytesPerPage = 1 << (value[2] & 0x0F)
+    start = pageAddr * bytesPerPage + byteOffset
+    # the size is given in bits for the lock bits and in bytes for reserved memory
+    length = (size + 7) // 8 if (tlvType == TLV_LOCK_CONTROL) else size
+    return start, start + length
+
+
+def readNdefTlv(data: bytearray) -> Optional[bytearray]:
+    """
+    Returns the NDEF message of a complete tag data area, None if it has none
+    """
+    reader = TlvReader()
+    reader.feed(data)
+    return reader.message
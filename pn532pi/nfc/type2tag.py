@@ -0,0 +1,208 @@
+"""
+    type2tag: NDEF on NFC Forum Type 2 tags (Mifare Ultralight, NTAG2xx)
+    The capability container and the first TLVs are read first, then only the pages
+    holding the rest of the NDEF message, in as few multi-page reads as possible
+"""
+from typing import Any, Callable, List, Optional, Tuple
+
+from pn532pi.nfc import ndef
+from pn532pi.nfc.ntag21x import Ntag21x
+from pn532pi.nfc.pn532 import Pn532
+from pn532pi.nfc.pn532_log import DMSG
+from pn532pi.nfc.tlv import TlvReader, controlArea, TLV_NULL, TLV_LOCK_CONTROL, TLV_MEMORY_CONTROL
+
+T2T_CC_PAGE                         = 3
+T2T_DATA_PAGE                       = 4     # first page of the data area
+T2T_PAGE_SIZE                       = 4
+T2T_NDEF_MAGIC                      = (0xE1)
+T2T_READ_SIZE                       = 16    # bytes returned by a READ command
+T2T_CC_WRITE_ACCESS                 = (0x00)  # CC byte 3 of a writable tag
+
+
+class Type2Tag:
+    def __init__(self, pn532: Pn532, fastRead: Optional[bool] = None):
+        """
+        :param  pn532:      Pn532 used to talk to the tag
+        :param  fastRead:   use the NTAG21x FAST_READ command to read any number of pages in one exchange,
+                            None to detect it with GET_VERSION the first time a tag needs more than one READ
+                            (the version is cached per uid, see Ntag21x.getVersion)
+        """
+        self.pn532 = pn532
+        self.fastRead = fastRead
+        self._ntag = Ntag21x(pn532)
+        self._detected = None          # (Pn532.activations, FAST_READ supported) of the last detection
+
+    def _supportsFastRead(self) -> bool:
+        """
+        Checks the tag answers GET_VERSION as a Ultralight EV1 or NTAG21x, both support FAST_READ.
+        Older tags halt on the unknown command, they are selected again.
+        """
+        if (self.fastRead is not None):
+            return self.fastRead
+        if (self._detected is not None and self._detected[0] == self.pn532.activations):
+            return self._detected[1]
+
+        success, version = self._ntag.getVersion(self.pn532._currentUid())
+        supported = success and version.model != ''
+        if (not success):
+            DMSG("GET_VERSION failed, using READ\n")
+            self.pn532.inSelect(self.pn532.inListedTag or 1)
+
+        self._detected = (self.pn532.activations, supported)
+        return supported
+
+    def _readPages(self, firstPage: int, lastPage: int) -> (bool, bytearray):
+        # a single READ is as good as FAST_READ, no need to identify the tag for it
+        if (lastPage - firstPage + 1 > T2T_READ_SIZE // T2T_PAGE_SIZE and self._supportsFastRead()):
+            return self.pn532.ntag21x_FastRead(firstPage, lastPage)
+        return self.pn532.mifareultralight_ReadPages(firstPage, lastPage - firstPage + 1)
+
+    def readNdef(self) -> (bool, bytearray):
+        """
+        Reads the NDEF message of the tag
+
+        :returns: (result, message)
+                    result: bool True if an NDEF message was found, False otherwise
+                    message: bytearray NDEF message
+        """
+        # One READ returns the capability container and the first 12 bytes of the data area
+        success, data = self.pn532.mifareultralight_ReadPages(T2T_CC_PAGE, T2T_READ_SIZE // T2T_PAGE_SIZE)
+        if (not success):
+            return False, bytearray()
+
+        if (data[0] != T2T_NDEF_MAGIC):
+            DMSG("Tag is not NDEF formatted\n")
+            return False, bytearray()
+
+        start = T2T_DATA_PAGE * T2T_PAGE_SIZE
+        end = start + data[2] * 8          # data area size is stored in units of 8 bytes
+        raw = data[start - T2T_CC_PAGE * T2T_PAGE_SIZE:]    # data area read so far
+        reserved = []                      # (start, end) areas of lock bits and reserved memory
+
+        while True:
+            tlv = self._parse(raw, reserved)
+            if (tlv.done):
+                break
+
+            # skip the reserved areas in the next read and fetch at least one READ worth of data
+            addr = start + len(raw)
+            readEnd = min(self._skipReserved(addr, max(tlv.remaining, T2T_READ_SIZE), reserved), end)
+            if (readEnd <= addr):
+                DMSG("NDEF TLV runs past the data area\n")
+                return False, bytearray()
+
+            success, data = self._readPages(addr // T2T_PAGE_SIZE, (readEnd - 1) // T2T_PAGE_SIZE)
+            if (not success):
+                return False, bytearray()
+            raw += data
+
+        if (tlv.message is None):
+            return False, bytearray()
+
+        return True, tlv.message
+
+    def writeNdef(self, message: bytearray, progress: Optional[Callable[[int, int], Any]] = None) -> bool:
+        """
+        Writes an NDEF message of any size that fits the data area of the tag.
+        Lock Control and Memory Control TLVs in front of the NDEF TLV are kept, a Terminator TLV
+        follows the message when there is room for it, and only the pages that differ are written.
+
+        :param  message:    encoded NDEF message (see ndef.encodeMessage)
+        :param  progress:   function called with (pages done, total pages) after each page
+        :returns: True if the tag holds the message, False otherwise
+        """
+        success, data = self.pn532.mifareultralight_ReadPages(T2T_CC_PAGE, T2T_READ_SIZE // T2T_PAGE_SIZE)
+        if (not success):
+            return False
+
+        if (data[0] != T2T_NDEF_MAGIC):
+            DMSG("Tag is not NDEF formatted\n")
+            return False
+        if (data[3] != T2T_CC_WRITE_ACCESS):
+            DMSG("Tag is read only\n")
+            return False
+
+        start = T2T_DATA_PAGE * T2T_PAGE_SIZE
+        size = data[2] * 8
+        first = data[T2T_PAGE_SIZE:]
+        controlsLength = self._controlsLength(first)
+        if (controlsLength > len(first)):
+            DMSG("Control TLVs too long to keep\n")
+            return False
+        prefix = first[:controlsLength]
+
+        layout = prefix + ndef.wrapTlv(message)
+        if (len(layout) == size + 1):
+            layout = layout[:-1]    # the message fills the data area, no room for the terminator
+        if (len(layout) > size):
+            DMSG("NDEF message does not fit the tag\n")
+            return False
+
+        # reserved areas are only declared past the start of the data area, the message must not cross them
+        tlv = TlvReader()
+        tlv.feed(prefix)
+        areas = [controlArea(*control) for control in tlv.controls]
+        if (any(areaStart < start + len(layout) and start < areaEnd for areaStart, areaEnd in areas)):
+            DMSG("NDEF message overlaps a reserved area\n")
+            return False
+
+        layout += bytearray(-len(layout) % T2T_PAGE_SIZE)
+        image = {T2T_DATA_PAGE + i // T2T_PAGE_SIZE: layout[i:i + T2T_PAGE_SIZE]
+                 for i in range(0, len(layout), T2T_PAGE_SIZE)}
+        current = {T2T_DATA_PAGE + i // T2T_PAGE_SIZE: first[i:i + T2T_PAGE_SIZE]
+                   for i in range(0, len(first), T2T_PAGE_SIZE)}
+
+        success, written = self.pn532.mifareultralight_WriteChanges(image, current, progress)
+        DMSG("{} pages written\n".format(written))
+        return success
+
+    @staticmethod
+    def _controlsLength(data: bytearray) -> int:
+        """
+        Returns the length of the Lock Control and Memory Control TLVs (and NULL TLVs between them) at the start of data,
+        more than len(data) if the last one does not end in data
+        """
+        pos = end = 0
+        while (pos < len(data) and data[pos] in (TLV_NULL, TLV_LOCK_CONTROL, TLV_MEMORY_CONTROL)):
+            if (data[pos] == TLV_NULL):
+                pos += 1
+            elif (pos + 1 < len(data)):
+                pos = end = pos + 2 + data[pos + 1]
+            else:
+                return len(data) + 1
+        return end
+
+    @staticmethod
+    def _parse(raw: bytearray, reserved: List[Tuple[int, int]]) -> TlvReader:
+        """
+        Parses the TLVs of the data area read so far, leaving out the reserved areas.
+        Control TLVs found on the way add to reserved and restart the parsing,
+        bytes already parsed may belong to an area they declare.
+        """
+        start = T2T_DATA_PAGE * T2T_PAGE_SIZE
+        while True:
+            tlv = TlvReader()
+            if (reserved):
+                tlv.feed(bytearray(b for i, b in enumerate(raw, start)
+                                   if not any(areaStart <= i < areaEnd for areaStart, areaEnd in reserved)))
+            else:
+                tlv.feed(raw)
+
+            areas = [controlArea(*control) for control in tlv.controls]
+            if (all(area in reserved for area in areas)):
+                return tlv
+            reserved.extend(area for area in areas if area not in reserved)
+
+    @staticmethod
+    def _skipReserved(addr: int, length: int, reserved: List[Tuple[int, int]]) -> int:
+        """
+        Returns the address after length bytes of data starting at addr, not counting reserved bytes
+        """
+        for areaStart, areaEnd in sorted(reserved):
+            if (areaEnd <= addr):
+                continue
+            if (addr + length <= areaStart):
+                break
+            length -= max(0, areaStart - addr)
+            addr = areaEnd
+        return addr + length
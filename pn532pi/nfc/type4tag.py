@@ -0,0 +1,215 @@
+"""
+    type4tag: NDEF on NFC Forum Type 4 tags (DESFire NDEF applications, phones in HCE mode)
+    READ BINARY and UPDATE BINARY are sized to the MLe/MLc of the capability container,
+    within one PN532 frame, and the capability container is cached per uid
+"""
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+from pn532pi.nfc.isodep import IsoDep, ISODEP_MAX_FRAME
+from pn532pi.nfc.pn532 import Pn532
+from pn532pi.nfc.pn532_log import DMSG
+
+T4T_NDEF_AID                        = b'\xd2\x76\x00\x00\x85\x01\x01'
+T4T_CC_FILE                         = (0xE103)
+T4T_CC_LENGTH                       = 15
+T4T_NDEF_FILE_CONTROL_TLV           = (0x04)
+T4T_ACCESS_GRANTED                  = (0x00)
+T4T_NLEN_SIZE                       = 2
+T4T_MAX_OFFSET                      = (0x7FFF)  # highest offset of READ/UPDATE BINARY with P1 bit 7 cleared
+T4T_CC_CACHE_SIZE                   = 16        # number of uids whose capability container is remembered
+
+# Command APDU data does not fit one PN532 frame with the 5 bytes header, nor the response with the status word
+T4T_MAX_READ                        = ISODEP_MAX_FRAME - 2
+T4T_MAX_WRITE                       = ISODEP_MAX_FRAME - 5
+
+ISO7816_INS_SELECT                  = (0xA4)
+ISO7816_INS_READ_BINARY             = (0xB0)
+ISO7816_INS_UPDATE_BINARY           = (0xD6)
+ISO7816_SW_OK                       = (0x9000)
+
+
+class Type4Capability(NamedTuple):
+    """
+    Capability container of a Type 4 tag
+    """
+    version: int
+    mle: int                # max data size of READ BINARY responses
+    mlc: int                # max data size of UPDATE BINARY commands
+    file_id: int            # NDEF file identifier
+    max_size: int           # NDEF file size, including the 2 bytes NLEN
+    read_access: int
+    write_access: int
+
+    @property
+    def read_size(self) -> int:
+        """Bytes read per READ BINARY"""
+        return max(1, min(self.mle, T4T_MAX_READ))
+
+    @property
+    def write_size(self) -> int:
+        """Bytes written per UPDATE BINARY"""
+        return max(1, min(self.mlc, T4T_MAX_WRITE))
+
+
+def parseCapability(data: bytearray) -> Optional[Type4Capability]:
+    """
+    Parses a capability container holding an NDEF File Control TLV
+
+    :returns: Type4Capability, None if the CC is malformed
+    """
+    if (len(data) < T4T_CC_LENGTH or data[7] != T4T_NDEF_FILE_CONTROL_TLV or data[8] < 6):
+        DMSG("Invalid capability container\n")
+        return None
+
+    return Type4Capability(data[2], (data[3] << 8) | data[4], (data[5] << 8) | data[6],
+                           (data[9] << 8) | data[10], (data[11] << 8) | data[12], data[13], data[14])
+
+
+class Type4Tag:
+    def __init__(self, pn532: Pn532, ats: bytearray = bytearray()):
+        """
+        :param  pn532:  Pn532 with the tag inlisted (see Pn532.readPassiveTarget with inlist=True)
+        :param  ats:    ATS of the tag, used to size the ISO-DEP frames
+        """
+        self.pn532 = pn532
+        self.isodep = IsoDep(pn532, ats)
+        self._capabilities = OrderedDict()   # uid -> Type4Capability, most recently used last
+
+    def _select(self, p1: int, data: bytes) -> bool:
+        p2 = 0x00 if p1 == 0x04 else 0x0C      # the application is selected with Le, files without response
+        success, _, sw = self.isodep.command(0x00, ISO7816_INS_SELECT, p1, p2, data, 0x100 if p1 == 0x04 else None)
+        if (not success or sw != ISO7816_SW_OK):
+            DMSG("SELECT failed\n")
+            return False
+        return True
+
+    def _readBinary(self, offset: int, length: int) -> (bool, bytearray):
+        success, data, sw = self.isodep.command(0x00, ISO7816_INS_READ_BINARY, offset >> 8, offset & 0xFF, le=length)
+        if (not success or sw != ISO7816_SW_OK):
+            DMSG("READ BINARY failed\n")
+            return False, bytearray()
+        return True, data
+
+    def _updateBinary(self, offset: int, data: bytes) -> bool:
+        success, _, sw = self.isodep.command(0x00, ISO7816_INS_UPDATE_BINARY, offset >> 8, offset & 0xFF, data)
+        if (not success or sw != ISO7816_SW_OK):
+            DMSG("UPDATE BINARY failed\n")
+            return False
+        return True
+
+    def selectNdef(self, uid: bytearray = bytearray()) -> (bool, Optional[Type4Capability]):
+        """
+        Selects the NDEF application, reads the capability container and selects the NDEF file
+
+        :param  uid:   uid of the tag, used to cache the capability container so repeated taps skip its read.
+                       Pass an empty uid to always read it.
+        :returns: (result, capability)
+        """
+        if (not self._select(0x04, T4T_NDEF_AID)):
+            return False, None
+
+        key = bytes(uid)
+        cc = self._capabilities.get(key) if key else None
+        if (cc is not None):
+            self._capabilities.move_to_end(key)
+        else:
+            if (not self._select(0x00, T4T_CC_FILE.to_bytes(2, byteorder='big'))):
+                return False, None
+            success, data = self._readBinary(0, T4T_CC_LENGTH)
+            if (not success):
+                return False, None
+            cc = parseCapability(data)
+            if (cc is None):
+                return False, None
+
+            if (key):
+                self._capabilities[key] = cc
+                if (len(self._capabilities) > T4T_CC_CACHE_SIZE):
+                    self._capabilities.popitem(last=False)
+
+        if (not self._select(0x00, cc.file_id.to_bytes(2, byteorder='big'))):
+            self.forget(uid)
+            return False, None
+
+        return True, cc
+
+    def forget(self, uid: bytearray = bytearray()):
+        """
+        Drops the cached capability container of a tag
+
+        :param  uid:   uid of the tag, empty to drop all cached capability containers
+        """
+        if (uid):
+            self._capabilities.pop(bytes(uid), None)
+        else:
+            self._capabilities.clear()
+
+    def readNdef(self, uid: bytearray = bytearray()) -> (bool, bytearray):
+        """
+        Reads the NDEF message of the tag
+
+        :param  uid:   uid of the tag, see selectNdef
+        :returns: (result, message)
+                    result: bool True if an NDEF message was read, False otherwise
+                    message: bytearray NDEF message
+        """
+        success, cc = self.selectNdef(uid)
+        if (not success):
+            return False, bytearray()
+        if (cc.read_access != T4T_ACCESS_GRANTED):
+            DMSG("NDEF file not readable\n")
+            return False, bytearray()
+
+        # the first read gets NLEN and as much of the message as allowed
+        success, data = self._readBinary(0, min(cc.read_size, cc.max_size))
+        if (not success or len(data) < T4T_NLEN_SIZE):
+            return False, bytearray()
+
+        length = (data[0] << 8) | data[1]
+        end = T4T_NLEN_SIZE + length
+        if (end > cc.max_size):
+            DMSG("NLEN larger than the NDEF file\n")
+            return False, bytearray()
+
+        message = data[T4T_NLEN_SIZE:end]
+        while (T4T_NLEN_SIZE + len(message) < end):
+            offset = T4T_NLEN_SIZE + len(message)
+            success, data = self._readBinary(offset, min(cc.read_size, end - offset))
+            if (not success or not data):
+                return False, bytearray()
+            message += data
+
+        return True, message
+
+    def writeNdef(self, message: bytearray, uid: bytearray = bytearray()) -> bool:
+        """
+        Writes an NDEF message. NLEN is cleared first and set last,
+        so an interrupted write leaves an empty NDEF file rather than a truncated message.
+
+        :param  message:    encoded NDEF message (see ndef.encodeMessage)
+        :param  uid:        uid of the tag, see selectNdef
+        :returns: True if the tag holds the message, False otherwise
+        """
+        success, cc = self.selectNdef(uid)
+        if (not success):
+            return False
+        if (cc.write_access != T4T_ACCESS_GRANTED):
+            DMSG("NDEF file is read only\n")
+            return False
+        if (T4T_NLEN_SIZE + len(message) > min(cc.max_size, T4T_MAX_OFFSET + 1)):
+            DMSG("NDEF message does not fit the tag\n")
+            return False
+
+        if (not self._updateBinary(0, b'\x00\x00')):
+            return False
+
+        for start in range(0, len(message), cc.write_size):
+            if (not self._updateBinary(T4T_NLEN_SIZE + start, message[start:start + cc.write_size])):
+                return False
+
+        if (not self._updateBinary(0, len(message).to_bytes(T4T_NLEN_SIZE, byteorder='big'))):
+            return False
+
+        self.pn532.notifyWrite(uid)
+        return True
@@ -0,0 +1,57 @@
+"""
+    Test for the card image cache
+"""
+from unittest import TestCase, mock
+
+from pn532pi.nfc.cardcache import CardCache, verifyBlock, verifyCounter
+from pn532pi.nfc.pn532 import Pn532
+
+UID = b'\x04\x11\x22\x33\x44\x55\x66'
+
+
+class TestCardCache(TestCase):
+    def test_get(self):
+        """cached cards expire after the ttl and are evicted least recently used first"""
+        now = [0.0]
+        cache = CardCache(size=2, ttl=10, clock=lambda: now[0])
+
+        cache.put(UID, {4: bytearray(b'\x01\x02\x03\x04')})
+        cache.put(b'\x01', {})
+        self.assertEqual({4: b'\x01\x02\x03\x04'}, cache.get(UID).blocks, 'Incorrect cached content')
+
+        cache.put(b'\x02', {})
+        self.assertIn(UID, cache, 'Recently used card evicted')
+        self.assertNotIn(b'\x01', cache, 'Least recently used card not evicted')
+
+        now[0] = 11.0
+        self.assertIsNone(cache.get(UID), 'Expired card returned')
+
+    def test_verify(self):
+        """a cached card failing verification is dropped"""
+        cache = CardCache()
+        cache.put(UID, {4: b'\x01\x02\x03\x04'}, counter=7)
+
+        read = mock.MagicMock(return_value=(True, bytearray(b'\x01\x02\x03\x04')))
+        self.assertIsNotNone(cache.get(UID, verify=verifyBlock(read, 4)), 'Verified card not returned')
+        read.assert_called_once_with(4)
+
+        self.assertIsNotNone(cache.get(UID, verify=verifyCounter(lambda: (True, 7))), 'Verified card not returned')
+        self.assertIsNone(cache.get(UID, verify=verifyCounter(lambda: (True, 8))), 'Changed card returned')
+        self.assertNotIn(UID, cache, 'Changed card not dropped')
+
+    def test_attach(self):
+        """writes through Pn532 invalidate the cached content"""
+        cache = CardCache()
+        nfc = Pn532(mock.MagicMock())
+        cache.attach(nfc)
+
+        cache.put(UID, {4: b'\x00' * 4, 5: b'\x00' * 4})
+        cache.put(b'\x01', {})
+        nfc.notifyWrite(UID, 4)
+        self.assertEqual({5: b'\x00' * 4}, cache.get(UID).blocks, 'Written block not invalidated')
+
+        nfc.notifyWrite(UID)
+        self.assertNotIn(UID, cache, 'Written card not invalidated')
+
+        nfc.notifyWrite(b'')
+        self.assertEqual(0, len(cache), 'Cache not cleared for an unknown card')
@@ -0,0 +1,93 @@
+"""
+    Test for the DESFire native commands
+"""
+from unittest import TestCase, mock
+
+from pn532pi.nfc.desfire import Desfire, DESFIRE_FILE_VALUE, parseFileSettings
+from pn532pi.nfc.pn532 import Pn532
+
+UID = b'\x04\x11\x22\x33\x44\x55\x66'
+ATS = b'\x06\x75\x77\x81\x02\x80'     # FSC 64
+
+
+def _mock_card(replies):
+    """
+    :param replies: list of responses returned by the card, SW included
+    """
+    nfc = Pn532(mock.MagicMock())
+    nfc.inDataExchange = mock.MagicMock(side_effect=[(True, bytearray(reply)) for reply in replies])
+    return nfc
+
+
+class TestDesfire(TestCase):
+    def test_getVersion(self):
+        """getVersion fetches the additional frames and caches the version per uid"""
+        nfc = _mock_card([
+            b'\x04\x01\x01\x01\x00\x18\x05\x91\xaf',
+            b'\x04\x01\x01\x01\x04\x18\x05\x91\xaf',
+            UID + b'\xba\x34\x56\x78\x90\x12\x19\x91\x00',
+        ])
+        desfire = Desfire(nfc)
+        status, version = desfire.getVersion(UID)
+        self.assertTrue(status, 'getVersion failed!')
+        self.assertEqual(4096, version.storage_size)
+        self.assertEqual(UID, version.uid)
+        self.assertEqual(0x19, version.production_year)
+        self.assertEqual([b'\x90\x60\x00\x00\x00', b'\x90\xaf\x00\x00\x00', b'\x90\xaf\x00\x00\x00'],
+                         [bytes(c[0][0]) for c in nfc.inDataExchange.call_args_list])
+
+        status, version = desfire.getVersion(UID)
+        self.assertTrue(status, 'getVersion failed!')
+        self.assertEqual(3, nfc.inDataExchange.call_count, 'Version read again for a known uid')
+
+    def test_selectApplication(self):
+        """selectApplication is only sent again after the card is activated again"""
+        nfc = _mock_card([b'\x91\x00', b'\x01\x02\x91\x00', b'\x00\x00\x00\x00\x00\x01\x00\x91\x00', b'\x91\x00'])
+        desfire = Desfire(nfc)
+        self.assertTrue(desfire.selectApplication(0x123456, UID), 'selectApplication failed!')
+        self.assertEqual(b'\x90\x5a\x00\x00\x03\x56\x34\x12\x00', nfc.inDataExchange.call_args[0][0])
+        self.assertTrue(desfire.selectApplication(0x123456, UID), 'selectApplication failed!')
+        self.assertEqual(1, nfc.inDataExchange.call_count, 'Application selected twice')
+
+        status, fileIds = desfire.getFileIds(UID)
+        self.assertEqual([1, 2], fileIds)
+        status, settings = desfire.getFileSettings(1, UID)
+        self.assertTrue(status, 'getFileSettings failed!')
+        self.assertEqual(256, settings.size)
+        self.assertEqual((True, fileIds), desfire.getFileIds(UID))
+        self.assertEqual((True, settings), desfire.getFileSettings(1, UID))
+        self.assertEqual(3, nfc.inDataExchange.call_count, 'File settings read again')
+
+        nfc._targetsChanged()
+        self.assertTrue(desfire.selectApplication(0x123456, UID), 'selectApplication failed!')
+        self.assertEqual(4, nfc.inDataExchange.call_count, 'Application not selected after a new activation')
+
+    def test_readData(self):
+        """readData gathers the additional frames of the response"""
+        nfc = _mock_card([bytes(range(59)) + b'\x91\xaf', bytes(range(59, 100)) + b'\x91\x00'])
+        status, data = Desfire(nfc).readData(1, 0, 100)
+        self.assertTrue(status, 'readData failed!')
+        self.assertEqual(bytes(range(100)), data)
+        self.assertEqual(b'\x90\xbd\x00\x00\x07\x01\x00\x00\x00\x64\x00\x00\x00', nfc.inDataExchange.call_args_list[0][0][0])
+
+    def test_writeData(self):
+        """writeData sends the data in additional frames"""
+        nfc = _mock_card([b'\x91\xaf', b'\x91\xaf', b'\x91\x00'])
+        listener = mock.MagicMock()
+        nfc.addWriteListener(listener)
+        self.assertTrue(Desfire(nfc, ATS).writeData(2, bytes(100), uid=UID), 'writeData failed!')
+        frames = [bytes(c[0][0]) for c in nfc.inDataExchange.call_args_list]
+        self.assertEqual([52, 52, 3], [frame[4] for frame in frames])
+        self.assertEqual([0x3D, 0xAF, 0xAF], [frame[1] for frame in frames])
+        listener.assert_called_once_with(UID, None)
+
+    def test_getValue(self):
+        """getValue returns the signed value and parseFileSettings decodes value files"""
+        nfc = _mock_card([b'\xfe\xff\xff\xff\x91\x00', b'\x91\x9d'])
+        desfire = Desfire(nfc)
+        self.assertEqual((True, -2), desfire.getValue(3))
+        self.assertFalse(desfire.getValue(3)[0], 'getValue succeeded with a permission error')
+
+        settings = parseFileSettings(b'\x02\x00\x00\xe0\x00\x00\x00\x00\xe8\x03\x00\x00\x00\x00\x00\x00\x00')
+        self.assertEqual(DESFIRE_FILE_VALUE, settings.file_type)
+        self.assertEqual(1000, settings.upper_limit)
@@ -149,6 +149,7 @@ class TestEmulateTag(TestCase):
         header = _get_header(link)
         self.assertEqual(b'\x90\x00', header, 'Update Binary operation failed!')
         self.assertEqual(b'\x00\x08\xa1\xa2\xa3\xa4\xd5\xd6\xd7\xd8', nfc.ndef_file, 'Incorrect data written!')
+        link.notifyWrite.assert_called_once_with(nfc.uid)
 
     def test_update_ndef_callback(self):
         """updateNdefCallback is called when binary is updated"""
@@ -0,0 +1,130 @@
+"""
+    Test for the ISO-DEP APDU layer
+"""
+from unittest import TestCase, mock
+
+from pn532pi.nfc.isodep import IsoDep, buildApdu, parseAts
+from pn532pi.nfc.pn532 import Pn532
+from pn532pi.interfaces.pn532Interface import Pn532Interface
+
+
+def _mock_interface(resp_frames):
+    interface = mock.MagicMock(spec=Pn532Interface)
+    interface.readResponse.side_effect = resp_frames
+    interface.writeCommand.return_value = 0
+    return interface
+
+
+class TestIsoDep(TestCase):
+    def test_parseAts(self):
+        """parseAts reads the FSC and FWI of the ATS and defaults missing fields"""
+        params = parseAts(b'\x06\x78\x77\x81\x02\x80')
+        self.assertEqual(256, params.fsc)
+        self.assertEqual(8, params.fwi)
+        self.assertTrue(params.cid)
+        self.assertAlmostEqual(77.3, params.fwt, places=1)
+
+        params = parseAts(b'')
+        self.assertEqual(32, params.fsc)
+        self.assertEqual(4, params.fwi)
+
+    def test_buildApdu(self):
+        """buildApdu switches to the extended length form when needed"""
+        self.assertEqual(b'\x00\xa4\x04\x00\x02\xe1\x03\x00', buildApdu(0x00, 0xA4, 0x04, 0x00, b'\xe1\x03', 256))
+        self.assertEqual(b'\x00\xb0\x00\x00\x00', buildApdu(0x00, 0xB0, 0x00, 0x00, le=0x100))
+        self.assertEqual(b'\x00\xb0\x00\x00\x00\x04\x00', buildApdu(0x00, 0xB0, 0x00, 0x00, le=0x400))
+        apdu = buildApdu(0x00, 0xD6, 0x00, 0x00, bytes(300))
+        self.assertEqual(b'\x00\xd6\x00\x00\x00\x01\x2c', apdu[:7])
+        self.assertEqual(307, len(apdu))
+
+    def test_transceive_chaining(self):
+        """transceive sends frames of the card FSC with the MI bit and gathers chained responses"""
+        frames = [
+            (0, b'\x00'),
+            (0, b'\x00'),
+            (0, b'\x40' + bytes(range(10))),
+            (0, b'\x00' + bytes(range(10, 15)) + b'\x90\x00'),
+        ]
+        interface = _mock_interface(frames)
+        nfc = Pn532(interface)
+        nfc.inListedTag = 1
+
+        isodep = IsoDep(nfc, b'\x05\x70\x80\x40\x02')   # FSC 16
+        self.assertEqual(13, isodep.frameSize)
+        status, response = isodep.transceive(bytes(30))
+        self.assertTrue(status, 'transceive failed!')
+        self.assertEqual(bytes(range(15)) + b'\x90\x00', response)
+
+        calls = interface.writeCommand.call_args_list
+        self.assertEqual([b'\x40\x41', b'\x40\x41', b'\x40\x01', b'\x40\x01'], [bytes(c[0][0]) for c in calls])
+        self.assertEqual([13, 13, 4, 0], [len(c[0][1]) for c in calls])
+
+    def test_transmit_get_response(self):
+        """transmit follows 61xx status words with GET RESPONSE"""
+        nfc = Pn532(mock.MagicMock())
+        with mock.patch.object(nfc, 'inDataExchange') as mock_exchange:
+            mock_exchange.side_effect = [
+                (True, bytearray(b'\x01\x02\x61\x03')),
+                (True, bytearray(b'\x03\x04\x05\x90\x00')),
+            ]
+            status, data, sw = IsoDep(nfc).command(0x00, 0xB0, 0x00, 0x00, le=0x100)
+            self.assertTrue(status, 'command failed!')
+            self.assertEqual(b'\x01\x02\x03\x04\x05', data)
+            self.assertEqual(0x9000, sw)
+            self.assertEqual(b'\x00\xc0\x00\x00\x03', mock_exchange.call_args[0][0])
+
+    def test_transmit_wrong_le(self):
+        """transmit resends the command with the Le of a 6Cxx status word"""
+        nfc = Pn532(mock.MagicMock())
+        with mock.patch.object(nfc, 'inDataExchange') as mock_exchange:
+            mock_exchange.side_effect = [
+                (True, bytearray(b'\x6c\x02')),
+                (True, bytearray(b'\xaa\xbb\x90\x00')),
+            ]
+            status, response = IsoDep(nfc).transmit(b'\x00\xca\x00\x00\x00')
+            self.assertTrue(status, 'transmit failed!')
+            self.assertEqual(b'\xaa\xbb\x90\x00', response)
+            self.assertEqual(b'\x00\xca\x00\x00\x02', mock_exchange.call_args[0][0])
+
+    def test_transmit_wrong_le_cases(self):
+        """a 6Cxx status word only replaces the Le field, commands without Le are not resent"""
+        tests = [
+            # command APDU, APDU resent or None
+            (buildApdu(0x00, 0xca, 0x00, 0x00, b'\x01\x02', 0x10), b'\x00\xca\x00\x00\x02\x01\x02\x02'),
+            (buildApdu(0x00, 0xca, 0x00, 0x00, le=0x1000), b'\x00\xca\x00\x00\x00\x00\x02'),
+            (buildApdu(0x00, 0xca, 0x00, 0x00, b'\x01' * 300, 0x10),
+             b'\x00\xca\x00\x00\x00\x01\x2c' + b'\x01' * 300 + b'\x00\x02'),
+            (buildApdu(0x00, 0xca, 0x00, 0x00, b'\x01\x02'), None),
+            (buildApdu(0x00, 0xca, 0x00, 0x00, b'\x01' * 300), None),
+            (buildApdu(0x00, 0xca, 0x00, 0x00), None),
+        ]
+        for apdu, resent in tests:
+            nfc = Pn532(mock.MagicMock())
+            with mock.patch.object(nfc, 'inDataExchange') as mock_exchange:
+                mock_exchange.side_effect = [
+                    (True, bytearray(b'\x6c\x02')),
+                    (True, bytearray(b'\xaa\xbb\x90\x00')),
+                ]
+                isodep = IsoDep(nfc)
+                isodep.frameSize = 400      # the extended APDUs fit one frame
+                status, response = isodep.transmit(apdu)
+                self.assertTrue(status, 'transmit failed!')
+                if (resent is None):
+                    self.assertEqual(b'\x6c\x02', response)
+                    mock_exchange.assert_called_once()
+                else:
+                    self.assertEqual(b'\xaa\xbb\x90\x00', response)
+                    self.assertEqual(resent, mock_exchange.call_args[0][0])
+
+    def test_upgradeBaudRate(self):
+        """upgradeBaudRate only tries the rates the ATS announces in both directions"""
+        nfc = Pn532(mock.MagicMock())
+        nfc.inListedTag = 1
+        with mock.patch.object(nfc, 'inUpgradeBaudRate', return_value=2) as mock_upgrade:
+            isodep = IsoDep(nfc, b'\x06\x78\x77\x81\x02\x80')   # TA1 0x77: 212, 424 and 848 kbps
+            self.assertEqual([1, 2, 3], isodep.params.baud_rates)
+            self.assertEqual(2, isodep.upgradeBaudRate())
+            mock_upgrade.assert_called_once_with(1, [1, 2])
+
+        self.assertEqual([], IsoDep(nfc, b'\x05\x78\x80\x70\x02').params.baud_rates)
+        self.assertEqual([1], parseAts(b'\x06\x78\x11\x81\x02\x80').baud_rates)
@@ -0,0 +1,89 @@
+"""
+    Test for the Mifare Classic keyring
+"""
+import os
+import tempfile
+from unittest import TestCase, mock
+
+from pn532pi.nfc.keyring import MifareKeyring, MIFARE_KEY_DEFAULT, MIFARE_KEY_MAD
+from pn532pi.nfc.pn532 import Pn532
+
+UID = b'\x0a\x0b\x0c\x0d'
+KEY_FLEET = b'\x01\x02\x03\x04\x05\x06'
+
+
+def _mock_pn532(accepted):
+    """
+    :param accepted: (key type, key) accepted by the card
+    """
+    pn532 = Pn532(mock.MagicMock())
+    pn532.mifareclassic_AuthenticateBlock = mock.MagicMock(
+        side_effect=lambda uid, block, keyNumber, key: (keyNumber, key) == accepted)
+    pn532.mifareclassic_Reactivate = mock.MagicMock(return_value=True)
+    return pn532
+
+
+class TestMifareKeyring(TestCase):
+    def test_authenticate(self):
+        """authenticate tries the candidate keys and remembers the one accepted"""
+        pn532 = _mock_pn532((1, KEY_FLEET))
+        keyring = MifareKeyring(pn532, keys=[MIFARE_KEY_DEFAULT])
+        keyring.addKey(KEY_FLEET, sectors=[2])
+
+        status, key = keyring.authenticate(UID, 2)
+        self.assertTrue(status, 'authenticate failed!')
+        self.assertEqual((1, KEY_FLEET), key, 'Incorrect key')
+        self.assertEqual(2, pn532.mifareclassic_AuthenticateBlock.call_count, 'Sector keys not tried first')
+        self.assertEqual(1, pn532.mifareclassic_Reactivate.call_count, 'Card not reactivated after a failure')
+        pn532.mifareclassic_AuthenticateBlock.assert_called_with(UID, 8, 1, KEY_FLEET)
+
+        pn532.mifareclassic_AuthenticateBlock.reset_mock()
+        status, key = keyring.authenticate(UID, 2)
+        self.assertTrue(status, 'authenticate failed!')
+        self.assertEqual(1, pn532.mifareclassic_AuthenticateBlock.call_count, 'Cached key not tried first')
+
+        status, key = keyring.authenticate(UID, 3)
+        self.assertFalse(status, 'authenticate succeeded without a valid key')
+        self.assertIsNone(keyring.keyFor(UID, 3))
+
+    def test_candidates(self):
+        """candidates are ordered by cached key, then by success rate"""
+        pn532 = _mock_pn532((0, MIFARE_KEY_MAD))
+        keyring = MifareKeyring(pn532, keys=[MIFARE_KEY_DEFAULT, MIFARE_KEY_MAD])
+        self.assertEqual([(0, MIFARE_KEY_DEFAULT), (1, MIFARE_KEY_DEFAULT), (0, MIFARE_KEY_MAD), (1, MIFARE_KEY_MAD)],
+                         keyring.candidates(UID, 0))
+
+        keyring.authenticate(UID, 0)
+        self.assertEqual((0, MIFARE_KEY_MAD), keyring.candidates(b'\x01\x02\x03\x04', 5)[0], 'Success rate not used')
+
+    def test_save_load(self):
+        """the key cache survives a save and load"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'keyring.json')
+            keyring = MifareKeyring(_mock_pn532((1, MIFARE_KEY_DEFAULT)), path=path)
+            keyring.authenticate(UID, 1)
+            self.assertTrue(keyring.save(), 'save failed!')
+
+            keyring = MifareKeyring(_mock_pn532((1, MIFARE_KEY_DEFAULT)), path=path)
+            self.assertEqual((1, MIFARE_KEY_DEFAULT), keyring.keyFor(UID, 1), 'Cache not loaded')
+
+            keyring.forget(UID)
+            self.assertIsNone(keyring.keyFor(UID, 1), 'Cache not cleared')
+
+    def test_candidates_success_rate(self):
+        """a key that succeeds once in many attempts goes after a key that always succeeds"""
+        keyring = MifareKeyring(_mock_pn532(None), keys=[MIFARE_KEY_DEFAULT, MIFARE_KEY_MAD])
+        keyring._hits.update({(0, MIFARE_KEY_DEFAULT): 3, (0, MIFARE_KEY_MAD): 2})
+        keyring._attempts.update({(0, MIFARE_KEY_DEFAULT): 30, (0, MIFARE_KEY_MAD): 2})
+        self.assertEqual([(0, MIFARE_KEY_MAD), (1, MIFARE_KEY_DEFAULT), (1, MIFARE_KEY_MAD), (0, MIFARE_KEY_DEFAULT)],
+                         keyring.candidates(UID, 0))
+
+    def test_load_invalid(self):
+        """load rejects files whose top level is not a keyring object"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'keyring.json')
+            for content in ('[1, 2]', '"keys"', '{"cache": [[1]]}', 'not json'):
+                with open(path, 'w') as f:
+                    f.write(content)
+                keyring = MifareKeyring(_mock_pn532(None), path=path)
+                self.assertFalse(keyring.load(), 'Invalid file loaded: {}'.format(content))
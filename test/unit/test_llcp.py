@@ -4,7 +4,9 @@
 """
 from unittest import TestCase, mock
 
-from pn532pi.nfc.llcp import Llcp, buildHeader
+from pn532pi.nfc.llcp import Llcp, buildHeader, buildAggregated, encodeParameters, parseAggregated, \
+    LLCP_GENERAL_BYTES, PARAM_RW, PDU_CC, PDU_CONNECT, PDU_I, PDU_RNR, PDU_RR
+from pn532pi.nfc import pn532
 from pn532pi.nfc.pn532 import Pn532
 
 
@@ -23,6 +25,15 @@ def _get_header(interface):
 def _get_body(interface):
     return interface.tgSetData.call_args[0][1]
 
+def _connected(link, miu=128, rw=1):
+    nfc = Llcp(link)
+    nfc.dsap, nfc.ssap = 0x04, 0x20
+    nfc.remoteMiu, nfc.remoteRw = miu, rw
+    return nfc
+
+def _rr(nr):
+    return 3, buildHeader(0x20, PDU_RR, 0x04) + bytearray([nr])
+
 
 class TestLlcp(TestCase):
     def test_buildHeader(self):
@@ -99,7 +110,8 @@ class TestLlcp(TestCase):
         header = _get_header(link)
         body = _get_body(link)
         self.assertEqual(b'\x11\x20', header)
-        self.assertEqual(b'\x06\x0furn:nfc:sn:snep', body)
+        # service name, then MIUX 120 (MIU 248) and RW 15
+        self.assertEqual(b'\x06\x0furn:nfc:sn:snep\x02\x02\x00\x78\x05\x01\x0f', body)
 
     def test_disconnect(self):
         """disconnect correctly writes an llcp disconnect frame"""
@@ -118,9 +130,9 @@ class TestLlcp(TestCase):
     def test_read(self):
         """read correctly parses an incoming llcp data frame and sends an RR packet"""
         frames = [
-            (8, b'\x03\x00\x10data1'),
-            (9, b'\x03\x00\x24data10'),
-            (10, b'\x03\x00\x73data100'),
+            (8, b'\x03\x00\x00data1'),
+            (9, b'\x03\x00\x14data10'),
+            (10, b'\x03\x00\x23data100'),
         ]
         link = _mock_link(resp_frames=frames)
         nfc = Llcp(link)
@@ -137,7 +149,7 @@ class TestLlcp(TestCase):
     def test_write(self):
         """write correctly encapsulates the passed data in an llcp frame"""
         frames = [
-            (2, b'\x03\x40'),
+            (2, b'\x00\x00'),
         ]
         link = _mock_link(resp_frames=frames)
         nfc = Llcp(link)
@@ -149,3 +161,232 @@ class TestLlcp(TestCase):
         self.assertEqual(b'\x03\x00\x00' + header_payload, header, 'Invalid write header')
         body = link.tgSetData.call_args_list[0][0][1]
         self.assertEqual(b'body', body, 'Invalid write body')
+        # returns without waiting for the RR PDU
+        link.tgSetData.assert_called_once()
+        self.assertEqual(1, nfc.ns)
+
+    def test_write_window(self):
+        """write waits for an acknowledgement only when the window of the peer is full"""
+        frames = [
+            (2, b'\x00\x00'),
+            (2, b'\x00\x00'),
+            _rr(1),
+            _rr(2),
+            (7, buildHeader(0x20, PDU_I, 0x04, 0, 2) + b'done'),
+        ]
+        link = _mock_link(resp_frames=frames)
+        nfc = _connected(link, rw=1)
+
+        self.assertTrue(nfc.write(bytearray(b'one')), 'write failed!')
+        self.assertTrue(nfc.write(bytearray(b'two')), 'write failed!')
+        headers = [bytes(call[0][0]) for call in link.tgSetData.call_args_list]
+        self.assertEqual([buildHeader(4, PDU_I, 0x20, 0, 0) + b'one', b'\x00\x00',
+                          buildHeader(4, PDU_I, 0x20, 1, 0) + b'two'], headers)
+
+        # the RR of the last I PDU is handled by read
+        self.assertEqual((4, b'done'), nfc.read())
+        self.assertEqual((2, 2), (nfc.ns, nfc.va))
+
+    def test_connect_initiator(self):
+        """connect runs over inDataExchange when the PN532 activated the peer as initiator"""
+        atrRes = bytes(10) + b'\x00\x03\x03\x0e\x32\x46\x66\x6d'
+        link = mock.MagicMock(spec=Pn532)
+        link.inJumpForDEP.return_value = (True, pn532.DepTarget(1, bytearray(atrRes)))
+        link.inDataExchange.side_effect = [
+            (True, bytearray(b'\x00\x00')),                         # SYMM
+            (True, buildHeader(0x20, PDU_CC, 0x04)),                # CC
+        ]
+        llcp = Llcp(link)
+
+        self.assertEqual(1, llcp.activateAsInitiator(), 'activateAsInitiator failed!')
+        link.inJumpForDEP.assert_called_once_with(False, pn532.PN532_BAUDRATE_106KBPS, gi=LLCP_GENERAL_BYTES, timeout=1000)
+        link.inUpgradeBaudRate.assert_called_once_with(1, [pn532.PN532_BAUDRATE_212KBPS, pn532.PN532_BAUDRATE_424KBPS])
+
+        self.assertEqual(1, llcp.connect(), 'connect failed!')
+        sent = [bytes(c[0][0]) for c in link.inDataExchange.call_args_list]
+        self.assertEqual(b'\x00\x00', sent[0])
+        self.assertEqual(buildHeader(4, PDU_CONNECT, 0x20), sent[1][:2])
+        link.tgSetData.assert_not_called()
+
+    def test_send_window(self):
+        """send segments data by the MIU of the peer and keeps up to RW I PDUs unacknowledged"""
+        frames = [
+            (2, b'\x00\x00'),
+            (2, b'\x00\x00'),     # the first I PDU is not acknowledged yet, the window allows a second one
+            _rr(2),
+            _rr(3),
+        ]
+        link = _mock_link(resp_frames=frames)
+        nfc = _connected(link, miu=128, rw=2)
+
+        data = bytearray(range(256)) + bytearray(44)
+        self.assertTrue(nfc.send(data), 'send failed!')
+        sent = link.tgSetData.call_args_list
+        self.assertEqual(3, len(sent))
+        for ns, call in enumerate(sent):
+            self.assertEqual(buildHeader(4, PDU_I, 0x20, ns, 0), call[0][0])
+        self.assertEqual(data, b''.join(bytes(call[0][1]) for call in sent))
+        self.assertEqual([128, 128, 44], [len(call[0][1]) for call in sent])
+        self.assertEqual(3, nfc.va)
+
+    def test_send_piggyback(self):
+        """data received while sending is acknowledged by N(R) of the next I PDU and kept for read"""
+        frames = [
+            (5, buildHeader(0x20, PDU_I, 0x04, 0, 0) + b'hi'),
+            _rr(1),
+        ]
+        link = _mock_link(resp_frames=frames)
+        nfc = _connected(link)
+
+        self.assertTrue(nfc.send(bytearray(b'data')), 'send failed!')
+        self.assertEqual(buildHeader(4, PDU_I, 0x20, 0, 1), link.tgSetData.call_args_list[0][0][0])
+
+        num, data = nfc.read()
+        self.assertEqual((2, b'hi'), (num, data))
+        self.assertEqual(b'\x00\x00', bytes(_get_header(link)), 'acknowledged data needs no RR')
+
+    def test_read_deferred_ack(self):
+        """read(ack=False) leaves the acknowledgement to the next I PDU"""
+        frames = [
+            (7, buildHeader(0x20, PDU_I, 0x04, 0, 0) + b'data'),
+            _rr(1),
+        ]
+        link = _mock_link(resp_frames=frames)
+        nfc = _connected(link)
+
+        num, data = nfc.read(ack=False)
+        self.assertEqual((4, b'data'), (num, data))
+        link.tgSetData.assert_not_called()
+
+        self.assertTrue(nfc.send(bytearray(b'reply')), 'send failed!')
+        self.assertEqual(buildHeader(4, PDU_I, 0x20, 0, 1), _get_header(link))
+
+    def test_read_out_of_sequence(self):
+        """read rejects an I PDU whose N(S) is not V(R)"""
+        frames = [
+            (7, buildHeader(0x20, PDU_I, 0x04, 3, 0) + b'data'),
+        ]
+        link = _mock_link(resp_frames=frames)
+        nfc = _connected(link)
+
+        self.assertEqual(-3, nfc.read()[0])
+        self.assertEqual(0, nfc.nr)
+        link.tgSetData.assert_not_called()
+
+    def test_send_wraps_sequence(self):
+        """N(S) wraps modulo 16"""
+        frames = [
+            (2, b'\x00\x00'),
+            (2, b'\x00\x00'),
+            _rr(1),
+        ]
+        link = _mock_link(resp_frames=frames)
+        nfc = _connected(link, miu=128, rw=2)
+        nfc.ns = nfc.va = 15
+
+        self.assertTrue(nfc.send(bytearray(200)), 'send failed!')
+        headers = [call[0][0] for call in link.tgSetData.call_args_list]
+        self.assertEqual([buildHeader(4, PDU_I, 0x20, 15, 0), buildHeader(4, PDU_I, 0x20, 0, 0)], headers)
+        self.assertEqual((1, 1), (nfc.ns, nfc.va))
+
+    def test_general_bytes(self):
+        """both activation modes announce LLCP 1.0 and the local link MIU"""
+        self.assertEqual(b'\x46\x66\x6d\x01\x01\x10\x02\x02\x00\x78', LLCP_GENERAL_BYTES)
+
+    def test_aggregated(self):
+        """buildAggregated and parseAggregated pack and split PDUs with their length"""
+        pdus = [bytearray(b'\x00\x00'), buildHeader(4, PDU_RR, 0x20) + b'\x03', buildHeader(4, PDU_I, 0x20, 1, 2) + b'data']
+        agf = buildAggregated(pdus)
+        self.assertEqual(b'\x00\x80\x00\x02\x00\x00\x00\x03\x13\x60\x03\x00\x07\x13\x20\x12data', agf)
+        self.assertEqual(pdus, parseAggregated(agf[2:]))
+        self.assertEqual(pdus[:1], parseAggregated(agf[2:7]), 'truncated PDUs are dropped')
+
+    def test_read_aggregated(self):
+        """I PDUs of an AGF PDU are read one by one and acknowledged by a single RR"""
+        pdus = [buildHeader(0x20, PDU_I, 0x04, 0, 0) + b'one', buildHeader(0x20, PDU_I, 0x04, 1, 0) + b'two']
+        agf = buildAggregated(pdus)
+        link = _mock_link(resp_frames=[(len(agf), agf)])
+        nfc = _connected(link)
+
+        self.assertEqual((3, b'one'), nfc.read())
+        link.tgSetData.assert_not_called()
+        self.assertEqual((3, b'two'), nfc.read())
+        link.tgSetData.assert_called_once()
+        self.assertEqual(buildHeader(4, PDU_RR, 0x20) + b'\x02', _get_header(link))
+
+    def test_send_aggregated(self):
+        """I PDUs of a window fitting an AGF PDU are sent in one frame"""
+        frames = [
+            (2, b'\x00\x00'),
+            _rr(2),
+        ]
+        link = _mock_link(resp_frames=frames)
+        nfc = _connected(link, miu=4, rw=2)
+
+        self.assertTrue(nfc.send(bytearray(b'abcdefgh')), 'send failed!')
+        link.tgSetData.assert_called_once()
+        self.assertEqual(buildAggregated([buildHeader(4, PDU_I, 0x20, 0, 0) + b'abcd',
+                                          buildHeader(4, PDU_I, 0x20, 1, 0) + b'efgh']), _get_header(link))
+
+    def test_send_busy(self):
+        """send waits for an RR before sending I PDUs to a peer with RW 0 or after an RNR"""
+        frames = [
+            (2, b'\x00\x00'),
+            (2, b'\x00\x00'),
+            _rr(0),
+            (3, buildHeader(0x20, PDU_RNR, 0x04) + b'\x01'),
+            _rr(1),
+            _rr(2),
+        ]
+        link = _mock_link(resp_frames=frames)
+        nfc = _connected(link)
+        nfc._setRemoteParameters(encodeParameters([(PARAM_RW, b'\x00')]))
+
+        self.assertTrue(nfc.send(bytearray(200)), 'send failed!')
+        headers = [bytes(call[0][0]) for call in link.tgSetData.call_args_list]
+        self.assertEqual([b'\x00\x00', b'\x00\x00',
+                          bytes(buildHeader(4, PDU_I, 0x20, 0, 0)),
+                          b'\x00\x00',
+                          bytes(buildHeader(4, PDU_I, 0x20, 1, 0))], headers)
+
+    def test_send_aggregated_turns(self):
+        """a window spanning several AGF PDUs is sent one frame per turn, each answered by the peer"""
+        frames = [
+            (2, b'\x00\x00'),
+            _rr(2),
+            _rr(4),
+        ]
+        link = _mock_link(resp_frames=frames)
+        nfc = _connected(link, miu=40, rw=4)
+
+        data = bytearray(range(160))
+        self.assertTrue(nfc.send(data), 'send failed!')
+        calls = [name for name, _, _ in link.mock_calls if name in ('tgGetData', 'tgSetData')]
+        self.assertEqual(['tgGetData', 'tgSetData', 'tgGetData', 'tgSetData', 'tgGetData'], calls)
+        pdus = [buildHeader(4, PDU_I, 0x20, ns, 0) + data[ns * 40:ns * 40 + 40] for ns in range(4)]
+        self.assertEqual([buildAggregated(pdus[:2]), buildAggregated(pdus[2:])],
+                         [call[0][0] for call in link.tgSetData.call_args_list])
+
+    def test_send_aggregated_link_miu(self):
+        """the AGF PDUs grow to the link MIU the peer announces in its general bytes"""
+        frames = [
+            (2, b'\x00\x00'),
+            _rr(3),
+        ]
+        link = _mock_link(resp_frames=frames)
+        link.tgInitAsTargetP2P.return_value = 1
+        # ATR_REQ: LEN, CMD, NFCID3i, DIDi, BSi, BRi, PPi, then LLCP magic, VERSION and MIUX 120
+        link.initiatorCommand = bytearray(b'\x1b\xd4\x00' + bytes(10) + b'\x00\x00\x00\x32' +
+                                          b'\x46\x66\x6d\x01\x01\x10\x02\x02\x00\x78')
+        nfc = Llcp(link)
+        self.assertEqual(1, nfc.activate(), 'activate failed!')
+        link.tgInitAsTargetP2P.assert_called_once_with(0, LLCP_GENERAL_BYTES)
+        self.assertEqual(248, nfc.linkMiu)
+
+        nfc.dsap, nfc.ssap = 0x04, 0x20
+        nfc.remoteMiu, nfc.remoteRw = 60, 3
+        data = bytearray(range(180))
+        self.assertTrue(nfc.send(data), 'send failed!')
+        pdus = [buildHeader(4, PDU_I, 0x20, ns, 0) + data[ns * 60:ns * 60 + 60] for ns in range(3)]
+        link.tgSetData.assert_called_once()
+        self.assertEqual(buildAggregated(pdus), _get_header(link))
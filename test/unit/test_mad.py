@@ -0,0 +1,83 @@
+"""
+    Test for the Mifare Application Directory
+"""
+from unittest import TestCase, mock
+
+from pn532pi.nfc.mad import Mad, MAD_AID_NDEF, madCrc, parseMad
+from pn532pi.nfc.pn532 import Pn532
+
+UID = b'\x0a\x0b\x0c\x0d'
+
+
+def _mad_sector(aids):
+    data = bytearray([0x01])
+    for aid in aids:
+        data += bytearray([aid & 0xFF, aid >> 8])
+    return bytearray([madCrc(data)]) + data
+
+
+class TestMad(TestCase):
+    def test_parseMad(self):
+        """parseMad returns the AID of each sector and checks the CRC"""
+        data = _mad_sector([MAD_AID_NDEF] * 2 + [0] * 13)
+        self.assertEqual(0x14, _mad_sector([MAD_AID_NDEF] * 15)[0], 'Incorrect MAD CRC')
+        directory = parseMad(data)
+        self.assertEqual(MAD_AID_NDEF, directory[2])
+        self.assertEqual(0, directory[3])
+
+        data[0] ^= 0xFF
+        self.assertEqual({}, parseMad(data), 'Invalid CRC accepted')
+
+    def test_readNdef(self):
+        """readNdef only reads the NDEF sectors until the message is complete"""
+        mad = _mad_sector([0x0000, MAD_AID_NDEF, MAD_AID_NDEF] + [0] * 12)
+        message = bytes(range(20))
+        ndef = b'\x00\x00\x03\x14' + message + b'\xfe'
+        card = {
+            1: mad[:16], 2: mad[16:], 3: b'\x00' * 9 + b'\xc1' + b'\x00' * 6,
+            8: ndef[:16], 9: ndef[16:] + b'\x00' * (32 - len(ndef)),
+        }
+
+        nfc = Pn532(mock.MagicMock())
+        with mock.patch.object(nfc, 'mifareclassic_AuthenticateBlock', return_value=True) as mock_auth, \
+                mock.patch.object(nfc, 'mifareclassic_ReadDataBlock') as mock_read:
+            mock_read.side_effect = lambda block: (True, bytearray(card[block]))
+
+            status, result = Mad(nfc).readNdef(UID)
+            self.assertTrue(status, 'readNdef failed!')
+            self.assertEqual(message, result)
+            self.assertEqual([1, 2, 3, 8, 9], [c[0][0] for c in mock_read.call_args_list])
+            self.assertEqual([0, 8], [c[0][1] for c in mock_auth.call_args_list])
+
+    def test_writeNdef(self):
+        """writeNdef spans the NDEF sectors, skips the trailers and only writes the blocks that changed"""
+        mad = _mad_sector([0x0000, MAD_AID_NDEF, MAD_AID_NDEF] + [0] * 12)
+        card = {block: bytearray(16) for block in range(64)}
+        card[1], card[2], card[3] = mad[:16], mad[16:], bytearray(b'\x00' * 9 + b'\xc1' + b'\x00' * 6)
+        message = bytes(range(60))
+
+        nfc = Pn532(mock.MagicMock())
+        progress = mock.MagicMock()
+
+        def write(block, data):
+            card[block] = bytearray(data)
+            return True
+        with mock.patch.object(nfc, 'mifareclassic_AuthenticateBlock', return_value=True) as mock_auth, \
+                mock.patch.object(nfc, 'mifareclassic_ReadDataBlock') as mock_read, \
+                mock.patch.object(nfc, 'mifareclassic_WriteDataBlock', side_effect=write) as mock_write:
+            mock_read.side_effect = lambda block: (True, bytearray(card[block]))
+
+            self.assertTrue(Mad(nfc).writeNdef(UID, message, progress=progress), 'writeNdef failed!')
+            # 2 + 60 + 1 bytes: blocks 8, 9, 10 of sector 2 and block 12 of sector 3
+            self.assertEqual([8, 9, 10, 12], [c[0][0] for c in mock_write.call_args_list])
+            self.assertEqual([0, 8, 12], [c[0][1] for c in mock_auth.call_args_list])
+            progress.assert_called_with(4, 4)
+
+            status, result = Mad(nfc).readNdef(UID)
+            self.assertTrue(status, 'readNdef failed!')
+            self.assertEqual(message, result)
+
+            mock_write.reset_mock()
+            self.assertTrue(Mad(nfc).writeNdef(UID, message), 'writeNdef failed!')
+            mock_write.assert_not_called()
+            self.assertFalse(Mad(nfc).writeNdef(UID, bytes(200)), 'writeNdef succeeded with a message too large')
@@ -0,0 +1,59 @@
+"""
+    Test for Mifare Classic access bits and read planning
+"""
+from unittest import TestCase, mock
+
+from pn532pi.nfc import pn532
+from pn532pi.nfc.mifareclassic import MifareClassic, SectorPlan, ACCESS_TRANSPORT, KEY_A, KEY_B, \
+    decodeAccessBits, encodeAccessBits, canRead, sectorsForCardType
+from pn532pi.nfc.pn532 import Pn532
+
+UID = b'\x0a\x0b\x0c\x0d'
+KEY = b'\xff\xff\xff\xff\xff\xff'
+
+
+class TestMifareClassic(TestCase):
+    def test_accessBits(self):
+        """access bits are decoded and encoded"""
+        self.assertEqual(ACCESS_TRANSPORT, decodeAccessBits(b'\xff\xff\xff\xff\xff\xff\xff\x07\x80\x69'))
+        self.assertEqual(b'\x7f\x07\x88', encodeAccessBits([0b000, 0b000, 0b000, 0b011]))
+        self.assertEqual([0b100, 0b110, 0b101, 0b011], decodeAccessBits(b'\x00' * 6 + encodeAccessBits([0b100, 0b110, 0b101, 0b011])))
+        self.assertIsNone(decodeAccessBits(b'\xff\xff\xff\xff\xff\xff\xff\x07\x81'), 'Inconsistent access bits accepted')
+
+    def test_canRead(self):
+        """canRead follows the access conditions"""
+        self.assertTrue(canRead(ACCESS_TRANSPORT, 0, KEY_A))
+        self.assertFalse(canRead(ACCESS_TRANSPORT, 0, KEY_B), 'Readable key B used to authenticate')
+        conditions = [0b011, 0b111, 0b000, 0b011]
+        self.assertFalse(canRead(conditions, 0, KEY_A))
+        self.assertTrue(canRead(conditions, 0, KEY_B))
+        self.assertFalse(canRead(conditions, 1, KEY_B))
+        self.assertEqual(40, sectorsForCardType(pn532.CARD_TYPE_MIFARE_CLASSIC_4K))
+
+    def test_planSector(self):
+        """planSector picks the key reading the most blocks"""
+        mfc = MifareClassic(Pn532(mock.MagicMock()))
+        conditions = [0b011, 0b111, 0b000, 0b011]
+        self.assertEqual(SectorPlan(1, KEY_B, [4, 6, 7]), mfc.planSector(1, conditions, True, True))
+        self.assertEqual(SectorPlan(1, KEY_A, [6, 7]), mfc.planSector(1, conditions, True, False))
+        self.assertEqual(SectorPlan(32, KEY_A, list(range(128, 144))), mfc.planSector(32, ACCESS_TRANSPORT, True, True))
+        self.assertEqual(SectorPlan(1, KEY_A, [7]), mfc.planSector(1, [0b111, 0b111, 0b111, 0b011], True, False))
+        self.assertEqual(SectorPlan(1, -1, []), mfc.planSector(1, ACCESS_TRANSPORT, False, True))
+
+    def test_readSector(self):
+        """readSector learns the access conditions from the trailer and skips unreadable blocks"""
+        nfc = Pn532(mock.MagicMock())
+        trailer = bytearray(6) + encodeAccessBits([0b000, 0b111, 0b000, 0b001]) + bytearray(7)
+        card = {4: b'\x04' * 16, 6: b'\x06' * 16, 7: trailer}
+
+        with mock.patch.object(nfc, 'mifareclassic_AuthenticateBlock', return_value=True) as mock_auth, \
+                mock.patch.object(nfc, 'mifareclassic_ReadDataBlock') as mock_read:
+            mock_read.side_effect = lambda block: (True, card[block])
+            mfc = MifareClassic(nfc)
+
+            status, blocks, conditions = mfc.readSector(UID, 1, keyA=KEY, keyB=KEY)
+            self.assertTrue(status, 'readSector failed!')
+            self.assertEqual([0b000, 0b111, 0b000, 0b001], conditions)
+            self.assertEqual({4: card[4], 6: card[6], 7: trailer}, blocks)
+            self.assertEqual([7, 4, 6, 7], [c[0][0] for c in mock_read.call_args_list])
+            self.assertEqual(KEY_A, mock_auth.call_args[0][2], 'Readable key B used to authenticate')
@@ -0,0 +1,65 @@
+"""
+    Test for the NDEF codec
+"""
+from unittest import TestCase
+
+from pn532pi.nfc import ndef
+from pn532pi.nfc.ndef import NdefRecord
+
+
+class TestNdef(TestCase):
+    def test_encode(self):
+        """records are encoded with the correct flags"""
+        message = ndef.encodeMessage([NdefRecord.mime('text/plain', b'hello world')])
+        self.assertEqual(b'\xd2\x0a\x0btext/plainhello world', message)
+
+        message = ndef.encodeMessage([NdefRecord.uri('https://www.example.com'), NdefRecord.text('hi', id=b'1')])
+        self.assertEqual(b'\x91\x01\x0cU\x02example.com' + b'\x59\x01\x05\x01T1\x02enhi', message)
+
+        record = NdefRecord(ndef.TNF_UNKNOWN, b'', bytes(300))
+        self.assertEqual(b'\xc5\x00\x00\x00\x01\x2c' + bytes(300), record.encode())
+        self.assertEqual(len(record.encode()), record.encodedSize())
+
+    def test_parse(self):
+        """parsed records reference the message without copying it"""
+        records = [NdefRecord.uri('tel:123'), NdefRecord.text('bonjour', 'fr', id=b'x'),
+                   NdefRecord(ndef.TNF_EXTERNAL_TYPE, b'example.com:t', bytes(300))]
+        message = ndef.encodeMessage(records)
+
+        parsed = ndef.parseMessage(message)
+        self.assertEqual(records, parsed)
+        self.assertIsInstance(parsed[2].payload, memoryview, 'Payload was copied')
+        self.assertEqual('tel:123', parsed[0].getUri())
+        self.assertEqual(('fr', 'bonjour'), parsed[1].getText())
+
+        self.assertEqual(records[:1], ndef.parseMessage(message[:len(message) - 10])[:1], 'Truncated message not handled')
+
+    def test_chunked(self):
+        """chunked records are joined"""
+        message = b'\xb2\x0a\x03text/plainabc' + b'\x36\x00\x02de' + b'\x56\x00\x01f'
+        self.assertEqual([NdefRecord.mime('text/plain', b'abcdef')], ndef.parseMessage(message))
+
+    def test_encode_chunked(self):
+        """payloads larger than the chunk size are encoded as chunked records and joined by iterRecords"""
+        message = ndef.encodeMessage([NdefRecord.mime('text/plain', b'abcdef')], chunkSize=3)
+        self.assertEqual(b'\xb2\x0a\x03text/plainabc' + b'\x56\x00\x03def', message)
+
+        records = [NdefRecord.uri('tel:123'), NdefRecord.mime('text/plain', bytes(range(25)), id=b'7'),
+                   NdefRecord(ndef.TNF_EXTERNAL_TYPE, b'example.com:t', bytes(300))]
+        self.assertEqual(ndef.encodeMessage(records), ndef.encodeMessage(records, chunkSize=300), 'Record chunked')
+        for chunkSize in (1, 10, 24, 25, 256):
+            message = ndef.encodeMessage(records, chunkSize=chunkSize)
+            self.assertEqual(records, list(ndef.iterRecords(message)), 'Round trip failed, chunk size {}'.format(chunkSize))
+
+    def test_smartPoster(self):
+        """smart poster records hold a uri, a title and an action"""
+        record = NdefRecord.smartPoster('http://example.com', title='Example', action=ndef.SP_ACTION_DO)
+        self.assertEqual('http://example.com', ndef.parseMessage(record.encode())[0].getUri())
+        self.assertEqual(3, len(ndef.parseMessage(record.payload)))
+
+    def test_tlv(self):
+        """NDEF messages are wrapped into an NDEF Message TLV"""
+        message = ndef.encodeMessage([NdefRecord.uri('http://a.b')])
+        tlv = ndef.wrapTlv(message)
+        self.assertEqual(b'\x03' + bytes([len(message)]) + message + b'\xfe', tlv)
+        self.assertEqual(message, ndef.unwrapTlv(b'\x00' + tlv))
@@ -0,0 +1,88 @@
+"""
+    Test for ntag21x class functions
+"""
+from unittest import TestCase, mock
+
+from pn532pi.nfc.ntag21x import Ntag21x, Ntag21xVersion
+from pn532pi.nfc.pn532 import Pn532
+
+
+def _mock_pn532(resp_frames):
+    """
+    :param resp_frames: list of (status, data) to return from inCommunicateThru()
+    """
+    pn532 = mock.MagicMock(spec=Pn532)
+    pn532.inCommunicateThru.side_effect = resp_frames
+    return pn532
+
+
+def _get_command(pn532):
+    return pn532.inCommunicateThru.call_args[0][0]
+
+
+class TestNtag21x(TestCase):
+    def test_getVersion(self):
+        """getVersion identifies the chip and caches the result per uid"""
+        frames = [
+            (True, bytearray(b'\x00\x04\x04\x02\x01\x00\x11\x03')),
+            (True, bytearray(b'\x00\x04\x04\x02\x01\x00\x13\x03')),
+        ]
+        pn532 = _mock_pn532(frames)
+        ntag = Ntag21x(pn532)
+
+        status, version = ntag.getVersion(b'\x01\x02\x03\x04\x05\x06\x07')
+        self.assertTrue(status, 'getVersion failed!')
+        self.assertEqual(b'\x60', _get_command(pn532), 'Incorrect GET_VERSION command')
+        self.assertEqual(Ntag21xVersion(0x04, 0x04, 0x02, 0x01, 0x00, 0x11, 0x03), version)
+        self.assertEqual('NTAG215', version.model, 'Incorrect model')
+        self.assertEqual(504, version.user_memory, 'Incorrect user memory')
+        self.assertEqual(0x83, version.cfg_page, 'Incorrect cfg page')
+
+        status, version = ntag.getVersion(b'\x01\x02\x03\x04\x05\x06\x07')
+        self.assertTrue(status, 'getVersion failed!')
+        self.assertEqual('NTAG215', version.model, 'Cached version not returned')
+        self.assertEqual(1, pn532.inCommunicateThru.call_count, 'Cached version was queried again')
+
+        ntag.forget()
+        status, version = ntag.getVersion(b'\x01\x02\x03\x04\x05\x06\x07')
+        self.assertEqual('NTAG216', version.model, 'Version was not queried after forget')
+
+    def test_auth(self):
+        """auth sends PWD_AUTH and verifies the PACK"""
+        frames = [
+            (True, bytearray(b'\xaa\xbb')),
+            (True, bytearray(b'\xaa\xbb')),
+            (False, bytearray()),
+        ]
+        pn532 = _mock_pn532(frames)
+        ntag = Ntag21x(pn532)
+
+        status, pack = ntag.auth(b'\x12\x34\x56\x78', pack=b'\xaa\xbb')
+        self.assertTrue(status, 'auth failed!')
+        self.assertEqual(b'\x1b\x12\x34\x56\x78', _get_command(pn532), 'Incorrect PWD_AUTH command')
+
+        status, pack = ntag.auth(b'\x12\x34\x56\x78', pack=b'\xcc\xdd')
+        self.assertFalse(status, 'auth succeeded with an unexpected PACK')
+
+        status, pack = ntag.auth(b'\x12\x34\x56\x78')
+        self.assertFalse(status, 'auth succeeded when the tag did not answer')
+
+    def test_readCounter(self):
+        """readCounter reads the 24-bit NFC counter"""
+        pn532 = _mock_pn532([(True, bytearray(b'\x01\x02\x03'))])
+        ntag = Ntag21x(pn532)
+
+        status, count = ntag.readCounter()
+        self.assertTrue(status, 'readCounter failed!')
+        self.assertEqual(b'\x39\x02', _get_command(pn532), 'Incorrect READ_CNT command')
+        self.assertEqual(0x030201, count, 'Incorrect counter value')
+
+    def test_readSignature(self):
+        """readSignature reads the 32 bytes originality signature"""
+        pn532 = _mock_pn532([(True, bytearray(range(32)))])
+        ntag = Ntag21x(pn532)
+
+        status, signature = ntag.readSignature()
+        self.assertTrue(status, 'readSignature failed!')
+        self.assertEqual(b'\x3c\x00', _get_command(pn532), 'Incorrect READ_SIG command')
+        self.assertEqual(bytearray(range(32)), signature, 'Incorrect signature')
@@ -4,7 +4,8 @@
 """
 import re
 from unittest import TestCase, mock
-from pn532pi.nfc.pn532 import Pn532
+from pn532pi.nfc import pn532
+from pn532pi.nfc.pn532 import Pn532, Iso14443ATarget, FelicaTarget, Iso14443BTarget, JewelTarget
 from pn532pi.interfaces.pn532Interface import Pn532Interface
 
 
@@ -18,6 +19,23 @@ def _mock_interface(resp_frames):
     return interface
 
 
+def _mock_interface_into(resp_frames):
+    """
+    :param resp_frames: list of frames to copy into the buffer passed to readResponse_into
+    """
+    frames = iter(resp_frames)
+
+    def readResponse_into(buf, timeout=1000):
+        frame = next(frames)
+        buf[:len(frame)] = frame
+        return len(frame)
+
+    interface = mock.MagicMock(spec=Pn532Interface)
+    interface.readResponse_into.side_effect = readResponse_into
+    interface.writeCommand.return_value = 0
+    return interface
+
+
 def _get_header(interface):
     return interface.writeCommand.call_args[0][0]
 
@@ -119,6 +137,76 @@ class TestPn532(TestCase):
         self.assertRegex(header, b'\x40\x00', 'Incorrect inDataExchange command')
         self.assertRegex(body, b'\x0a\x0b\x0c\x0d', 'Incorrect inDataExchange command')
 
+    def test_inDataExchange_chained(self):
+        """inDataExchange fetches the frames of a response chained with the MI bit"""
+        frames = [
+            (0, b'\x40\x01\x02'),
+            (0, b'\x40\x03'),
+            (0, b'\x00\x04'),
+        ]
+        interface = _mock_interface(resp_frames=frames)
+        nfc = Pn532(interface)
+
+        status, data = nfc.inDataExchange(b'\x0a\x0b')
+        self.assertTrue(status, 'inDataExchange failed!')
+        self.assertEqual(b'\x01\x02\x03\x04', data)
+        self.assertEqual([b'\x0a\x0b', b'', b''], [bytes(c[0][1]) for c in interface.writeCommand.call_args_list])
+
+    def test_inUpgradeBaudRate(self):
+        """inUpgradeBaudRate tries the fastest rate first and falls back on errors"""
+        frames = [
+            (0, b'\x01'),
+            (0, b'\x00'),
+        ]
+        interface = _mock_interface(resp_frames=frames)
+        nfc = Pn532(interface)
+
+        rate = nfc.inUpgradeBaudRate(1, [pn532.PN532_BAUDRATE_212KBPS, pn532.PN532_BAUDRATE_424KBPS])
+        self.assertEqual(pn532.PN532_BAUDRATE_212KBPS, rate)
+        self.assertEqual([b'\x4e\x01\x02\x02', b'\x4e\x01\x01\x01'],
+                         [bytes(c[0][0]) for c in interface.writeCommand.call_args_list])
+
+        interface = _mock_interface(resp_frames=[(0, b'\x01')])
+        nfc = Pn532(interface)
+        self.assertEqual(pn532.PN532_BAUDRATE_106KBPS, nfc.inUpgradeBaudRate(1, [pn532.PN532_BAUDRATE_212KBPS]))
+        self.assertEqual(pn532.PN532_BAUDRATE_106KBPS, nfc.inUpgradeBaudRate(1, []))
+
+    def test_inATR(self):
+        """inATR activates a DEP target and depBaudRates reads the rates of its ATR_RES"""
+        atrRes = bytes(range(10)) + b'\x00\x03\x01\x0e\x32\x46\x66\x6d'
+        interface = _mock_interface(resp_frames=[(0, b'\x00' + atrRes)])
+        nfc = Pn532(interface)
+
+        status, result = nfc.inATR(1, gi=b'\x46\x66\x6d')
+        self.assertTrue(status, 'inATR failed!')
+        self.assertEqual(atrRes, result)
+        self.assertEqual(b'\x50\x01\x02', _get_header(interface))
+        self.assertEqual([pn532.PN532_BAUDRATE_212KBPS], pn532.depBaudRates(result))
+
+    def test_inJumpForDEP(self):
+        """inJumpForDEP activates a DEP target and inlists it"""
+        atrRes = bytes(range(10)) + b'\x00\x03\x03\x0e\x32\x46\x66\x6d'
+        interface = _mock_interface(resp_frames=[(0, b'\x00\x01' + atrRes)])
+        nfc = Pn532(interface)
+
+        status, target = nfc.inJumpForDEP(baudrate=pn532.PN532_BAUDRATE_212KBPS, gi=b'\x46\x66\x6d')
+        self.assertTrue(status, 'inJumpForDEP failed!')
+        self.assertEqual(1, nfc.inListedTag)
+        self.assertEqual(bytes(range(10)), target.nfcid3)
+        self.assertEqual(b'\x46\x66\x6d', target.general_bytes)
+        self.assertEqual(b'\x56\x00\x01\x05', _get_header(interface))
+        self.assertEqual(b'\x00\xff\xff\x01\x00\x46\x66\x6d', _get_body(interface))
+
+    def test_tgInitAsTargetP2P(self):
+        """tgInitAsTargetP2P sends the general bytes and keeps the ATR_REQ of the initiator"""
+        atrReq = b'\x13\xd4\x00' + bytes(10) + b'\x00\x00\x00\x32\x46\x66\x6d'
+        interface = _mock_interface(resp_frames=[(1 + len(atrReq), b'\x04' + atrReq)])
+        nfc = Pn532(interface)
+
+        self.assertEqual(1, nfc.tgInitAsTargetP2P(1000, b'\x46\x66\x6d'))
+        self.assertEqual(b'\x03\x46\x66\x6d\x00', _get_header(interface)[-5:])
+        self.assertEqual(atrReq, nfc.initiatorCommand)
+
     def test_inRelease(self):
         """inRelease correctly executes a data exchange"""
         frames = [
@@ -149,6 +237,175 @@ class TestPn532(TestCase):
         header = _get_header(interface)
         self.assertRegex(header, b'\x4A[\x00-\x02]\x00', 'Incorrect inDataExchange command')
 
+    def test_readPassiveTargetID_into(self):
+        """readPassiveTargetID_into writes the uid into the given buffer"""
+        frames = [
+            b'\x01\x07\x02\x03\x04\x02\xaa\xbb',
+            b'\x00',
+        ]
+        interface = _mock_interface_into(resp_frames=frames)
+        nfc = Pn532(interface)
+        uid = bytearray(10)
+
+        length = nfc.readPassiveTargetID_into(cardbaudrate=0, uid=uid, inlist=True)
+        self.assertEqual(2, length, 'readPassiveTargetID_into failed!')
+        self.assertEqual(b'\xaa\xbb', uid[:length], 'Incorrect uid returned')
+        self.assertEqual(nfc.inListedTag, 0x7, 'Tag was not inlisted')
+
+        length = nfc.readPassiveTargetID_into(cardbaudrate=0, uid=uid)
+        self.assertEqual(0, length, 'readPassiveTargetID_into found a card when none was present')
+
+    def test_inDataExchange_into(self):
+        """inDataExchange_into writes the response into the given buffer"""
+        frames = [
+            b'\x00\x01\x02\x03\x04',
+            b'\x01',
+        ]
+        interface = _mock_interface_into(resp_frames=frames)
+        nfc = Pn532(interface)
+        buf = bytearray(8)
+
+        length = nfc.inDataExchange_into(b'\x0a\x0b', memoryview(buf))
+        self.assertEqual(4, length, 'inDataExchange_into failed!')
+        self.assertEqual(b'\x01\x02\x03\x04', buf[:length])
+
+        length = nfc.inDataExchange_into(b'\x0a\x0b', buf)
+        self.assertLess(length, 0, 'inDataExchange_into succeeded with an error status!')
+
+    def test_readPassiveTarget(self):
+        """readPassiveTarget returns the ATQA, SAK, uid and ATS of the card"""
+        frames = [
+            (0, b'\x01\x01\x03\x44\x20\x07\x01\x02\x03\x04\x05\x06\x07\x05\x78\x80\x70\x02'),
+        ]
+        interface = _mock_interface(resp_frames=frames)
+        nfc = Pn532(interface)
+
+        status, target = nfc.readPassiveTarget()
+        self.assertTrue(status, 'readPassiveTarget failed!')
+        self.assertEqual(Iso14443ATarget(1, 0x0344, 0x20, b'\x01\x02\x03\x04\x05\x06\x07', b'\x05\x78\x80\x70\x02'),
+                         target, 'Incorrect target returned')
+        self.assertEqual(pn532.CARD_TYPE_MIFARE_DESFIRE, target.card_type, 'Incorrect card type')
+
+    def test_classifyTarget(self):
+        """classifyTarget identifies common cards from their ATQA and SAK"""
+        tests = [
+            # atqa, sak, card type
+            (0x0004, 0x08, pn532.CARD_TYPE_MIFARE_CLASSIC_1K),
+            (0x0002, 0x18, pn532.CARD_TYPE_MIFARE_CLASSIC_4K),
+            (0x0004, 0x09, pn532.CARD_TYPE_MIFARE_MINI),
+            (0x0044, 0x00, pn532.CARD_TYPE_MIFARE_ULTRALIGHT),
+            (0x0344, 0x20, pn532.CARD_TYPE_MIFARE_DESFIRE),
+            (0x0f01, 0x08, pn532.CARD_TYPE_MIFARE_CLASSIC_1K),
+            (0x0008, 0x60, pn532.CARD_TYPE_ISO14443_4),
+            (0x0004, 0x01, pn532.CARD_TYPE_UNKNOWN),
+        ]
+        for atqa, sak, card_type in tests:
+            self.assertEqual(card_type, pn532.classifyTarget(atqa, sak),
+                             'Incorrect card type for ATQA {:04x} SAK {:02x}'.format(atqa, sak))
+
+    def test_listPassiveTargets(self):
+        """listPassiveTargets inlists two targets and returns a descriptor for each"""
+        frames = [
+            (0, b'\x02' +
+             b'\x01\x00\x04\x08\x04\xaa\xbb\xcc\xdd' +
+             b'\x02\x03\x44\x20\x07\x01\x02\x03\x04\x05\x06\x07\x05\x78\x80\x70\x02'),
+        ]
+        interface = _mock_interface(resp_frames=frames)
+        nfc = Pn532(interface)
+
+        status, targets = nfc.listPassiveTargets(cardbaudrate=0, maxTargets=2)
+        self.assertEqual(2, status, 'listPassiveTargets failed!')
+
+        header = _get_header(interface)
+        self.assertEqual(b'\x4A\x02\x00', header, 'Incorrect listPassiveTargets command')
+        self.assertEqual([Iso14443ATarget(1, 0x0004, 0x08, b'\xaa\xbb\xcc\xdd', b''),
+                          Iso14443ATarget(2, 0x0344, 0x20, b'\x01\x02\x03\x04\x05\x06\x07', b'\x05\x78\x80\x70\x02')],
+                         targets, 'Incorrect targets returned')
+        self.assertEqual(1, nfc.inListedTag, 'First target was not made current')
+        self.assertEqual(targets, nfc.inListedTargets)
+
+    def test_listPassiveTargets_modulations(self):
+        """listPassiveTargets builds the initiator data and parses the targets of each modulation"""
+        atqb = b'\x50\x01\x02\x03\x04\x00\x00\x00\x00\x00\x71\x71'
+        frames = [
+            (0, b'\x01\x01' + atqb + b'\x01\x00'),
+            (0, b'\x01\x01\x00\x0c\xa1\xa2\xa3\xa4'),
+            (0, b'\x01\x01\x14\x01\x01\x02\x03\x04\x05\x06\x07\x08\x11\x12\x13\x14\x15\x16\x17\x18\x0a\x0b'),
+        ]
+        interface = _mock_interface(resp_frames=frames)
+        nfc = Pn532(interface)
+
+        status, targets = nfc.listPassiveTargets(cardbaudrate=3, maxTargets=1, afi=0x05)
+        self.assertEqual(1, status, 'listPassiveTargets failed for ISO14443B!')
+        self.assertEqual(b'\x4A\x01\x03\x05', _get_header(interface), 'Incorrect ISO14443B command')
+        self.assertEqual([Iso14443BTarget(1, atqb, b'\x00')], targets, 'Incorrect ISO14443B target')
+
+        status, targets = nfc.listPassiveTargets(cardbaudrate=4, maxTargets=1)
+        self.assertEqual(1, status, 'listPassiveTargets failed for Jewel!')
+        self.assertEqual(b'\x4A\x01\x04', _get_header(interface), 'Incorrect Jewel command')
+        self.assertEqual([JewelTarget(1, 0x000c, b'\xa1\xa2\xa3\xa4')], targets, 'Incorrect Jewel target')
+
+        status, targets = nfc.listPassiveTargets(cardbaudrate=2, maxTargets=1, systemCode=0x12fc, requestCode=1)
+        self.assertEqual(1, status, 'listPassiveTargets failed for FeliCa!')
+        self.assertEqual(b'\x4A\x01\x02\x00\x12\xfc\x01\x00', _get_header(interface), 'Incorrect FeliCa command')
+        self.assertEqual([FelicaTarget(1, b'\x01\x02\x03\x04\x05\x06\x07\x08', b'\x11\x12\x13\x14\x15\x16\x17\x18', 0x0a0b)],
+                         targets, 'Incorrect FeliCa target')
+
+        status, targets = nfc.listPassiveTargets(cardbaudrate=4, maxTargets=2)
+        self.assertLess(status, 0, 'listPassiveTargets accepted 2 Jewel targets')
+
+    def test_inSelect_empty_response(self):
+        """inSelect and inDeselect fail on a response without status byte"""
+        nfc = Pn532(_mock_interface(resp_frames=[(0, b''), (0, b'')]))
+        self.assertFalse(nfc.inSelect(2), 'inSelect succeeded without status')
+        self.assertFalse(nfc.inDeselect(1), 'inDeselect succeeded without status')
+
+    def test_inSelect(self):
+        """inSelect selects a target and addresses subsequent card commands to it"""
+        frames = [
+            (1, b'\x00'),
+            (1, b'\x00'),
+            (0, b'\x00'),
+        ]
+        interface = _mock_interface(resp_frames=frames)
+        nfc = Pn532(interface)
+
+        self.assertTrue(nfc.inDeselect(1), 'inDeselect failed!')
+        self.assertEqual(b'\x44\x01', _get_header(interface), 'Incorrect inDeselect command')
+
+        self.assertTrue(nfc.inSelect(2), 'inSelect failed!')
+        self.assertEqual(b'\x54\x02', _get_header(interface), 'Incorrect inSelect command')
+
+        nfc.mifareclassic_WriteDataBlock(blockNumber=4, data=bytearray(16))
+        self.assertEqual(b'\x40\x02\xa0\x04', _get_header(interface)[:4], 'Command not sent to selected target')
+
+    def test_inAutoPoll(self):
+        """inAutoPoll correctly polls for several target types and parses each target found"""
+        frames = [
+            (0, b'\x02' +
+             b'\x10\x09\x01\x00\x04\x08\x04\xaa\xbb\xcc\xdd' +
+             b'\x11\x13\x02\x12\x01\x01\x02\x03\x04\x05\x06\x07\x08\x11\x12\x13\x14\x15\x16\x17\x18'),
+            (0, b'\x00'),
+        ]
+        interface = _mock_interface(resp_frames=frames)
+        nfc = Pn532(interface)
+
+        status, targets = nfc.inAutoPoll(types=[0x10, 0x11], pollNr=3, period=2)
+        self.assertEqual(2, status, 'inAutoPoll failed!')
+
+        header = _get_header(interface)
+        self.assertEqual(b'\x60\x03\x02\x10\x11', header, 'Incorrect inAutoPoll command')
+        self.assertEqual((0x10, Iso14443ATarget(1, 0x0004, 0x08, b'\xaa\xbb\xcc\xdd', b'')), targets[0],
+                         'Incorrect ISO14443A target returned')
+        self.assertEqual((0x11, FelicaTarget(2, b'\x01\x02\x03\x04\x05\x06\x07\x08',
+                                             b'\x11\x12\x13\x14\x15\x16\x17\x18', 0)), targets[1],
+                         'Incorrect FeliCa target returned')
+        self.assertEqual(1, nfc.inListedTag, 'First target was not inlisted')
+
+        status, targets = nfc.inAutoPoll()
+        self.assertEqual(0, status, 'inAutoPoll found targets when none were present')
+        self.assertEqual([], targets)
+
     def test_setRFField(self):
         """setRFField correctly sets the RF on/ff and autoRFCA fields"""
         frames = [
@@ -231,6 +488,34 @@ class TestPn532(TestCase):
         header = _get_header(interface)
         self.assertEqual(b'\x40\x01\x61\x12' + key + uid, header, 'Incorrect mifareclassic_AuthenticateBlock command')
 
+    def test_mifareclassic_AuthenticateBlock_skipsAuthenticatedSector(self):
+        """mifareclassic_AuthenticateBlock only authenticates again when the sector, key or card changes"""
+        frames = [
+            (0, b'\x00'),  # auth sector 1
+            (0, b'\x00'),  # auth sector 2
+            (0, b'\x00'),  # auth sector 2 with key B
+            (0, b'\x00\x01'),  # inRelease
+            (0, b'\x14'),  # auth sector 2 with key B fails
+            (0, b'\x00'),  # auth sector 2 with key B
+        ]
+        interface = _mock_interface(resp_frames=frames)
+        nfc = Pn532(interface)
+        uid = b'\x0a\x0b\x0c\x0d'
+        key = b'\xff\xfe\xfd\xfc\xfb\xfa'
+
+        self.assertTrue(nfc.mifareclassic_AuthenticateBlock(uid, 4, 0, key))
+        self.assertTrue(nfc.mifareclassic_AuthenticateBlock(uid, 7, 0, key))
+        self.assertEqual(1, interface.writeCommand.call_count, 'Authenticated sector was authenticated again')
+
+        self.assertTrue(nfc.mifareclassic_AuthenticateBlock(uid, 8, 0, key))
+        self.assertTrue(nfc.mifareclassic_AuthenticateBlock(uid, 8, 1, key))
+        self.assertEqual(3, interface.writeCommand.call_count, 'New sector or key type was not authenticated')
+
+        self.assertTrue(nfc.inRelease())
+        self.assertFalse(nfc.mifareclassic_AuthenticateBlock(uid, 8, 1, key))
+        self.assertTrue(nfc.mifareclassic_AuthenticateBlock(uid, 8, 1, key))
+        self.assertEqual(6, interface.writeCommand.call_count, 'Authentication was not reset by inRelease or an error')
+
     def test_mifareclassic_ReadDataBlock(self):
         """mifareclassic_ReadDataBlock correctly reads a data block"""
         frames = [
@@ -247,6 +532,256 @@ class TestPn532(TestCase):
         self.assertEqual(b'\x01\x02\x03\x04\x05\x06\x07\x08\x11\x12\x13\x14\x15\x16\x17\x18', data,
                          'Incorrect data returned')
 
+    def test_mifareclassic_ReadDataBlock_into(self):
+        """mifareclassic_ReadDataBlock_into reads a data block into the given buffer"""
+        frames = [
+            b'\x00\x01\x02\x03\x04\x05\x06\x07\x08\x11\x12\x13\x14\x15\x16\x17\x18',
+        ]
+        interface = _mock_interface_into(resp_frames=frames)
+        nfc = Pn532(interface)
+        buf = bytearray(32)
+
+        status = nfc.mifareclassic_ReadDataBlock_into(blockNumber=0x12, data=memoryview(buf)[16:])
+        self.assertTrue(status, 'mifareclassic_ReadDataBlock_into failed!')
+
+        header = _get_header(interface)
+        self.assertEqual(b'\x40\x01\x30\x12', header, 'Incorrect mifareclassic_ReadDataBlock_into command')
+        self.assertEqual(b'\x01\x02\x03\x04\x05\x06\x07\x08\x11\x12\x13\x14\x15\x16\x17\x18', buf[16:],
+                         'Incorrect data returned')
+
+    def test_mifareclassic_SectorLayout(self):
+        """mifareclassic sector helpers handle the 4 block and 16 block sectors"""
+        nfc = Pn532(_mock_interface(resp_frames=[]))
+        tests = [
+            # sector, first block, blocks in sector
+            (0, 0, 4),
+            (15, 60, 4),
+            (31, 124, 4),
+            (32, 128, 16),
+            (39, 240, 16),
+        ]
+        for sector, first_block, num_blocks in tests:
+            self.assertEqual(first_block, nfc.mifareclassic_SectorFirstBlock(sector))
+            self.assertEqual(num_blocks, nfc.mifareclassic_BlocksInSector(sector))
+            self.assertEqual(sector, nfc.mifareclassic_BlockToSector(first_block + num_blocks - 1))
+            self.assertTrue(nfc.mifareclassic_IsFirstBlock(first_block))
+            self.assertTrue(nfc.mifareclassic_IsTrailerBlock(first_block + num_blocks - 1))
+
+    def test_mifareclassic_ReadSector(self):
+        """mifareclassic_ReadSector authenticates once and reads every block of the sector"""
+        nfc = Pn532(_mock_interface(resp_frames=[]))
+        uid = b'\x0a\x0b\x0c\x0d'
+        key = b'\xff\xff\xff\xff\xff\xff'
+
+        with mock.patch.object(nfc, 'mifareclassic_AuthenticateBlock', return_value=True) as mock_auth, \
+                mock.patch.object(nfc, 'mifareclassic_ReadDataBlock') as mock_read:
+            mock_read.side_effect = lambda block: (True, bytearray([block] * 16))
+
+            status, blocks = nfc.mifareclassic_ReadSector(uid, 33, 1, key)
+            self.assertTrue(status, 'mifareclassic_ReadSector failed!')
+            mock_auth.assert_called_once_with(uid, 144, 1, key)
+            self.assertEqual([bytearray([b] * 16) for b in range(144, 160)], blocks, 'Incorrect blocks returned')
+
+    def test_mifareclassic_WriteSector(self):
+        """mifareclassic_WriteSector authenticates once and skips blocks set to None"""
+        nfc = Pn532(_mock_interface(resp_frames=[]))
+        uid = b'\x0a\x0b\x0c\x0d'
+        key = b'\xff\xff\xff\xff\xff\xff'
+
+        with mock.patch.object(nfc, 'mifareclassic_AuthenticateBlock', return_value=True) as mock_auth, \
+                mock.patch.object(nfc, 'mifareclassic_WriteDataBlock', return_value=True) as mock_write:
+            status = nfc.mifareclassic_WriteSector(uid, 0, 0, key, [None, b'\x01' * 16, b'\x02' * 16, None])
+            self.assertTrue(status, 'mifareclassic_WriteSector failed!')
+            mock_auth.assert_called_once_with(uid, 0, 0, key)
+            self.assertEqual([mock.call(1, b'\x01' * 16), mock.call(2, b'\x02' * 16)], mock_write.call_args_list)
+
+            self.assertFalse(nfc.mifareclassic_WriteSector(uid, 0, 0, key, [None] * 5), 'Too many blocks accepted')
+
+    def test_mifareclassic_DumpCard(self):
+        """mifareclassic_DumpCard reports failing sectors without aborting the dump"""
+        nfc = Pn532(_mock_interface(resp_frames=[]))
+        uid = b'\x0a\x0b\x0c\x0d'
+        key = b'\xff\xff\xff\xff\xff\xff'
+
+        with mock.patch.object(nfc, 'mifareclassic_ReadSector') as mock_read_sector, \
+                mock.patch.object(nfc, 'mifareclassic_Reactivate', return_value=True) as mock_reactivate:
+            mock_read_sector.side_effect = [(True, [b'a']), (False, []), (True, [b'c'])]
+
+            results = list(nfc.mifareclassic_DumpCard(uid, 0, key, numSectors=3))
+            self.assertEqual([(0, True, [b'a']), (1, False, []), (2, True, [b'c'])], results)
+            mock_reactivate.assert_called_once_with(uid)
+
+    def test_valueBlock(self):
+        """encodeValueBlock and decodeValueBlock handle the value block format"""
+        block = pn532.encodeValueBlock(-2, 5)
+        self.assertEqual(b'\xfe\xff\xff\xff\x01\x00\x00\x00\xfe\xff\xff\xff\x05\xfa\x05\xfa', block)
+        self.assertEqual((True, -2, 5), pn532.decodeValueBlock(block))
+
+        block[4] = 0
+        self.assertFalse(pn532.decodeValueBlock(block)[0], 'Invalid value block accepted')
+
+    def test_mifareclassic_AddValue(self):
+        """mifareclassic_AddValue increments or decrements then transfers"""
+        frames = [
+            (0, b'\x00'),
+            (0, b'\x00'),
+            (0, b'\x00'),
+            (0, b'\x00'),
+            (0, b'\x14'),
+        ]
+        interface = _mock_interface(resp_frames=frames)
+        nfc = Pn532(interface)
+
+        self.assertTrue(nfc.mifareclassic_AddValue(5, 0x100), 'mifareclassic_AddValue failed!')
+        self.assertEqual([
+            mock.call(b'\x40\x01\xc1\x05\x00\x01\x00\x00'),
+            mock.call(b'\x40\x01\xb0\x05'),
+        ], interface.writeCommand.call_args_list)
+
+        interface.writeCommand.reset_mock()
+        self.assertTrue(nfc.mifareclassic_AddValue(5, -3, transferBlock=6), 'mifareclassic_AddValue failed!')
+        self.assertEqual([
+            mock.call(b'\x40\x01\xc0\x05\x03\x00\x00\x00'),
+            mock.call(b'\x40\x01\xb0\x06'),
+        ], interface.writeCommand.call_args_list)
+
+        self.assertFalse(nfc.mifareclassic_Restore(5), 'mifareclassic_Restore succeeded with an error status')
+        self.assertEqual(b'\x40\x01\xc2\x05\x00\x00\x00\x00', _get_header(interface))
+
+    def test_mifareclassic_WriteChanges(self):
+        """mifareclassic_WriteChanges writes the changed blocks only, trailers last"""
+        nfc = Pn532(_mock_interface(resp_frames=[]))
+        uid = b'\x0a\x0b\x0c\x0d'
+        key = b'\xff\xff\xff\xff\xff\xff'
+        card = {4: b'\x00' * 16, 5: b'\x01' * 16, 7: b'\x07' * 16, 8: b'\x08' * 16}
+        image = {0: b'\x00' * 16, 7: b'\xff' * 16, 5: b'\x05' * 16, 4: b'\x00' * 16, 8: b'\x08' * 16}
+
+        with mock.patch.object(nfc, 'mifareclassic_AuthenticateBlock', return_value=True) as mock_auth, \
+                mock.patch.object(nfc, 'mifareclassic_ReadDataBlock') as mock_read, \
+                mock.patch.object(nfc, 'mifareclassic_WriteDataBlock', return_value=True) as mock_write:
+            mock_read.side_effect = lambda block: (True, card[block])
+
+            status, written = nfc.mifareclassic_WriteChanges(uid, image, 0, key)
+            self.assertTrue(status, 'mifareclassic_WriteChanges failed!')
+            self.assertEqual(2, written, 'Incorrect number of blocks written')
+            self.assertEqual([mock.call(uid, 4, 0, key), mock.call(uid, 8, 0, key)], mock_auth.call_args_list)
+            self.assertEqual([mock.call(5, b'\x05' * 16), mock.call(7, b'\xff' * 16)], mock_write.call_args_list)
+
+            mock_read.reset_mock()
+            status, written = nfc.mifareclassic_WriteChanges(uid, image, 0, key, current=dict(image))
+            self.assertEqual((True, 0), (status, written), 'Blocks written with a matching current image')
+            mock_read.assert_not_called()
+
+    def test_mifareclassic_WriteChanges_trailer(self):
+        """mifareclassic_WriteChanges does not rewrite a trailer whose key A only reads back as zeros"""
+        nfc = Pn532(_mock_interface(resp_frames=[]))
+        uid = b'\x0a\x0b\x0c\x0d'
+        keyA = b'\xa0\xa1\xa2\xa3\xa4\xa5'
+        keyB = b'\xb0\xb1\xb2\xb3\xb4\xb5'
+        access = b'\xff\x07\x80\x69'
+        tests = [
+            # key number, key, trailer read from the card, trailer of the image, written
+            (0, keyA, b'\x00' * 6 + access + keyB, keyA + access + keyB, False),
+            (0, keyA, b'\x00' * 6 + access + keyB, keyA + b'\x7f\x07\x88\x69' + keyB, True),
+            (0, keyA, b'\x00' * 6 + access + keyB, b'\xff' * 6 + access + keyB, True),
+            (1, keyB, b'\x00' * 6 + access + b'\x00' * 6, keyA + access + keyB, False),
+            (1, keyB, b'\x00' * 6 + access + b'\x00' * 6, keyA + access + b'\xff' * 6, True),
+        ]
+        for keyNumber, key, card, trailer, write in tests:
+            with mock.patch.object(nfc, 'mifareclassic_AuthenticateBlock', return_value=True), \
+                    mock.patch.object(nfc, 'mifareclassic_ReadDataBlock', return_value=(True, bytearray(card))), \
+                    mock.patch.object(nfc, 'mifareclassic_WriteDataBlock', return_value=True) as mock_write:
+                status, written = nfc.mifareclassic_WriteChanges(uid, {7: trailer}, keyNumber, key)
+                self.assertTrue(status, 'mifareclassic_WriteChanges failed!')
+                self.assertEqual(int(write), written, 'Incorrect trailer write for {}'.format(trailer.hex()))
+                self.assertEqual(write, mock_write.called)
+
+    def test_mifareultralight_WriteChanges(self):
+        """mifareultralight_WriteChanges reads 4 pages at a time and writes the changed pages only"""
+        nfc = Pn532(_mock_interface(resp_frames=[]))
+
+        with mock.patch.object(nfc, 'mifareultralight_ReadPages') as mock_read, \
+                mock.patch.object(nfc, 'mifareultralight_WritePage', return_value=True) as mock_write:
+            mock_read.side_effect = lambda page, num: (True, bytearray(range(page * 4, (page + num) * 4)))
+
+            image = {4: b'\x10\x11\x12\x13', 5: b'\x00\x00\x00\x00', 6: b'\x18\x19\x1a\x1b'}
+            status, written = nfc.mifareultralight_WriteChanges(image)
+            self.assertTrue(status, 'mifareultralight_WriteChanges failed!')
+            self.assertEqual(1, written, 'Incorrect number of pages written')
+            mock_read.assert_called_once_with(4, 4)
+            mock_write.assert_called_once_with(5, b'\x00\x00\x00\x00')
+
+    def test_rawExchangeInvalidatesAuth(self):
+        """raw exchanges and Ultralight commands forget the authenticated Mifare Classic sector"""
+        calls = [
+            lambda nfc: nfc.inDataExchange(b'\x30\x04'),
+            lambda nfc: nfc.inCommunicateThru(b'\x30\x04'),
+            lambda nfc: nfc.mifareultralight_ReadPage(4),
+            lambda nfc: nfc.mifareultralight_WritePage(4, b'\x00' * 4),
+        ]
+        for call in calls:
+            nfc = Pn532(_mock_interface(resp_frames=[(0, b'\x00'), (17, b'\x00' * 17)]))
+            self.assertTrue(nfc.mifareclassic_AuthenticateBlock(b'\x01\x02\x03\x04', 4, 0, b'\xff' * 6))
+            call(nfc)
+            self.assertIsNone(nfc._authState)
+
+    def test_writeListener(self):
+        """write commands notify the write listeners with the uid of the card"""
+        frames = [
+            (0, b'\x01\x01\x00\x04\x08\x04\x0a\x0b\x0c\x0d'),  # listPassiveTargets
+            (0, b'\x00'),  # mifareclassic_WriteDataBlock
+            (0, b'\x00'),  # mifareultralight_WritePage
+        ]
+        nfc = Pn532(_mock_interface(resp_frames=frames))
+        listener = mock.MagicMock()
+        nfc.addWriteListener(listener)
+
+        nfc.listPassiveTargets(pn532.PN532_MIFARE_ISO14443A_106KBPS, 1)
+        nfc.mifareclassic_WriteDataBlock(4, b'\x00' * 16)
+        nfc.mifareultralight_WritePage(6, b'\x00' * 4)
+        self.assertEqual([mock.call(b'\x0a\x0b\x0c\x0d', 4), mock.call(b'\x0a\x0b\x0c\x0d', 6)], listener.call_args_list)
+
+        nfc.removeWriteListener(listener)
+        nfc.notifyWrite(b'')
+        self.assertEqual(2, listener.call_count, 'Removed listener was called')
+
+    def test_writeListener_readPassiveTarget(self):
+        """write listeners get the uid of the card found last by readPassiveTargetID, not of an older listing"""
+        frames = [
+            (0, b'\x01\x01\x00\x04\x08\x04\x0a\x0b\x0c\x0d'),     # listPassiveTargets: card A
+            (0, b'\x01\x01\x00\x44\x00\x04\x01\x02\x03\x04'),     # readPassiveTargetID: card B
+            (0, b'\x00'),  # mifareultralight_WritePage
+            (0, b'\x00'),  # mifareultralight_WritePage
+        ]
+        nfc = Pn532(_mock_interface(resp_frames=frames))
+        listener = mock.MagicMock()
+        nfc.addWriteListener(listener)
+
+        nfc.listPassiveTargets(pn532.PN532_MIFARE_ISO14443A_106KBPS, 1)
+        nfc.readPassiveTargetID(pn532.PN532_MIFARE_ISO14443A_106KBPS)
+        nfc.mifareultralight_WritePage(4, b'\x00' * 4)
+        listener.assert_called_with(b'\x01\x02\x03\x04', 4)
+
+        # the uid is unknown once the targets changed without a card found: all cached cards are invalidated
+        nfc._targetsChanged()
+        nfc.inListedTargets = []
+        nfc.mifareultralight_WritePage(4, b'\x00' * 4)
+        listener.assert_called_with(b'', 4)
+
+    def test_writeListener_readPassiveTargetID_into(self):
+        """readPassiveTargetID_into records the uid of the card for the write listeners"""
+        interface = _mock_interface_into([b'\x01\x01\x00\x44\x00\x04\x01\x02\x03\x04'])
+        interface.readResponse.side_effect = [(0, b'\x00')]
+        nfc = Pn532(interface)
+        nfc.inListedTargets = [Iso14443ATarget(1, 0x0004, 0x08, b'\x0a\x0b\x0c\x0d', b'')]
+        listener = mock.MagicMock()
+        nfc.addWriteListener(listener)
+
+        uid = bytearray(10)
+        self.assertEqual(4, nfc.readPassiveTargetID_into(pn532.PN532_MIFARE_ISO14443A_106KBPS, uid))
+        nfc.mifareultralight_WritePage(4, b'\x00' * 4)
+        listener.assert_called_once_with(b'\x01\x02\x03\x04', 4)
+
     def test_mifareclassic_WriteDataBlock(self):
         """mifareclassic_WriteDataBlock correctly reads a data block"""
         frames = [
@@ -332,6 +867,68 @@ class TestPn532(TestCase):
         self.assertEqual(b'\x40\x01\x30\x12', header, 'Incorrect mifareultralight_ReadPage command')
         self.assertEqual(b'\x01\x02\x03\x04', data, 'Incorrect data returned')  # Only first page is returned
 
+    def test_mifareultralight_ReadPage_into(self):
+        """mifareultralight_ReadPage_into reads a page into the given buffer"""
+        frames = [
+            b'\x00\x01\x02\x03\x04\x05\x06\x07\x08\x11\x12\x13\x14\x15\x16\x17\x18',
+        ]
+        interface = _mock_interface_into(resp_frames=frames)
+        nfc = Pn532(interface)
+        buf = bytearray(4)
+
+        status = nfc.mifareultralight_ReadPage_into(page=0x12, buffer=buf)
+        self.assertTrue(status, 'mifareultralight_ReadPage_into failed!')
+        self.assertEqual(b'\x01\x02\x03\x04', buf, 'Incorrect data returned')
+
+    def test_mifareultralight_ReadPages(self):
+        """mifareultralight_ReadPages uses all 4 pages returned by each READ"""
+        frames = [
+            b'\x00' + bytes(range(0, 16)),
+            b'\x00' + bytes(range(16, 32)),
+        ]
+        interface = _mock_interface_into(resp_frames=frames)
+        nfc = Pn532(interface)
+
+        status, data = nfc.mifareultralight_ReadPages(page=4, numPages=6)
+        self.assertTrue(status, 'mifareultralight_ReadPages failed!')
+        self.assertEqual(bytes(range(0, 24)), data, 'Incorrect data returned')
+
+        calls = [mock.call(b'\x40\x01\x30\x04'), mock.call(b'\x40\x01\x30\x08')]
+        self.assertEqual(calls, interface.writeCommand.call_args_list, 'Incorrect READ commands')
+
+    def test_ntag21x_FastRead(self):
+        """ntag21x_FastRead splits page ranges into FAST_READ commands that fit in a frame"""
+        frames = [
+            b'\x00' + bytes([1] * 240),
+            b'\x00' + bytes([2] * 8),
+        ]
+        interface = _mock_interface_into(resp_frames=frames)
+        nfc = Pn532(interface)
+
+        status, data = nfc.ntag21x_FastRead(startPage=4, endPage=65)
+        self.assertTrue(status, 'ntag21x_FastRead failed!')
+        self.assertEqual(bytes([1] * 240 + [2] * 8), data, 'Incorrect data returned')
+
+        calls = [mock.call(b'\x42\x3a\x04\x3f'), mock.call(b'\x42\x3a\x40\x41')]
+        self.assertEqual(calls, interface.writeCommand.call_args_list, 'Incorrect FAST_READ commands')
+
+    def test_inCommunicateThru(self):
+        """inCommunicateThru sends raw data and strips the status byte"""
+        frames = [
+            (0, b'\x00\x01\x02'),
+            (0, b'\x01'),
+        ]
+        interface = _mock_interface(resp_frames=frames)
+        nfc = Pn532(interface)
+
+        status, data = nfc.inCommunicateThru(b'\x60')
+        self.assertTrue(status, 'inCommunicateThru failed!')
+        self.assertEqual(b'\x01\x02', data)
+        interface.writeCommand.assert_called_with(b'\x42', b'\x60')
+
+        status, data = nfc.inCommunicateThru(b'\x60')
+        self.assertFalse(status, 'inCommunicateThru succeeded with an error status!')
+
     def test_mifareultralight_WritePage(self):
         """mifareultralight_WritePage correctly reads a data block"""
         frames = [
@@ -491,9 +1088,12 @@ class TestPn532(TestCase):
         ]
         interface = _mock_interface(resp_frames=frames)
         nfc = Pn532(interface)
+        nfc.inListedTargets = [FelicaTarget(1, b'\x01' * 8, b'\x02' * 8, 0x12fc)]
 
         status = nfc.felica_Release()
         self.assertEqual(1, status, 'felica_Release failed!')
+        self.assertEqual(1, nfc.activations, 'Release not counted as a target change')
+        self.assertEqual([], nfc.inListedTargets, 'Released targets still listed')
 
         header = _get_header(interface)
         self.assertEqual(b'\x52\x00', header, 'Incorrect felica_Release command')
@@ -23,6 +23,12 @@ class MockUART(mock.Mock):
         self._mock_read(num)
         return self._get_data(num)
 
+    def readinto(self, buf):
+        self._mock_readinto(len(buf))
+        data = self._get_data(len(buf))
+        buf[:] = data
+        return len(data)
+
     def write(self, data):
         self._mock_write(data)
         self.write_buf += data
@@ -107,6 +113,40 @@ class TestPn532hsu(TestCase):
             self.assertEqual(len(resp), length, "length did not match response length")
             self.assertEqual(resp_data, resp, "Incorrect response")
 
+    def test_readResponse_into(self):
+        """readResponse_into writes the response into the given buffer"""
+        pn532 = Pn532Hsu(1)
+        pn532.begin()
+
+        resp_frame = bytearray([0, 0, 255, 4, 252, 0xD5, 2, 70, 80, 147, 0])
+        MOCK_UART.read_buf = PN532_ACK + resp_frame
+        pn532.writeCommand(header=bytearray([1]), body=bytearray())
+
+        buf = bytearray(4)
+        length = pn532.readResponse_into(buf)
+        self.assertEqual(2, length, "readResponse_into failed!")
+        self.assertEqual(bytearray([70, 80]), buf[:length], "Incorrect response")
+
+        MOCK_UART.read_buf = PN532_ACK + resp_frame
+        pn532.writeCommand(header=bytearray([1]), body=bytearray())
+        length = pn532.readResponse_into(bytearray(1))
+        self.assertEqual(-4, length, "readResponse_into did not return No Space")
+
+    def test_readResponse_into_no_space(self):
+        """readResponse_into drops a frame too large for the buffer, the next frame is read whole"""
+        pn532 = Pn532Hsu(1)
+        pn532.begin()
+
+        resp_frame = bytearray([0, 0, 255, 4, 252, 0xD5, 2, 70, 80, 147, 0])
+        next_frame = bytearray([0, 0, 255, 3, 253, 0xD5, 2, 60, 237, 0])
+        MOCK_UART.read_buf = PN532_ACK + resp_frame + next_frame
+        pn532.writeCommand(header=bytearray([1]), body=bytearray())
+
+        self.assertEqual(-4, pn532.readResponse_into(bytearray(1)), "readResponse_into did not return No Space")
+        length, resp = pn532.readResponse()
+        self.assertEqual(1, length, "readResponse failed after a dropped frame")
+        self.assertEqual(bytearray([60]), resp, "Incorrect response")
+
     def test_invalid_length(self):
         """readResponse rejects frame with invalid length or invalid length checksum"""
         pn532 = Pn532Hsu(1)
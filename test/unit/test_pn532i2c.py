@@ -43,7 +43,7 @@ class MockI2C(mock.Mock):
         if op == 'read':
             self._read_bytes(data)
             print('read_bytes', data)
-            return [self._get_data(data)]
+            return [bytes(self._get_data(data))]
 
 MOCK_I2C = MockI2C(id='my mock_i2c')
 
@@ -138,6 +138,25 @@ class TestPn532i2c(TestCase):
             self.assertEqual(len(resp), length, "length did not match response length")
             self.assertEqual(resp_data, resp, "Incorrect response")
 
+    def test_readResponse_into(self):
+        """readResponse_into writes the response into the given buffer"""
+        pn532 = Pn532I2c(1)
+        pn532.begin()
+
+        resp_frame = [0, 0, 255, 4, 252, 0xD5, 2, 70, 80, 147, 0]
+        MOCK_I2C.read_buf = [1] + PN532_ACK + [1] + resp_frame[:5] + [1] + resp_frame
+        pn532.writeCommand(header=bytearray([1]), body=bytearray())
+
+        buf = bytearray(4)
+        length = pn532.readResponse_into(buf)
+        self.assertEqual(2, length, "readResponse_into failed!")
+        self.assertEqual(bytearray([70, 80]), buf[:length], "Incorrect response")
+
+        MOCK_I2C.read_buf = [1] + PN532_ACK + [1] + resp_frame[:5] + [1] + resp_frame
+        pn532.writeCommand(header=bytearray([1]), body=bytearray())
+        length = pn532.readResponse_into(bytearray(1))
+        self.assertEqual(-4, length, "readResponse_into did not return No Space")
+
     def test_invalid_length(self):
         """readResponse rejects frame with invalid length or invalid length checksum"""
         pn532 = Pn532I2c(1)
@@ -153,6 +153,20 @@ class TestPn532spi(TestCase):
             self.assertEqual(len(resp), length, "length did not match response length")
             self.assertEqual(resp_data, resp, "Incorrect response")
 
+    def test_readResponse_into(self):
+        """readResponse_into writes the response into the given buffer"""
+        pn532 = Pn532Spi(0)
+
+        rev_b = {'04': 32, 'D5': 171, '02': 64, '70': 98, '80': 10, '~04': 63, '~027080': 201}
+        resp_frame = [0, 0, 255, rev_b['04'], rev_b['~04'], rev_b['D5'], rev_b['02'], rev_b['70'], rev_b['80'], rev_b['~027080'], 0]
+        MOCK_SPI.read_buf = [0, 128, 128] + PN532_ACK + [0, 128, 128] + resp_frame
+        pn532.writeCommand(header=bytearray([1]), body=bytearray())
+
+        buf = bytearray(4)
+        length = pn532.readResponse_into(buf)
+        self.assertEqual(2, length, "readResponse_into failed!")
+        self.assertEqual(bytearray([70, 80]), buf[:length], "Incorrect response")
+
     def test_invalid_length(self):
         """readResponse rejects frame with invalid length or invalid length checksum"""
         pn532 = Pn532Spi(0)
@@ -63,3 +63,22 @@ class TestSnep(TestCase):
             self.assertEqual(b'\x10\x02\x00\x00\x00\x04', header, 'Invalid write header')
             body = _get_body(link)
             self.assertEqual(b'data', body, 'Invalid write body')
+
+    def test_write_fragmented(self):
+        """write sends messages larger than a PDU in two fragments around the Continue response"""
+        frames = [
+            (6, b'\x10\x80\x00\x00\x00\x00'),
+            (6, b'\x10\x81\x00\x00\x00\x00'),
+        ]
+        link = _mock_llcp(resp_frames=frames)
+        link.send.return_value = True
+        link.remoteMiu = 248
+        with mock.patch('pn532pi.nfc.snep.Llcp', new=link):
+            nfc = Snep(link)
+
+            data = bytearray(range(256)) + bytearray(44)
+            self.assertEqual(1, nfc.write(data), 'write failed!')
+            sent = [call[0][0] for call in link.send.call_args_list]
+            self.assertEqual(b'\x10\x02\x00\x00\x01\x2c' + data[:242], sent[0], 'Invalid first fragment')
+            self.assertEqual(data[242:], sent[1], 'Invalid second fragment')
+            link.write.assert_not_called()
@@ -0,0 +1,33 @@
+"""
+    Test for the incremental TLV parser
+"""
+from unittest import TestCase
+
+from pn532pi.nfc.tlv import TlvReader, encodeTlvLength, readNdefTlv
+
+
+class TestTlvReader(TestCase):
+    def test_feed(self):
+        """TlvReader skips other TLVs and stops once the NDEF message is complete"""
+        message = bytes(range(20))
+        data = b'\x00\x01\x03\xa0\x0c\x44' + b'\x03\x14' + message + b'\xfe'
+        reader = TlvReader()
+
+        self.assertFalse(reader.feed(data[:8]), 'Incomplete message reported done')
+        self.assertEqual(20, reader.remaining, 'Incorrect number of bytes remaining')
+        self.assertTrue(reader.feed(data[8:28]), 'Complete message not reported done')
+        self.assertEqual(message, reader.message)
+        self.assertEqual(6, reader.ndefOffset)
+
+    def test_terminator(self):
+        """TlvReader stops at the terminator TLV"""
+        reader = TlvReader()
+        self.assertTrue(reader.feed(b'\x00\x00\xfe\x03'))
+        self.assertIsNone(reader.message)
+
+    def test_long_length(self):
+        """3 bytes lengths are handled"""
+        message = bytes(300)
+        self.assertEqual(b'\xff\x01\x2c', encodeTlvLength(300))
+        self.assertEqual(message, readNdefTlv(b'\x03' + encodeTlvLength(300) + message))
+        self.assertEqual(b'\x14', encodeTlvLength(20))
@@ -0,0 +1,126 @@
+"""
+    Test for the Type 2 tag NDEF reader
+"""
+from unittest import TestCase, mock
+
+from pn532pi.nfc import ndef
+from pn532pi.nfc.pn532 import Pn532
+from pn532pi.nfc.type2tag import Type2Tag
+
+
+def _mock_tag(memory):
+    """
+    :param memory: tag memory from page 0
+    """
+    nfc = Pn532(mock.MagicMock())
+    nfc.mifareultralight_ReadPages = mock.MagicMock(
+        side_effect=lambda page, num: (True, bytearray(memory[page * 4:(page + num) * 4])))
+    nfc.ntag21x_FastRead = mock.MagicMock(
+        side_effect=lambda first, last: (True, bytearray(memory[first * 4:(last + 1) * 4])))
+    return nfc
+
+
+class TestType2Tag(TestCase):
+    def test_readNdef(self):
+        """readNdef reads the CC page then only the pages holding the message"""
+        message = ndef.encodeMessage([ndef.NdefRecord.uri('https://www.example.com/a/forty/byte/long/url')])
+        cc = b'\xe1\x10\x6d\x00'   # NTAG216
+        memory = bytearray(12) + cc + ndef.wrapTlv(message)
+        memory += bytearray(924 - len(memory))
+        nfc = _mock_tag(memory)
+        nfc.inCommunicateThru = mock.MagicMock(return_value=(True, bytearray(b'\x00\x04\x04\x02\x01\x00\x13\x03')))
+        nfc._uid = b'\x04\x01\x02\x03\x04\x05\x06'
+        tag = Type2Tag(nfc)
+
+        status, result = tag.readNdef()
+        self.assertTrue(status, 'readNdef failed!')
+        self.assertEqual(message, result)
+        nfc.mifareultralight_ReadPages.assert_called_once_with(3, 4)
+        nfc.ntag21x_FastRead.assert_called_once_with(7, (16 + 2 + len(message) - 1) // 4)
+        nfc.inCommunicateThru.assert_called_once_with(bytearray([0x60]))   # GET_VERSION
+
+        # the version of the tag is remembered: READ + FAST_READ on the next tap
+        nfc.activations += 1
+        nfc.mifareultralight_ReadPages.reset_mock()
+        nfc.ntag21x_FastRead.reset_mock()
+        nfc.inCommunicateThru.reset_mock()
+        status, result = tag.readNdef()
+        self.assertTrue(status, 'readNdef failed!')
+        self.assertEqual(message, result)
+        exchanges = (nfc.mifareultralight_ReadPages.call_count + nfc.ntag21x_FastRead.call_count +
+                     nfc.inCommunicateThru.call_count)
+        self.assertEqual(2, exchanges)
+
+    def test_readNdef_no_fast_read(self):
+        """readNdef falls back to READ and selects the tag again when it does not answer GET_VERSION"""
+        message = ndef.encodeMessage([ndef.NdefRecord.uri('https://www.example.com/a/forty/byte/long/url')])
+        memory = bytearray(12) + b'\xe1\x10\x12\x00' + ndef.wrapTlv(message)
+        memory += bytearray(160 - len(memory))
+        nfc = _mock_tag(memory)
+        nfc.inCommunicateThru = mock.MagicMock(return_value=(False, bytearray()))
+        nfc.inSelect = mock.MagicMock(return_value=True)
+
+        status, result = Type2Tag(nfc).readNdef()
+        self.assertTrue(status, 'readNdef failed!')
+        self.assertEqual(message, result)
+        nfc.inSelect.assert_called_once_with(1)
+        nfc.ntag21x_FastRead.assert_not_called()
+        self.assertEqual(mock.call(7, (16 + 2 + len(message) + 3) // 4 - 7),
+                         nfc.mifareultralight_ReadPages.call_args_list[1])
+
+    def test_readNdef_reserved(self):
+        """readNdef skips the areas declared by memory control TLVs"""
+        message = ndef.encodeMessage([ndef.NdefRecord.text('0123456789')])
+        tlv = b'\x02\x03\x62\x04\x02' + ndef.wrapTlv(message)   # 4 reserved bytes at page 6, byte 2
+        data = tlv[:10] + b'\xaa\xbb\xcc\xdd' + tlv[10:]
+        memory = bytearray(12) + b'\xe1\x10\x06\x00' + data
+        memory += bytearray(64 - len(memory))
+        nfc = _mock_tag(memory)
+
+        status, result = Type2Tag(nfc).readNdef()
+        self.assertTrue(status, 'readNdef failed!')
+        self.assertEqual(message, result)
+
+    def test_readNdef_unformatted(self):
+        """readNdef fails on a tag without NDEF capability container"""
+        nfc = _mock_tag(bytearray(64))
+        status, result = Type2Tag(nfc).readNdef()
+        self.assertFalse(status, 'readNdef succeeded on an unformatted tag')
+
+    def test_writeNdef(self):
+        """writeNdef lays the message over the pages and only writes the pages that changed"""
+        memory = bytearray(12) + b'\xe1\x10\x12\x00' + b'\x01\x03\xa0\x0c\x34' + ndef.wrapTlv(b'\xd0\x00\x00')
+        memory += bytearray(160 - len(memory))
+        nfc = _mock_tag(memory)
+
+        def write(page, data):
+            memory[page * 4:page * 4 + 4] = data
+            return True
+        nfc.mifareultralight_WritePage = mock.MagicMock(side_effect=write)
+        progress = mock.MagicMock()
+
+        message = ndef.encodeMessage([ndef.NdefRecord.uri('https://www.example.com/a/forty/byte/long/url')])
+        self.assertTrue(Type2Tag(nfc).writeNdef(message, progress), 'writeNdef failed!')
+        # the lock control TLV is kept and the message ends with a terminator
+        self.assertEqual(b'\x01\x03\xa0\x0c\x34' + ndef.wrapTlv(message), memory[16:16 + 5 + 2 + len(message) + 1])
+        pages = (5 + 2 + len(message) + 1 + 3) // 4
+        progress.assert_called_with(pages, pages)
+        self.assertEqual(mock.call(3, 4), nfc.mifareultralight_ReadPages.call_args_list[0])
+
+        status, result = Type2Tag(nfc).readNdef()
+        self.assertTrue(status, 'readNdef failed!')
+        self.assertEqual(message, result)
+
+        nfc.mifareultralight_WritePage.reset_mock()
+        self.assertTrue(Type2Tag(nfc).writeNdef(message), 'writeNdef failed!')
+        nfc.mifareultralight_WritePage.assert_not_called()
+
+    def test_writeNdef_too_large(self):
+        """writeNdef fails without writing when the message does not fit"""
+        memory = bytearray(12) + b'\xe1\x10\x06\x00'
+        memory += bytearray(64 - len(memory))
+        nfc = _mock_tag(memory)
+        nfc.mifareultralight_WritePage = mock.MagicMock(return_value=True)
+
+        self.assertTrue(Type2Tag(nfc).writeNdef(bytearray(46)), 'writeNdef failed on a full data area!')
+        self.assertFalse(Type2Tag(nfc).writeNdef(bytearray(47)), 'writeNdef succeeded with a message too large')
@@ -0,0 +1,96 @@
+"""
+    Test for the Type 4 tag NDEF reader/writer
+"""
+from unittest import TestCase, mock
+
+from pn532pi.nfc import ndef
+from pn532pi.nfc.pn532 import Pn532
+from pn532pi.nfc.type4tag import Type4Tag, parseCapability
+
+UID = b'\x04\x11\x22\x33\x44\x55\x66'
+
+
+class _Tag:
+    """
+    Minimal Type 4 tag answering the APDUs sent through inDataExchange
+    """
+    def __init__(self, mle, mlc, message):
+        self.files = {
+            0xE103: bytearray(b'\x00\x0f\x20') + mle.to_bytes(2, 'big') + mlc.to_bytes(2, 'big') +
+                    b'\x04\x06\xe1\x04\x04\x00\x00\x00',
+            0xE104: bytearray(len(message).to_bytes(2, 'big') + message + bytes(1024 - 2 - len(message))),
+        }
+        self.selected = None
+        self.apdus = []
+        self._chained = b''
+
+    def exchange(self, frame, more=False, timeout=1000):
+        apdu = self._chained + bytes(frame)
+        self._chained = apdu if more else b''
+        if (more):
+            return True, bytearray()
+        self.apdus.append(apdu)
+        ins, p1, p2 = apdu[1], apdu[2], apdu[3]
+        offset = (p1 << 8) | p2
+        if (ins == 0xA4):
+            if (p1 == 0x04):
+                return True, bytearray(b'\x90\x00')
+            fid = int.from_bytes(apdu[5:7], 'big')
+            if (fid not in self.files):
+                return True, bytearray(b'\x6a\x82')
+            self.selected = self.files[fid]
+            return True, bytearray(b'\x90\x00')
+        if (ins == 0xB0):
+            return True, self.selected[offset:offset + (apdu[4] or 256)] + b'\x90\x00'
+        if (ins == 0xD6):
+            self.selected[offset:offset + apdu[4]] = apdu[5:5 + apdu[4]]
+            return True, bytearray(b'\x90\x00')
+        return True, bytearray(b'\x6d\x00')
+
+
+class TestType4Tag(TestCase):
+    def test_parseCapability(self):
+        """parseCapability reads MLe, MLc and the NDEF file control TLV"""
+        cc = parseCapability(b'\x00\x0f\x20\x00\x3b\x00\x34\x04\x06\xe1\x04\x00\x32\x00\x00')
+        self.assertEqual(0x3B, cc.mle)
+        self.assertEqual(0x34, cc.mlc)
+        self.assertEqual(0xE104, cc.file_id)
+        self.assertEqual(0x32, cc.max_size)
+        self.assertIsNone(parseCapability(b'\x00\x0f\x20\x00\x3b\x00\x34\x05\x06\xe1\x04\x00\x32\x00\x00'))
+
+    def test_readNdef(self):
+        """readNdef reads in chunks of MLe capped to the PN532 frame and caches the CC per uid"""
+        message = ndef.encodeMessage([ndef.NdefRecord.text('x' * 600)])
+        tag = _Tag(0xFFFF, 0xFFFF, message)
+        nfc = Pn532(mock.MagicMock())
+        with mock.patch.object(nfc, 'inDataExchange', side_effect=tag.exchange):
+            t4t = Type4Tag(nfc, b'\x05\x78\x80\x70\x02')
+            status, result = t4t.readNdef(UID)
+            self.assertTrue(status, 'readNdef failed!')
+            self.assertEqual(message, result)
+            reads = [apdu for apdu in tag.apdus if apdu[1] == 0xB0]
+            self.assertEqual([15, 250, 250, 112], [apdu[4] for apdu in reads])
+
+            tag.apdus.clear()
+            status, result = t4t.readNdef(UID)
+            self.assertTrue(status, 'readNdef failed!')
+            self.assertEqual(message, result)
+            self.assertNotIn(b'\x00\xa4\x00\x0c\x02\xe1\x03', tag.apdus, 'CC read again for a known uid')
+
+    def test_writeNdef(self):
+        """writeNdef writes in chunks of MLc and sets NLEN last"""
+        message = ndef.encodeMessage([ndef.NdefRecord.uri('https://www.example.com/' + 'a' * 100)])
+        tag = _Tag(0x3B, 0x34, b'')
+        nfc = Pn532(mock.MagicMock())
+        with mock.patch.object(nfc, 'inDataExchange', side_effect=tag.exchange):
+            t4t = Type4Tag(nfc)
+            self.assertTrue(t4t.writeNdef(message), 'writeNdef failed!')
+            writes = [apdu for apdu in tag.apdus if apdu[1] == 0xD6]
+            self.assertEqual(b'\x00\x00', writes[0][5:])
+            self.assertEqual(len(message).to_bytes(2, 'big'), writes[-1][5:])
+            self.assertTrue(all(apdu[4] <= 0x34 for apdu in writes))
+
+            status, result = t4t.readNdef()
+            self.assertTrue(status, 'readNdef failed!')
+            self.assertEqual(message, result)
+            self.assertFalse(t4t.writeNdef(bytes(1023)), 'writeNdef succeeded with a message too large')